@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+import numpy as np
+import pandas as pd
+import backtrader as bt
+from csi import CSI_MAPPER, clean_and_export_price_data
+from cot import COT_DESIRED_COLUMNS, get_cot_report, get_exchange_codes, clean_and_export_cot_data, cot_add_lag, cot_week2day, cot_week2day_batch, get_cot_features
+from instruments import get_instrument, futures_contract_code
+from services import PriceDataService, COTDataService
+from comm_factories import FuturesCommFactory
+from feature_cache import COTFeatureCache
+from cot_bt import get_bt_data, get_cerebro, SYMBOLS
+from ingest import ALL_SYMBOLS
+from cot_legacy import legacy_cot_week2day
+
+# Symbols of the COT_Breakout runs, by number of symbols
+RUN_SYMBOLS = {
+    1: ['CC'],
+    9: SYMBOLS,
+    23: ALL_SYMBOLS,
+}
+
+# Run sizes also timed bar by bar (runonce=False), to compare with the indicators' vectorized once() runs
+NO_RUNONCE_SIZES = [9]
+
+# Symbols of the data pipeline benchmarks (the same whatever the runs' sizes, so that results stay comparable)
+PIPELINE_SYMBOLS = SYMBOLS
+
+# Single contracts are traded for about this many bars before their delivery month
+CONTRACT_BARS = 400
+
+class SyntheticCommFactory(FuturesCommFactory):
+    ''' FuturesCommFactory that also covers the symbols without a registered scheme, giving them the scheme of one of
+    the registered symbols (cot_bt.SYMBOLS), so that any symbol of the synthetic dataset can be backtested
+    '''
+
+    def create_comminfo(self, instrument_symbol: str):
+        if instrument_symbol not in SYMBOLS:
+            instrument_symbol = SYMBOLS[sum(map(ord, instrument_symbol)) % len(SYMBOLS)]
+        return super(SyntheticCommFactory, self).create_comminfo(instrument_symbol)
+
+#- SYNTHETIC DATA
+
+def generate_price_data(dates: pd.DatetimeIndex, delivery_months: list, rng: np.random.Generator) -> pd.DataFrame:
+    ''' Random walk price data shaped like the consolidated perpetual_OI.csv files (dates formatted as %Y-%m-%d) '''
+    n_bars = len(dates)
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.015, n_bars))), 2)
+    open_price = np.round(np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, 0.003, n_bars)), 2)
+    high = np.round(np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.005, n_bars))), 2)
+    low = np.round(np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.005, n_bars))), 2)
+
+    # Delivery month of the front contract (first available month after each date)
+    months = dates.month.to_numpy()
+    next_months = np.array([min([month for month in delivery_months if month > current_month], default=delivery_months[0]) for current_month in range(1, 13)])
+    delivery_month = next_months[months - 1]
+    delivery_year = dates.year.to_numpy() + (delivery_month <= months)
+
+    volume = rng.integers(100, 20000, n_bars)
+    oi = np.maximum(rng.integers(1000, 5000, n_bars) + np.cumsum(rng.integers(-100, 101, n_bars)), 100)
+    return pd.DataFrame({
+        'Date': dates.strftime('%Y-%m-%d'),
+        'NumericDeliveryMonth': delivery_year*100 + delivery_month,
+        'Open': open_price,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume,
+        'OI': oi,
+        'TotalVolume': volume + rng.integers(0, 20000, n_bars),
+        'TotalOI': oi + rng.integers(0, 100000, n_bars),
+    })
+
+def generate_cot_report_rows(dates: pd.DatetimeIndex, code: str, columns: list, rng: np.random.Generator) -> pd.DataFrame:
+    ''' Weekly rows of a raw yearly COT report (report columns as in cot.get_cot_report) for a single market '''
+    n_weeks = len(dates)
+    total_oi = np.maximum(200000 + np.cumsum(rng.integers(-5000, 5001, n_weeks)), 10000)
+    total_t = rng.integers(100, 300, n_weeks)
+
+    values = dict()
+    for column in COT_DESIRED_COLUMNS[2:-1]:
+        if column.endswith('_OI') or column.endswith('_Old'):
+            values[column] = np.round(total_oi * rng.uniform(0.01, 0.4, n_weeks)).astype(np.int64)
+        elif column.endswith('_T'):
+            values[column] = np.round(total_t * rng.uniform(0.02, 0.3, n_weeks)).astype(np.int64)
+        else:
+            values[column] = np.round(rng.uniform(0, 60, n_weeks), 1)
+    values['TotalOI'] = total_oi
+    values['TotalOI_Old'] = total_oi
+    values['TotalT'] = total_t
+
+    rows = {'Date': dates.strftime('%m/%d/%Y'), 'Code': code}
+    rows.update(values)
+    rows['FutOnly_or_Combined'] = 'FutOnly'
+
+    report_df = pd.DataFrame(rows, columns=COT_DESIRED_COLUMNS)
+    report_df.columns = columns
+    return report_df
+
+def write_raw_dataset(symbols: list, raw_path: str, start_date='1995-01-02', end_date='2022-12-30', seed=0, single_contracts=True):
+    ''' Writes a synthetic raw dataset of the symbols passed, laid out as the raw CSI price files and yearly COT report
+    files read by csi.clean_and_export_price_data and cot.clean_and_export_cot_data
+    :param single_contracts: Also writes the single contract files of each of the symbol's available contracts
+    '''
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, end_date)
+
+    raw_folder_path = f"{raw_path}\\price"
+    for symbol in symbols:
+        csi_symbol = get_instrument(symbol)['csi_symbol']
+        symbol_mapper = CSI_MAPPER[symbol]
+        price_df = generate_price_data(dates, symbol_mapper['available_months'] or [3, 6, 9, 12], rng)
+
+        # Raw CSI files have unformatted column names and dates formatted as %Y/%m/%d
+        raw_df = price_df.assign(Date=pd.to_datetime(price_df['Date']).dt.strftime('%Y/%m/%d'))
+        raw_df.columns = [f' {column}' for column in raw_df.columns]
+        _write_csv(raw_df, raw_folder_path + '\\' + csi_symbol + symbol_mapper['suffix']['perpetual'] + '.csv')
+
+        if single_contracts:
+            for year in sorted(set(symbol_mapper['available_years'])):
+                for month in symbol_mapper['available_months']:
+                    end = np.searchsorted(dates, pd.Timestamp(int(year), month, 1))
+                    contract_df = raw_df.iloc[max(end - CONTRACT_BARS, 0):end]
+                    file_name = csi_symbol + symbol_mapper['suffix']['single_contract'] + futures_contract_code(year, month)
+                    _write_csv(contract_df, raw_folder_path + '\\' + file_name + '.csv')
+
+    for exchange_name, codes in get_exchange_codes(symbols).items():
+        cot_report = get_cot_report(exchange_name)
+        for year in cot_report['available_years']:
+            first_year, last_year = year.split('_') if '_' in year else (year, year)
+            report_dates = pd.date_range(f'{first_year}-01-01', f'{last_year}-12-31', freq='W-TUE')
+
+            # As in the real reports, other markets (some with alphanumeric codes) are listed too
+            market_codes = list(codes.keys()) + ['99999X', '12460+']
+            report_df = pd.concat([generate_cot_report_rows(report_dates, code, cot_report['columns'], rng) for code in market_codes], ignore_index=True)
+            _write_csv(report_df, raw_path + r'\cot' + '\\' + exchange_name + '_' + year + '.csv')
+
+def _write_csv(df: pd.DataFrame, file_path: str):
+    folder_path = os.path.dirname(file_path)
+    if folder_path:
+        os.makedirs(folder_path, exist_ok=True)
+    df.to_csv(file_path, index=False)
+
+#- BENCHMARKS
+
+def time_call(func, repeat=3) -> dict:
+    ''' Runs func repeat times and returns its timings (in seconds) '''
+    times = list()
+    for _ in range(repeat):
+        start_time = perf_counter()
+        func()
+        times.append(perf_counter() - start_time)
+
+    return {'min': min(times), 'median': statistics.median(times), 'times': times}
+
+def run_benchmarks(workspace_path=None, run_sizes=(1, 9, 23), repeat=3, seed=0, start_date='1995-01-02', end_date='2022-12-30') -> dict:
+    ''' Times the data pipeline (over PIPELINE_SYMBOLS) and COT_Breakout runs of cot_bt.btrun on a synthetic dataset
+    (see write_raw_dataset). The data services read from the working directory, so the benchmarks run from inside workspace_path (a temporary
+    folder, removed afterwards, if not passed)
+    :param run_sizes: Numbers of symbols of the COT_Breakout runs (keys of RUN_SYMBOLS)
+    :return: Dict with the environment, the settings and each benchmark's timings
+    '''
+    symbols = PIPELINE_SYMBOLS
+    dataset_symbols = sorted(set(symbols).union(*[RUN_SYMBOLS[size] for size in run_sizes]))
+    is_temporary = workspace_path is None
+    workspace_path = tempfile.mkdtemp(prefix='custom_bt_benchmark_') if is_temporary else workspace_path
+    os.makedirs(workspace_path, exist_ok=True)
+
+    current_path = os.getcwd()
+    os.chdir(workspace_path)
+    try:
+        raw_path = '.\\raw'
+        consolidated_path = '.\\data'
+        os.makedirs(consolidated_path, exist_ok=True)
+        write_raw_dataset(dataset_symbols, raw_path, start_date=start_date, end_date=end_date, seed=seed)
+
+        benchmarks = dict()
+
+        #- Ingestion
+        benchmarks['clean_and_export_price_data'] = time_call(lambda: [clean_and_export_price_data(symbol, raw_path, consolidated_path) for symbol in symbols], repeat=repeat)
+        benchmarks['clean_and_export_cot_data'] = time_call(lambda: [clean_and_export_cot_data(symbol, raw_path, consolidated_path) for symbol in symbols], repeat=repeat)
+
+        #- COT lag and weekly to daily expansion
+        price_dates = {symbol: PriceDataService.get_data_from_csv(symbol)['Date'].to_list() for symbol in symbols}
+        cot_features = {symbol: get_cot_features(COTDataService.get_data_from_csv(symbol)) for symbol in symbols}
+        benchmarks['cot_add_lag'] = time_call(lambda: [cot_add_lag(cot_features[symbol], price_dates[symbol]) for symbol in symbols], repeat=repeat)
+        benchmarks['cot_week2day'] = time_call(lambda: [cot_week2day(cot_features[symbol], price_dates[symbol]) for symbol in symbols], repeat=repeat)
+        benchmarks['cot_week2day_batch'] = time_call(lambda: cot_week2day_batch(cot_features, price_dates), repeat=repeat)
+
+        # The implementation cot_week2day replaced scans all the weekly dates on every day, so it only runs once, on a single symbol
+        legacy_symbol = symbols[0]
+        benchmarks['cot_week2day_1_symbol'] = time_call(lambda: cot_week2day(cot_features[legacy_symbol], price_dates[legacy_symbol]), repeat=repeat)
+        benchmarks['cot_week2day_legacy_1_symbol'] = time_call(lambda: legacy_cot_week2day(cot_features[legacy_symbol], price_dates[legacy_symbol]), repeat=1)
+
+        #- Feature block of cot_bt.btrun (get_bt_data), without and with the COT features already cached
+        feature_cache = COTFeatureCache()
+        benchmarks['get_bt_data_cold'] = time_call(lambda: (feature_cache.clear(), get_bt_data(symbols)), repeat=repeat)
+        benchmarks['get_bt_data_warm'] = time_call(lambda: get_bt_data(symbols), repeat=repeat)
+
+        #- COT_Breakout runs
+        for symbol in sorted(set(dataset_symbols) - set(symbols)):
+            clean_and_export_price_data(symbol, raw_path, consolidated_path)
+            clean_and_export_cot_data(symbol, raw_path, consolidated_path)
+
+        for size in run_sizes:
+            price_dfs, cot_dfs = get_bt_data(RUN_SYMBOLS[size])
+            benchmarks[f'cot_breakout_{size}_symbols'] = time_call(lambda: get_cerebro(price_dfs, cot_dfs, comm_factory=SyntheticCommFactory,
+                                                                                            cot_component_name='mm_concentration').run(), repeat=repeat)
+            if size in NO_RUNONCE_SIZES:
+                benchmarks[f'cot_breakout_{size}_symbols_no_runonce'] = time_call(lambda: get_cerebro(price_dfs, cot_dfs, comm_factory=SyntheticCommFactory,
+                                                                                                        cot_component_name='mm_concentration').run(runonce=False), repeat=repeat)
+    finally:
+        os.chdir(current_path)
+        if is_temporary:
+            shutil.rmtree(workspace_path, ignore_errors=True)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'backtrader': bt.__version__,
+        },
+        'settings': {'run_sizes': list(run_sizes), 'repeat': repeat, 'seed': seed, 'start_date': start_date, 'end_date': end_date},
+        'benchmarks': benchmarks,
+    }
+
+def check_regressions(results: dict, baseline: dict, tolerance=0.25, stat='min') -> list:
+    ''' Compares the benchmarks' timings with a baseline's (results of an earlier run_benchmarks)
+    :param tolerance: Slowdown allowed before a benchmark counts as a regression (0.25 = 25% slower)
+    :return: List of the regressions found (name, baseline and current timings and their ratio)
+    '''
+    regressions = list()
+    for name, timings in results['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+
+        baseline_time = baseline['benchmarks'][name][stat]
+        ratio = timings[stat] / baseline_time if baseline_time > 0 else np.inf
+        if ratio > 1 + tolerance:
+            regressions.append({'name': name, 'baseline': baseline_time, 'current': timings[stat], 'ratio': ratio})
+
+    return regressions
+
+def print_results(results: dict, baseline=None, stat='min'):
+    for name, timings in results['benchmarks'].items():
+        line = f'{name}: {timings[stat]:.3f}s'
+        if baseline and name in baseline['benchmarks']:
+            line += f" (baseline {baseline['benchmarks'][name][stat]:.3f}s, x{timings[stat] / baseline['benchmarks'][name][stat]:.2f})"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the data pipeline and COT_Breakout runs on synthetic data')
+    parser.add_argument('results_path', help='.json file the results are written to')
+    parser.add_argument('--baseline', default=None, help='.json file with the baseline results to check for regressions')
+    parser.add_argument('--save-baseline', action='store_true', help='Also stores the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Slowdown allowed before failing (0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 9, 23], choices=sorted(RUN_SYMBOLS.keys()))
+    parser.add_argument('--workspace', default=None, help='Folder of the synthetic dataset (a temporary one if not passed)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_benchmarks(workspace_path=args.workspace, run_sizes=args.sizes, repeat=args.repeat, seed=args.seed)
+    with open(args.results_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline and os.path.isfile(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    print_results(results, baseline=baseline)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif baseline:
+        regressions = check_regressions(results, baseline, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']}: {regression['baseline']:.3f}s -> {regression['current']:.3f}s (x{regression['ratio']:.2f})")
+        sys.exit(1 if regressions else 0)
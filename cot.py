@@ -1,20 +1,67 @@
 from datetime import datetime, timedelta
+from time import perf_counter
 import pandas as pd
 import numpy as np
 import os
 from tqdm import tqdm
 from instruments import get_instrument
+from store import write_store_table, append_store_table, get_store_path, get_store_cot_path
+from manifest import check_raw_file, get_last_date
+
+# Consolidated COT data used to build the COT features
+COT_RAW_INPUTS = ['TotalOI', 'TotalT', 
+                'MML_OI', 'MML_T',
+                'MMS_OI', 'MMS_T',
+                'PMPUL_OI','PMPUL_T',
+                'PMPUS_OI', 'PMPUS_T']
+
+# COT features fed to the COT signals
+COT_FEATURES = ['MML_Concentration', 'MML_Clustering', 'MML_PosSize',
+                'MMS_Concentration', 'MMS_Clustering', 'MMS_PosSize',
+                'PMPU_Net_OI', 'PMPU_Net_T', 'PMPU_Net_PosSize']
+
+# Names of the raw COT report columns, in the order of get_cot_report's columns
+COT_DESIRED_COLUMNS = ['Date', 'Code', 'TotalOI', 'PMPUL_OI', 'PMPUS_OI', 'SDL_OI', 'SDS_OI', 'SDD_OI', 'MML_OI', 'MMS_OI', 'MMD_OI', 'ORL_OI', 'ORS_OI', 'ORD_OI', 'NRL_OI', 'NRS_OI', 'TotalOI_Old', 'PMPUL_Old', 'PMPUS_Old', 'SDL_Old', 'SDS_Old',
+                    'SDD_Old', 'MML_Old', 'MMS_Old', 'MMD_Old', 'ORL_Old', 'ORS_Old', 'ORD_Old', 'NRL_Old', 'NRS_Old', 'PMPUL_Concentration', 'PMPUS_Concentration', 'SDL_Concentration', 'SDS_Concentration',
+                    'SDD_Concentration', 'MML_Concentration', 'MMS_Concentration', 'MMD_Concentration', 'ORL_Concentration', 'ORS_Concentration', 'ORD_Concentration', 'NRL_Concentration', 'NRS_Concentration',
+                    'TotalT', 'PMPUL_T', 'PMPUS_T', 'SDL_T', 'SDS_T', 'SDD_T', 'MML_T', 'MMS_T', 'MMD_T', 'ORL_T', 'ORS_T', 'ORD_T', 'Gross_Long_Top4', 'Gross_Short_Top4', 'Gross_Long_Top8', 'Gross_Short_Top8',
+                    'Net_Long_Top4', 'Net_Short_Top4', 'Net_Long_Top8', 'Net_Short_Top8', 'FutOnly_or_Combined']
 
 def list2str(start_list:list, separator='_') -> str:
     return separator.join([str(item) for item in start_list])
 
-def cot_add_lag(cot_df:pd.DataFrame, price_dates: list, date_label='Date', date_format='%Y-%m-%d') -> pd.DataFrame:
-    release_weekday = 0 # All CoT data will only be available to trade on the following Monday
+def cot_add_lag(cot_df:pd.DataFrame, price_dates, date_label='Date', date_format='%Y-%m-%d', release_weekday=0, release_delays=None) -> pd.DataFrame:
+    ''' Moves every COT report date to the first trading date on or after the report's release weekday
+    :param price_dates: List of trading dates or a calendar previously built with get_trading_calendar
+    :param release_weekday: Weekday from which the report can be traded (0 = following Monday)
+    :param release_delays: Dict of extra delay days by report date, e.g. for holiday-shifted Friday releases
+    '''
+    calendar = price_dates if isinstance(price_dates, np.ndarray) else get_trading_calendar(price_dates, date_format)
     df = cot_df.copy()
-    df[date_label] = df[date_label].apply(lambda x: get_following_date_by_weekday(x, release_weekday, date_format, price_dates=price_dates))
+    report_dates = pd.to_datetime(df[date_label], format=date_format)
+
+    # Days until the following release weekday (a full week if the report is already on it)
+    delta_days = (release_weekday - report_dates.dt.weekday.to_numpy()) % 7
+    delta_days = np.where(delta_days == 0, 7, delta_days)
+    if release_delays:
+        delta_days = delta_days + df[date_label].map(release_delays).fillna(0).to_numpy(dtype=np.int64)
+    release_dates = report_dates.to_numpy() + delta_days.astype('timedelta64[D]')
+
+    # First trading date on or after each release date
+    calendar_rows = np.searchsorted(calendar, release_dates, side='left')
+
+    # Reports released after the last trading date can't be traded yet
+    is_tradable = calendar_rows < len(calendar)
+    df = df.loc[is_tradable].reset_index(drop=True)
+    df[date_label] = pd.DatetimeIndex(calendar[calendar_rows[is_tradable]]).strftime(date_format)
 
     return df
 
+def get_trading_calendar(price_dates:list, date_format='%Y-%m-%d') -> np.ndarray:
+    ''' Builds the sorted trading-date index used by cot_add_lag, so it can be computed once per symbol '''
+    calendar = pd.to_datetime(pd.Series(price_dates, dtype=object), format=date_format).to_numpy()
+    return np.unique(calendar)
+
 def get_following_date_by_weekday(date:str, following_weekday:int, date_format:str, price_dates: list) -> str:
     current_date = datetime.strptime(date, date_format)
     current_weekday = current_date.weekday()
@@ -33,35 +80,113 @@ def get_following_date_by_weekday(date:str, following_weekday:int, date_format:s
 
     return following_date.strftime(date_format)
 
-def cot_week2day(cot_df:pd.DataFrame, daily_dates:list, consolidated_path, date_label='Date', date_format='%Y-%m-%d') -> pd.DataFrame:
+def cot_week2day(cot_df:pd.DataFrame, daily_dates:list, consolidated_path=None, date_label='Date', date_format='%Y-%m-%d') -> pd.DataFrame:
+    ''' Expands weekly COT data to the daily dates passed. Each day takes the first weekly report dated after it, and
+    days after the last report keep its values for up to 6 days (NaN afterwards)
+    '''
     cot_raw_inputs = [str(column) for column in cot_df.columns.to_list() if (column != date_label)]
-    daily_dates_dt = [datetime.strptime(dd, date_format) for dd in daily_dates]
-    weekly_dates_dt = [datetime.strptime(wd, date_format) for wd in cot_df[date_label].to_list()]
-    df = pd.DataFrame(columns=cot_raw_inputs, index=daily_dates)
-    last_weekly_date_dt = weekly_dates_dt[0]
-    for daily_date_dt in daily_dates_dt:
-        foward_weekly_dates_dt = [fwd for fwd in weekly_dates_dt if fwd > daily_date_dt]
-        if (len(foward_weekly_dates_dt)>0) and (last_weekly_date_dt != foward_weekly_dates_dt[0]):
-            last_weekly_date_dt = foward_weekly_dates_dt[0]
-            cot_values = cot_df[cot_df[date_label] == last_weekly_date_dt.strftime(date_format)]
-            cot_values = cot_values[cot_raw_inputs].iloc[0].to_dict()
-        elif len(foward_weekly_dates_dt) == 0:
-            if daily_date_dt < last_weekly_date_dt + timedelta(days=6):
-                cot_values = cot_df[cot_df[date_label] == last_weekly_date_dt.strftime(date_format)]
-                cot_values = cot_values[cot_raw_inputs].iloc[0].to_dict()
-            else:
-                cot_values = [np.nan]*len(cot_raw_inputs)
-        else:
-            cot_values = cot_df[cot_df[date_label] == last_weekly_date_dt.strftime(date_format)]
-            cot_values = cot_values[cot_raw_inputs].iloc[0].to_dict()
+    weekly_df = cot_df.drop_duplicates(subset=date_label, keep='first').sort_values(date_label)
+    weekly_dates = pd.to_datetime(weekly_df[date_label], format=date_format).to_numpy()
+    daily_dates_dt = pd.to_datetime(pd.Series(daily_dates, dtype=object), format=date_format).to_numpy()
 
-        daily_date = daily_date_dt.strftime(date_format)
-        df.loc[daily_date] = cot_values
-    
-    df.index.name = date_label
-    df.reset_index(inplace=True)
+    rows = get_week2day_rows(weekly_dates, daily_dates_dt)
+    df = _take_weekly_rows(weekly_df[cot_raw_inputs], rows)
+    df.insert(0, date_label, list(daily_dates))
     return df
 
+def cot_week2day_batch(cot_dfs:dict, daily_dates, columns=None, symbol_label='symbol', date_label='Date', date_format='%Y-%m-%d') -> pd.DataFrame:
+    ''' Batch version of cot_week2day: expands the weekly COT data of several symbols in one call
+    :param cot_dfs: Dict of weekly COT DataFrames by symbol
+    :param daily_dates: List of daily dates shared by all symbols or dict of lists by symbol
+    :param columns: COT columns to be expanded (all of them by default)
+    '''
+    shared_daily_dates_dt = None
+    if not isinstance(daily_dates, dict):
+        shared_daily_dates_dt = pd.to_datetime(pd.Series(daily_dates, dtype=object), format=date_format).to_numpy()
+
+    daily_dfs = []
+    for symbol, cot_df in cot_dfs.items():
+        cot_raw_inputs = columns if columns is not None else [str(column) for column in cot_df.columns.to_list() if (column != date_label)]
+        weekly_df = cot_df.drop_duplicates(subset=date_label, keep='first').sort_values(date_label)
+        weekly_dates = pd.to_datetime(weekly_df[date_label], format=date_format).to_numpy()
+
+        if shared_daily_dates_dt is None:
+            symbol_daily_dates = daily_dates[symbol]
+            daily_dates_dt = pd.to_datetime(pd.Series(symbol_daily_dates, dtype=object), format=date_format).to_numpy()
+        else:
+            symbol_daily_dates = daily_dates
+            daily_dates_dt = shared_daily_dates_dt
+
+        rows = get_week2day_rows(weekly_dates, daily_dates_dt)
+        df = _take_weekly_rows(weekly_df[cot_raw_inputs], rows)
+        df.insert(0, date_label, list(symbol_daily_dates))
+        df[symbol_label] = symbol
+        daily_dfs.append(df)
+
+    if not daily_dfs:
+        return pd.DataFrame()
+
+    return pd.concat(daily_dfs, ignore_index=True, sort=False)
+
+def get_week2day_rows(weekly_dates:np.ndarray, daily_dates:np.ndarray, max_stale_days=6) -> np.ndarray:
+    ''' Returns, for each daily date, the position of the weekly row it takes its values from. Days older than
+    max_stale_days after the last report point to len(weekly_dates), i.e. no data
+    '''
+    n_weeks = len(weekly_dates)
+    if n_weeks == 0:
+        return np.zeros(len(daily_dates), dtype=np.int64)
+
+    # First weekly date strictly after each day
+    forward_rows = np.searchsorted(weekly_dates, daily_dates, side='right')
+    has_forward = forward_rows < n_weeks
+
+    # Days after the last report are anchored to the last forward row seen (or to the first report)
+    last_rows = pd.Series(np.where(has_forward, forward_rows, np.nan)).ffill().fillna(0).to_numpy(dtype=np.int64)
+    is_fresh = daily_dates < weekly_dates[last_rows] + np.timedelta64(max_stale_days, 'D')
+
+    return np.where(has_forward, forward_rows, np.where(is_fresh, last_rows, n_weeks))
+
+def _take_weekly_rows(weekly_df:pd.DataFrame, rows:np.ndarray) -> pd.DataFrame:
+    # Appending an all-NaN row so that stale days (rows == len(weekly_df)) come out empty
+    empty_row = pd.DataFrame([[np.nan]*len(weekly_df.columns)], columns=weekly_df.columns)
+    padded_df = pd.concat([weekly_df.reset_index(drop=True), empty_row], ignore_index=True)
+    return padded_df.iloc[rows].reset_index(drop=True)
+
+def get_cot_features(cot_df:pd.DataFrame, features=COT_FEATURES, date_label='Date') -> pd.DataFrame:
+    ''' Builds the COT features used by the COT signals (concentration, clustering, position size and PMPU net
+    values) from the consolidated COT data, forward filling missing values
+    '''
+    cot_df = cot_df[[date_label]+COT_RAW_INPUTS].copy()
+
+    oi_total = cot_df['TotalOI']
+    n_traders_total = cot_df['TotalT']
+    for cot_category in ['MML', 'MMS', 'PMPUL', 'PMPUS']:
+        oi = cot_df[f'{cot_category}_OI']
+        n_traders = cot_df[f'{cot_category}_T']
+
+        conc = np.where(cot_df[['TotalOI']].eq(0).all(1), 0, oi / oi_total)
+        clus = np.where(cot_df[['TotalT']].eq(0).all(1), 0, n_traders / n_traders_total)
+
+        cot_df[f'{cot_category}_Concentration'] = conc
+        cot_df[f'{cot_category}_Clustering'] = clus
+        cot_df[f'{cot_category}_PosSize'] = np.where(cot_df[[f'{cot_category}_T']].eq(0).all(1), 0, oi / n_traders)
+    cot_df['PMPU_Net_OI'] = cot_df['PMPUL_OI'] - cot_df['PMPUS_OI']
+    cot_df['PMPU_Net_T'] = cot_df['PMPUL_T'] - cot_df['PMPUS_T']
+    cot_df['PMPU_Net_PosSize'] = cot_df['PMPUL_PosSize'] - cot_df['PMPUS_PosSize']
+    cot_df = cot_df.ffill()
+
+    return cot_df[[date_label]+list(features)]
+
+def get_lagged_cot_features(cot_df:pd.DataFrame, price_dates, features=COT_FEATURES, release_weekday=0, release_delays=None, date_label='Date') -> pd.DataFrame:
+    ''' Builds the COT features (see get_cot_features) placed on the dates they can be traded (see cot_add_lag). The
+    last report is dropped, as it may not be tradable yet
+    '''
+    cot_df = get_cot_features(cot_df, features=features, date_label=date_label)
+    cot_df = cot_df.drop(cot_df.tail(1).index)
+    cot_df = cot_add_lag(cot_df=cot_df, price_dates=price_dates, date_label=date_label, release_weekday=release_weekday, release_delays=release_delays)
+
+    return cot_df
+
 def get_cot_report(exchange_name:str):
 
     cot_report = dict()
@@ -98,16 +223,11 @@ def get_cot_report(exchange_name:str):
     
     return cot_report
 
-def clean_and_export_cot_data(symbol:str, raw_path: str, consolidated_path: str):
+def clean_and_export_cot_data(symbol:str, raw_path: str, consolidated_path: str, export_store=True):
     ''' Function that cleans and exports COT database for a single instrument
     :param symbol: Instrument's symbol
+    :param export_store: Also exports the data to the columnar (Parquet) store under consolidated_path
     '''
-    # Producer/Merchant/Processor/User, Money Managers, Swap Dealers, Other Reportables, Non-reportables
-    trader_groups = ['PMPU', 'MM', 'SD', 'OR', 'NR']
-
-    # Long, Short or Spread
-    suffixes = ['L', 'S', 'D']
-
     # Instrument info
     instrument = get_instrument(symbol)
     if instrument:
@@ -118,63 +238,178 @@ def clean_and_export_cot_data(symbol:str, raw_path: str, consolidated_path: str)
         # CoT Report info
         cot_report = get_cot_report(exchange_name)
         available_years = cot_report['available_years']
-        columns = cot_report['columns']
-
-        desired_columns = ['Date', 'Code', 'TotalOI', 'PMPUL_OI', 'PMPUS_OI', 'SDL_OI', 'SDS_OI', 'SDD_OI', 'MML_OI', 'MMS_OI', 'MMD_OI', 'ORL_OI', 'ORS_OI', 'ORD_OI', 'NRL_OI', 'NRS_OI', 'TotalOI_Old', 'PMPUL_Old', 'PMPUS_Old', 'SDL_Old', 'SDS_Old',
-                        'SDD_Old', 'MML_Old', 'MMS_Old', 'MMD_Old', 'ORL_Old', 'ORS_Old', 'ORD_Old', 'NRL_Old', 'NRS_Old', 'PMPUL_Concentration', 'PMPUS_Concentration', 'SDL_Concentration', 'SDS_Concentration',
-                        'SDD_Concentration', 'MML_Concentration', 'MMS_Concentration', 'MMD_Concentration', 'ORL_Concentration', 'ORS_Concentration', 'ORD_Concentration', 'NRL_Concentration', 'NRS_Concentration',
-                        'TotalT', 'PMPUL_T', 'PMPUS_T', 'SDL_T', 'SDS_T', 'SDD_T', 'MML_T', 'MMS_T', 'MMD_T', 'ORL_T', 'ORS_T', 'ORD_T', 'Gross_Long_Top4', 'Gross_Short_Top4', 'Gross_Long_Top8', 'Gross_Short_Top8',
-                        'Net_Long_Top4', 'Net_Short_Top4', 'Net_Long_Top8', 'Net_Short_Top8', 'FutOnly_or_Combined']
 
-        columns_mapper = dict()
-        for i in range(len(columns)):
-            if i < len(columns) - 1:
-                columns_mapper.update({columns[i]: desired_columns[i]})
-
-        instrument_cot_df = pd.DataFrame(columns=desired_columns)
+        instrument_cot_df = pd.DataFrame(columns=COT_DESIRED_COLUMNS)
         print("({} - CoT)".format(name))
         for year in tqdm(available_years):
+            df = read_cot_report_file(exchange_name, year, raw_path)
+
+            if df is not None:
+                filtered_df = df.loc[df['Code'] == cot_report_code]
+
+                if not filtered_df.empty:
+                    instrument_cot_df = pd.concat([instrument_cot_df, filtered_df], ignore_index=True, sort=False)
+
+        export_cot_data(symbol, instrument_cot_df, consolidated_path, export_store=export_store)
+
+def clean_and_export_cot_data_batch(symbols:list, raw_path: str, consolidated_path: str, export_store=True) -> dict:
+    ''' Cleans and exports the COT database of several instruments, reading each yearly report file only once
+    :return: Time spent (in seconds) on each stage
+    '''
+    timings = {'read': 0.0, 'split': 0.0, 'export': 0.0}
+
+    exchange_codes = get_exchange_codes(symbols)
+    instrument_cot_dfs = {symbol: [pd.DataFrame(columns=COT_DESIRED_COLUMNS)] for codes in exchange_codes.values() for code_symbols in codes.values() for symbol in code_symbols}
+    for exchange_name, codes in exchange_codes.items():
+        cot_report = get_cot_report(exchange_name)
+        print("({} - CoT)".format(exchange_name))
+        for year in tqdm(cot_report['available_years']):
+            start_time = perf_counter()
+            df = read_cot_report_file(exchange_name, year, raw_path)
+            timings['read'] += perf_counter() - start_time
+
+            if df is not None:
+                start_time = perf_counter()
+                filtered_df = df.loc[df['Code'].isin(list(codes.keys()))]
+                for code, code_df in filtered_df.groupby('Code', sort=False):
+                    for symbol in codes[code]:
+                        instrument_cot_dfs[symbol].append(code_df)
+                timings['split'] += perf_counter() - start_time
+
+    start_time = perf_counter()
+    for symbol, dfs in instrument_cot_dfs.items():
+        instrument_cot_df = pd.concat(dfs, ignore_index=True, sort=False)
+        export_cot_data(symbol, instrument_cot_df, consolidated_path, export_store=export_store)
+    timings['export'] += perf_counter() - start_time
+
+    return timings
+
+def update_cot_data_batch(symbols:list, raw_path: str, consolidated_path: str, manifest: dict, export_store=True) -> int:
+    ''' Incrementally updates the COT database of several instruments: raw report files unchanged since the last
+    update are skipped and only the reports after each instrument's last ingested date are appended
+    :param manifest: Manifest loaded with manifest.load_manifest (updated in place)
+    :return: Number of rows appended
+    '''
+    cot_manifest = manifest.setdefault('cot', dict())
+    files_manifest = cot_manifest.setdefault('files', dict())
+    last_dates = cot_manifest.setdefault('last_dates', dict())
+
+    exchange_codes = get_exchange_codes(symbols)
+    instrument_cot_dfs = {symbol: [] for codes in exchange_codes.values() for code_symbols in codes.values() for symbol in code_symbols}
+    for exchange_name, codes in exchange_codes.items():
+        for year in get_cot_report(exchange_name)['available_years']:
             file_name = exchange_name + '_' + year
             file_path = raw_path + r'\cot' + '\\' + file_name + '.csv'
+            if not os.path.isfile(file_path):
+                continue
 
-            path_doesnt_exists = False
-            if os.path.isfile(file_path):
-                df = pd.read_csv(file_path, header=0)
-            else:
-                path_doesnt_exists = True
+            changed, signature = check_raw_file(file_path, files_manifest.get(file_name))
+            files_manifest[file_name] = signature
+            if changed:
+                df = read_cot_report_file(exchange_name, year, raw_path)
+                filtered_df = df.loc[df['Code'].isin(list(codes.keys()))]
+                for code, code_df in filtered_df.groupby('Code', sort=False):
+                    for symbol in codes[code]:
+                        instrument_cot_dfs[symbol].append(code_df)
 
-            if not path_doesnt_exists:
-                df = df[columns]
-                df = df.rename(columns=columns_mapper)
-            
-                filtered_df = df.loc[(df['Code'] == cot_report_code) & (df['FutOnly_or_Combined'] == 'FutOnly')]
+    if not os.path.isdir(consolidated_path + '\\cot'):
+        os.mkdir(consolidated_path + '\\cot')
 
-                if not filtered_df.empty:
-                    instrument_cot_df = pd.concat([instrument_cot_df, filtered_df], ignore_index=True, sort=False)
-        
-        instrument_cot_df.drop(['Code', 'FutOnly_or_Combined'], inplace=True, axis=1)
-
-        for trader_group in trader_groups:
-            for suffix in suffixes:
-                if not ((trader_group == 'PMPU' or trader_group == 'OR') and ('D' in suffix)):
-                    category_name = trader_group + suffix
-                    if trader_group != 'NR':
-                        instrument_cot_df[category_name + '_Clustering'] = instrument_cot_df[category_name + '_T'] / instrument_cot_df['TotalT'].mask(instrument_cot_df['TotalT'] == 0, np.inf)
-                        instrument_cot_df[category_name + '_Clustering'] = instrument_cot_df[category_name + '_Clustering'].apply(lambda x: round(100*x, 2))
-
-                        instrument_cot_df[category_name + '_PosSize'] = instrument_cot_df[category_name + '_OI'] / instrument_cot_df[category_name + '_T'].mask(instrument_cot_df[category_name + '_T'] == 0, np.inf)
-                        instrument_cot_df[category_name + '_PosSize'] = instrument_cot_df[category_name + '_PosSize'].apply(lambda x: round(x, 2))
-
-        if not os.path.isdir(consolidated_path + '\\cot'):
-            os.mkdir(consolidated_path + '\\cot')
-        
-        instrument_cot_df['Name'] = name
-        instrument_cot_df['Date'] = pd.to_datetime(instrument_cot_df['Date'], format="%m/%d/%Y")
-        instrument_cot_df.sort_values('Date', inplace=True)
-        instrument_cot_df['Date'] = instrument_cot_df['Date'].dt.strftime(date_format='%Y-%m-%d')
-        
-        instrument_cot_path = get_cot_path(symbol=symbol)
-        instrument_cot_df.to_csv(instrument_cot_path, index=False)
+    n_rows = 0
+    for symbol, dfs in instrument_cot_dfs.items():
+        if not dfs:
+            continue
+
+        instrument_cot_path = get_cot_path(symbol=symbol, consolidated_path=consolidated_path)
+        last_date = last_dates.get(symbol) or get_last_date(instrument_cot_path)
+
+        instrument_cot_df = pd.concat([pd.DataFrame(columns=COT_DESIRED_COLUMNS)] + dfs, ignore_index=True, sort=False)
+        instrument_cot_df = process_cot_data(symbol, instrument_cot_df)
+        if last_date:
+            instrument_cot_df = instrument_cot_df[instrument_cot_df['Date'] > last_date]
+
+        if not instrument_cot_df.empty:
+            instrument_cot_df.to_csv(instrument_cot_path, mode='a', header=not os.path.isfile(instrument_cot_path), index=False)
+            if export_store:
+                append_store_table(instrument_cot_df, get_store_cot_path(symbol, get_store_path(consolidated_path)))
+            n_rows += len(instrument_cot_df)
+            last_date = instrument_cot_df['Date'].iloc[-1]
+
+        last_dates[symbol] = last_date
+
+    return n_rows
+
+def get_exchange_codes(symbols:list) -> dict:
+    ''' Groups the symbols passed by exchange and COT report code '''
+    exchange_codes = dict()
+    for symbol in symbols:
+        instrument = get_instrument(symbol)
+        if instrument:
+            codes = exchange_codes.setdefault(instrument['exchange_name'], dict())
+            codes.setdefault(instrument['cot_report_code'], []).append(symbol)
+
+    return exchange_codes
+
+def read_cot_report_file(exchange_name:str, year:str, raw_path: str):
+    ''' Reads a raw yearly COT report file, keeping only the futures-only rows of the report columns renamed as
+    COT_DESIRED_COLUMNS. Returns None if the file doesn't exist
+    '''
+    columns = get_cot_report(exchange_name)['columns']
+    columns_mapper = dict()
+    for i in range(len(columns)):
+        if i < len(columns) - 1:
+            columns_mapper.update({columns[i]: COT_DESIRED_COLUMNS[i]})
+
+    file_name = exchange_name + '_' + year
+    file_path = raw_path + r'\cot' + '\\' + file_name + '.csv'
+    if not os.path.isfile(file_path):
+        return None
+
+    df = pd.read_csv(file_path, header=0, usecols=columns)
+    df = df[columns]
+    df = df.rename(columns=columns_mapper)
+
+    return df.loc[df['FutOnly_or_Combined'] == 'FutOnly']
+
+def export_cot_data(symbol:str, instrument_cot_df:pd.DataFrame, consolidated_path: str, export_store=True):
+    ''' Cleans an instrument's raw COT data (see process_cot_data) and exports it '''
+    instrument_cot_df = process_cot_data(symbol, instrument_cot_df)
+
+    if not os.path.isdir(consolidated_path + '\\cot'):
+        os.mkdir(consolidated_path + '\\cot')
+
+    instrument_cot_path = get_cot_path(symbol=symbol, consolidated_path=consolidated_path)
+    instrument_cot_df.to_csv(instrument_cot_path, index=False)
+    if export_store:
+        write_store_table(instrument_cot_df, get_store_cot_path(symbol, get_store_path(consolidated_path)))
+
+def process_cot_data(symbol:str, instrument_cot_df:pd.DataFrame) -> pd.DataFrame:
+    ''' Adds the clustering and position size columns to an instrument's raw COT data, sorted by date '''
+    # Producer/Merchant/Processor/User, Money Managers, Swap Dealers, Other Reportables, Non-reportables
+    trader_groups = ['PMPU', 'MM', 'SD', 'OR', 'NR']
+
+    # Long, Short or Spread
+    suffixes = ['L', 'S', 'D']
+
+    instrument_cot_df = instrument_cot_df.drop(['Code', 'FutOnly_or_Combined'], axis=1)
+
+    for trader_group in trader_groups:
+        for suffix in suffixes:
+            if not ((trader_group == 'PMPU' or trader_group == 'OR') and ('D' in suffix)):
+                category_name = trader_group + suffix
+                if trader_group != 'NR':
+                    instrument_cot_df[category_name + '_Clustering'] = instrument_cot_df[category_name + '_T'] / instrument_cot_df['TotalT'].mask(instrument_cot_df['TotalT'] == 0, np.inf)
+                    instrument_cot_df[category_name + '_Clustering'] = instrument_cot_df[category_name + '_Clustering'].apply(lambda x: round(100*x, 2))
+
+                    instrument_cot_df[category_name + '_PosSize'] = instrument_cot_df[category_name + '_OI'] / instrument_cot_df[category_name + '_T'].mask(instrument_cot_df[category_name + '_T'] == 0, np.inf)
+                    instrument_cot_df[category_name + '_PosSize'] = instrument_cot_df[category_name + '_PosSize'].apply(lambda x: round(x, 2))
+
+    instrument_cot_df['Name'] = get_instrument(symbol)['name']
+    instrument_cot_df['Date'] = pd.to_datetime(instrument_cot_df['Date'], format="%m/%d/%Y")
+    instrument_cot_df.sort_values('Date', inplace=True)
+    instrument_cot_df['Date'] = instrument_cot_df['Date'].dt.strftime(date_format='%Y-%m-%d')
+
+    return instrument_cot_df
 
 def get_cot_path(symbol:str, consolidated_path) -> str:
     return f"{consolidated_path}\\cot\\{symbol}.csv"
\ No newline at end of file
@@ -1,86 +1,82 @@
 # Basic utils
 import pandas as pd
-import numpy as np
-from cot import cot_add_lag
 
 # Data services
-from services import PriceDataService, COTDataService
+from services import PriceDataService
+from feature_cache import COTFeatureCache
 
 # Custom Backtrader
 import backtrader as bt
 from strategies import COT_Breakout
 from comm_factories import FuturesCommFactory
-from feeds.pandas import COT_PandasData, Price_PandasData
+from feeds.arrays import COT_ArrayData, Price_ArrayData, PriceCOT_ArrayData
+from profiler import HotPathProfiler
 
-def btrun():
-    # Simbolos das commodities a serem testadas
-    symbols_list = [
-        'CC', 'KC', 'C', 'CT', 'W',
-        'SB', 'BO', 'S', 'SM'
-    ]
-
-    # Dados do COT a serem analisados
-    cot_raw_inputs = ['TotalOI', 'TotalT', 
-                    'MML_OI', 'MML_T',
-                    'MMS_OI', 'MMS_T',
-                    'PMPUL_OI','PMPUL_T',
-                    'PMPUS_OI', 'PMPUS_T']
+# Simbolos das commodities a serem testadas
+SYMBOLS = [
+    'CC', 'KC', 'C', 'CT', 'W',
+    'SB', 'BO', 'S', 'SM'
+]
 
-    price_raw_inputs = ['Close', 'Open', 'High', 'Low', 'OI', 'Volume']
+PRICE_RAW_INPUTS = ['Close', 'Open', 'High', 'Low', 'OI', 'Volume']
 
+def get_bt_data(symbols_list: list, price_raw_inputs=PRICE_RAW_INPUTS) -> tuple:
+    ''' Prepares the price and (lagged) COT data of the symbols passed, starting both on the first COT date
+    :return: Tuple (price_dfs, cot_dfs) of dicts of DataFrames by symbol, with dates as datetime64
+    '''
     # Preparando o dataset do COT
-    price_data = pd.DataFrame()
-    cot_data = pd.DataFrame()
+    feature_cache = COTFeatureCache()
+    price_dfs = dict()
+    cot_dfs = dict()
     for symbol in symbols_list:
 
         #- Importing price data
         price_df = PriceDataService.get_data_from_csv(symbol)
         price_df = price_df[['Date'] + price_raw_inputs]
 
-        #- Importing CoT data
-        cot_df = COTDataService.get_data_from_csv(symbol)
-        cot_df = cot_df[['Date']+cot_raw_inputs]
-
-        oi_total = cot_df['TotalOI']
-        n_traders_total = cot_df['TotalT']
-        for cot_category in ['MML', 'MMS', 'PMPUL', 'PMPUS']:
-            oi = cot_df[f'{cot_category}_OI']
-            n_traders = cot_df[f'{cot_category}_T']
-
-            conc = np.where(cot_df[['TotalOI']].eq(0).all(1), 0, oi / oi_total)
-            clus = np.where(cot_df[['TotalT']].eq(0).all(1), 0, n_traders / n_traders_total)
-
-            cot_df[f'{cot_category}_Concentration'] = conc
-            cot_df[f'{cot_category}_Clustering'] = clus
-            cot_df[f'{cot_category}_PosSize'] = np.where(cot_df[[f'{cot_category}_T']].eq(0).all(1), 0, oi / n_traders)
-        cot_df['PMPU_Net_OI'] = cot_df['PMPUL_OI'] - cot_df['PMPUS_OI']
-        cot_df['PMPU_Net_T'] = cot_df['PMPUL_T'] - cot_df['PMPUS_T']
-        cot_df['PMPU_Net_PosSize'] = cot_df['PMPUL_PosSize'] - cot_df['PMPUS_PosSize']
-        cot_df.fillna(method='ffill', inplace=True)
-
-        cot_features = ['MML_Concentration', 'MML_Clustering', 'MML_PosSize',
-                        'MMS_Concentration', 'MMS_Clustering', 'MMS_PosSize',
-                        'PMPU_Net_OI', 'PMPU_Net_T', 'PMPU_Net_PosSize']
-        
-        cot_df = cot_df[['Date']+cot_features]
-        cot_df.drop(cot_df.tail(1).index, inplace=True)
-
-        # Adding report lag to CoT data
-        cot_df = cot_add_lag(cot_df=cot_df, price_dates=price_df['Date'].to_list())
+        #- Importing CoT features, with the report lag added (cached between runs)
+        cot_df = feature_cache.get_lagged_features(symbol, price_dates=price_df['Date'].to_list())
 
         # Concatenating COT and price data on date
         first_cot_date = cot_df['Date'][0]
         price_df = price_df.set_index('Date')[first_cot_date:]
         price_df.reset_index(inplace=True)
-        price_df['symbol'] = symbol
-        cot_df['symbol'] = symbol
 
-        # Merging data for all instruments
-        price_data = pd.concat([price_data, price_df], ignore_index=True, sort=False)
-        cot_data = pd.concat([cot_data, cot_df], ignore_index=True, sort=False)
-
-    price_data['Date'] = pd.to_datetime(price_data['Date'], format='%Y-%m-%d')
-    cot_data['Date'] = pd.to_datetime(cot_data['Date'], format='%Y-%m-%d')
+        price_df['Date'] = pd.to_datetime(price_df['Date'], format='%Y-%m-%d')
+        cot_df['Date'] = pd.to_datetime(cot_df['Date'], format='%Y-%m-%d')
+        price_dfs[symbol] = price_df
+        cot_dfs[symbol] = cot_df
+
+    return price_dfs, cot_dfs
+
+def merge_bt_data(price_dfs: dict, cot_dfs: dict) -> dict:
+    ''' Merges the price and COT data prepared with get_bt_data into a single DataFrame per symbol, read by
+    PriceCOT_ArrayData: the COT reports (already lagged onto trading dates) are carried forward until the next one, and
+    the 'COT_Report' column flags the dates a new report is released
+    '''
+    merged_dfs = dict()
+    for symbol, price_df in price_dfs.items():
+        cot_df = cot_dfs[symbol].assign(COT_Report=1.0)
+        merged_df = price_df.merge(cot_df, on='Date', how='left', sort=True)
+        merged_df['COT_Report'] = merged_df['COT_Report'].fillna(0.0)
+        cot_columns = [column for column in cot_df.columns if column not in ['Date', 'COT_Report']]
+        merged_df[cot_columns] = merged_df[cot_columns].ffill()
+        merged_dfs[symbol] = merged_df
+
+    return merged_dfs
+
+def get_cerebro(price_dfs: dict, cot_dfs: dict, strategy=COT_Breakout,
+                price_feed=Price_ArrayData, cot_feed=COT_ArrayData, comm_factory=FuturesCommFactory, profile=False, **strategy_params) -> bt.Cerebro:
+    ''' Sets up cerebro (broker, COT_Breakout strategy and data feeds) for the data prepared with get_bt_data
+    :param cot_dfs: COT data by symbol, or None with merged price & COT data (see merge_bt_data) as price_dfs and
+    price_feed=PriceCOT_ArrayData, so that each symbol has a single feed
+    :param price_feed, cot_feed: Data feed classes, reading the price_dfs and cot_dfs values (the array-backed feeds by
+    default, feeds.pandas' PandasData feeds read the same DataFrames)
+    :param comm_factory: Factory class of the symbols' commission schemes (see FuturesCommFactory)
+    :param profile: Adds the HotPathProfiler analyzer (as 'profiler'), timing the run's hot path
+    :param strategy_params: COT_Breakout parameters (other than symbols)
+    '''
+    symbols_list = list(price_dfs.keys())
 
     # Instanciating cerebro
     cerebro = bt.Cerebro()
@@ -90,22 +86,30 @@ def btrun():
     cerebro.broker.set_cash(1.5e6)
 
     # Adding strategy to cerebro and setting the initial cash
-    cerebro.addstrategy(COT_Breakout, cot_component_name='mm_concentration', symbols=symbols_list)
+    cerebro.addstrategy(strategy, symbols=symbols_list, **strategy_params)
     
     # Adding Price DataFeed
-    comminfo_facory = FuturesCommFactory()
-    for symbol, df in price_data.groupby(by='symbol'):
-        price_btdata = Price_PandasData(dataname=df.drop(labels=['symbol'], axis=1))
+    comminfo_facory = comm_factory()
+    for symbol in sorted(symbols_list):
+        price_btdata = price_feed(dataname=price_dfs[symbol])
         cerebro.adddata(data=price_btdata, name=f"{symbol}")
         comminfo_bt = comminfo_facory.create_comminfo(instrument_symbol=symbol)
-        cerebro.broker.addcommissioninfo(comminfo=comminfo_bt, name=f'{symbol}_price')
+        cerebro.broker.addcommissioninfo(comminfo=comminfo_bt, name=f"{symbol}")
 
     # Adding COT DataFeed
-    for symbol, df in cot_data.groupby(by='symbol'):
-        cot_btdata = COT_PandasData(dataname=df.drop(labels=['symbol'], axis=1))
+    for symbol in (sorted(symbols_list) if cot_dfs is not None else list()):
+        cot_btdata = cot_feed(dataname=cot_dfs[symbol])
         cerebro.adddata(data=cot_btdata, name=f"{symbol}_cot")
-    
+
+    if profile:
+        cerebro.addanalyzer(HotPathProfiler, _name='profiler')
+
+    return cerebro
+
+def btrun():
+    price_dfs, cot_dfs = get_bt_data(SYMBOLS)
+    cerebro = get_cerebro(merge_bt_data(price_dfs, cot_dfs), None, price_feed=PriceCOT_ArrayData, cot_component_name='mm_concentration')
     results = cerebro.run()
 
 if __name__ == "__main__":
-    btrun()
\ No newline at end of file
+    btrun()
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+def legacy_cot_week2day(cot_df:pd.DataFrame, daily_dates:list, consolidated_path=None, date_label='Date', date_format='%Y-%m-%d') -> pd.DataFrame:
+    ''' cot.cot_week2day as it was before being vectorized (one scan of the weekly dates per day), kept as the
+    reference of the equivalence tests and benchmarks
+    '''
+    cot_raw_inputs = [str(column) for column in cot_df.columns.to_list() if (column != date_label)]
+    daily_dates_dt = [datetime.strptime(dd, date_format) for dd in daily_dates]
+    weekly_dates_dt = [datetime.strptime(wd, date_format) for wd in cot_df[date_label].to_list()]
+    df = pd.DataFrame(columns=cot_raw_inputs, index=daily_dates)
+    last_weekly_date_dt = weekly_dates_dt[0]
+    for daily_date_dt in daily_dates_dt:
+        foward_weekly_dates_dt = [fwd for fwd in weekly_dates_dt if fwd > daily_date_dt]
+        if (len(foward_weekly_dates_dt)>0) and (last_weekly_date_dt != foward_weekly_dates_dt[0]):
+            last_weekly_date_dt = foward_weekly_dates_dt[0]
+            cot_values = cot_df[cot_df[date_label] == last_weekly_date_dt.strftime(date_format)]
+            cot_values = cot_values[cot_raw_inputs].iloc[0].to_dict()
+        elif len(foward_weekly_dates_dt) == 0:
+            if daily_date_dt < last_weekly_date_dt + timedelta(days=6):
+                cot_values = cot_df[cot_df[date_label] == last_weekly_date_dt.strftime(date_format)]
+                cot_values = cot_values[cot_raw_inputs].iloc[0].to_dict()
+            else:
+                cot_values = [np.nan]*len(cot_raw_inputs)
+        else:
+            cot_values = cot_df[cot_df[date_label] == last_weekly_date_dt.strftime(date_format)]
+            cot_values = cot_values[cot_raw_inputs].iloc[0].to_dict()
+
+        daily_date = daily_date_dt.strftime(date_format)
+        df.loc[daily_date] = cot_values
+
+    df.index.name = date_label
+    df.reset_index(inplace=True)
+    return df
@@ -1,281 +1,289 @@
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
 from instruments import get_instrument, futures_contract_code
+from store import write_store_table, append_store_table, get_store_path, get_store_price_path
+from manifest import check_raw_file, get_last_date
 from tqdm import tqdm
 
-def clean_df_columns(df:pd.DataFrame):
-    columns = [str(c) for c in df.columns]
-    cleaned_df = df.copy()
-
-    # Drops any Unnamed columns
-    cleaned_df = cleaned_df.loc[:, ~cleaned_df.columns.str.contains('^Unnamed')]
-
-    # Trims unwanted blank spaces from the columns' name
-    columns_mapper = dict()
-    for column in columns:
-        columns_mapper[column] = column.strip()
-    cleaned_df.rename(columns=columns_mapper, inplace=True)
-
-    return cleaned_df
-
-def clean_and_export_price_data(symbol:str, raw_path: str, consolidated_path: str):
-    ''' Function that cleans and exports price database for some instrument '''
-    
-    mapper = {
-        'CO': {
-            'suffix': {
-                'perpetual': '',
-                'single_contract': ''
-            },
-            'available_years': [],
-            'available_months': []
+# CSI raw file names and available contracts by symbol
+CSI_MAPPER = {
+    'CO': {
+        'suffix': {
+            'perpetual': '',
+            'single_contract': ''
         },
-        'CL': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        'available_years': [],
+        'available_months': []
+    },
+    'CL': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'CC': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024'],
-            'available_months': [3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    },
+    'CC': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'KC': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024'],
+        'available_months': [3, 5, 7, 9, 12]
+    },
+    'KC': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'HG': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025', '2026', '2027'],
-            'available_months': [3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [3, 5, 7, 9, 12]
+    },
+    'HG': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'C': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2_'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025', '2026', '2027'],
+        'available_months': [3, 5, 7, 9, 12]
+    },
+    'C': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2_'
         },
-        'CT': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '_'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [3, 5, 7, 10, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [3, 5, 7, 9, 12]
+    },
+    'CT': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '_'
         },
-        'FC': {
-            'suffix': {
-                'perpetual': '_P',
-                'single_contract': '_'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [1, 3, 4, 5, 8, 9, 10, 11]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [3, 5, 7, 10, 12]
+    },
+    'FC': {
+        'suffix': {
+            'perpetual': '_P',
+            'single_contract': '_'
         },
-        'LC': {
-            'suffix': {
-                'perpetual': '_P',
-                'single_contract': '_'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [2, 4, 6, 8, 10, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [1, 3, 4, 5, 8, 9, 10, 11]
+    },
+    'LC': {
+        'suffix': {
+            'perpetual': '_P',
+            'single_contract': '_'
         },
-        'QS': {
-            'suffix': {
-                'perpetual': '_P',
-                'single_contract': ''
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024'],
-            'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [2, 4, 6, 8, 10, 12]
+    },
+    'QS': {
+        'suffix': {
+            'perpetual': '_P',
+            'single_contract': ''
         },
-        'XB': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024'],
+        'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    },
+    'XB': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'GC': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025', '2026'],
-            'available_months': [2, 4, 6, 8, 10, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    },
+    'GC': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'HO': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025', '2026'],
+        'available_months': [2, 4, 6, 8, 10, 12]
+    },
+    'HO': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'KW': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    },
+    'KW': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'W': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2_'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [3, 5, 7, 9, 12]
+    },
+    'W': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2_'
         },
-        'LH': {
-            'suffix': {
-                'perpetual': '_P',
-                'single_contract': '_'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [3, 5, 7, 9, 12]
+    },
+    'LH': {
+        'suffix': {
+            'perpetual': '_P',
+            'single_contract': '_'
         },
-        'NG': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024'],
-            'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [3, 5, 7, 9, 12]
+    },
+    'NG': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'PA': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024'],
+        'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    },
+    'PA': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'PL': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023'],
-            'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    },
+    'PL': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'SI': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025', '2026'],
-            'available_months': [1, 3, 5, 7, 9, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023'],
+        'available_months': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    },
+    'SI': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'BO': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [1, 3, 5, 7, 8, 9, 10, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025', '2026'],
+        'available_months': [1, 3, 5, 7, 9, 12]
+    },
+    'BO': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'S': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2_'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [1, 3, 5, 7, 8, 9, 11]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [1, 3, 5, 7, 8, 9, 10, 12]
+    },
+    'S': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2_'
         },
-        'SM': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [1, 3, 5, 7, 8, 9, 10, 12]
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [1, 3, 5, 7, 8, 9, 11]
+    },
+    'SM': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
         },
-        'SB': {
-            'suffix': {
-                'perpetual': '2_P',
-                'single_contract': '2'
-            },
-            'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
-                                '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
-                                '2018', '2019', '2020', '2021', '2022', '2023', '2024',
-                                '2025'],
-            'available_months': [3, 5, 7, 10]
-        }
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [1, 3, 5, 7, 8, 9, 10, 12]
+    },
+    'SB': {
+        'suffix': {
+            'perpetual': '2_P',
+            'single_contract': '2'
+        },
+        'available_years': ['2006', '2007', '2008', '2007', '2008', '2009', '2010',
+                            '2011', '2012', '2013', '2014', '2015', '2016', '2017', 
+                            '2018', '2019', '2020', '2021', '2022', '2023', '2024',
+                            '2025'],
+        'available_months': [3, 5, 7, 10]
     }
+}
+
+def clean_df_columns(df:pd.DataFrame):
+    columns = [str(c) for c in df.columns]
+    cleaned_df = df.copy()
+
+    # Drops any Unnamed columns
+    cleaned_df = cleaned_df.loc[:, ~cleaned_df.columns.str.contains('^Unnamed')]
+
+    # Trims unwanted blank spaces from the columns' name
+    columns_mapper = dict()
+    for column in columns:
+        columns_mapper[column] = column.strip()
+    cleaned_df.rename(columns=columns_mapper, inplace=True)
+
+    return cleaned_df
+
+def clean_and_export_price_data(symbol:str, raw_path: str, consolidated_path: str, export_store=True):
+    ''' Function that cleans and exports price database for some instrument
+    :param export_store: Also exports the data to the columnar (Parquet) store under consolidated_path
+    '''
 
     raw_folder_path = f"{raw_path}\\price"
     consolidated_folder_path = f"{consolidated_path}\\price"
+    store_path = get_store_path(consolidated_path)
     if not os.path.isdir(consolidated_folder_path):
         os.mkdir(consolidated_folder_path)
     
@@ -285,33 +293,133 @@ def clean_and_export_price_data(symbol:str, raw_path: str, consolidated_path: st
         name = instrument['name']
         instrument_consolidated_folder_path = f"{consolidated_folder_path}\\{symbol}"
 
-        raw_perpetual_file_name = csi_symbol + mapper[symbol]['suffix']['perpetual']
+        raw_perpetual_file_name = csi_symbol + CSI_MAPPER[symbol]['suffix']['perpetual']
         raw_perpetual_file_path = raw_folder_path + '\\' + raw_perpetual_file_name + '.csv'
         if os.path.isdir(consolidated_folder_path):
-            raw_df = pd.read_csv(raw_perpetual_file_path, header=0)
-            perpetual_df = clean_df_columns(df=raw_df)
-            perpetual_df['Date'] = pd.to_datetime(perpetual_df['Date'], format='%Y/%m/%d')
-            perpetual_df.sort_values('Date', inplace=True)
-            perpetual_df['Date'] = perpetual_df['Date'].dt.strftime('%Y-%m-%d')
+            perpetual_df = read_raw_price_file(raw_perpetual_file_path)
             if not os.path.isdir(instrument_consolidated_folder_path):
                 os.mkdir(instrument_consolidated_folder_path)
             perpetual_df.to_csv(instrument_consolidated_folder_path + '\\' + 'perpetual_OI.csv', index=False)
+            if export_store:
+                write_store_table(perpetual_df, get_store_price_path(symbol, store_path))
 
         print("({} - Price)".format(name))
-        for year in tqdm(mapper[symbol]['available_years']):
-            for month in mapper[symbol]['available_months']:
-                raw_single_contract_file_name = csi_symbol + mapper[symbol]['suffix']['single_contract'] + futures_contract_code(year, month)
+        single_contract_dfs = []
+        for year in tqdm(CSI_MAPPER[symbol]['available_years']):
+            for month in CSI_MAPPER[symbol]['available_months']:
+                raw_single_contract_file_name = csi_symbol + CSI_MAPPER[symbol]['suffix']['single_contract'] + futures_contract_code(year, month)
                 raw_single_contract_file_path = raw_folder_path + '\\' + raw_single_contract_file_name + '.csv'
 
                 if os.path.isfile(raw_single_contract_file_path):
-                    raw_df = pd.read_csv(raw_single_contract_file_path, header=0)
-                    single_contract_df = clean_df_columns(df=raw_df)
-                    single_contract_df['Date'] = pd.to_datetime(single_contract_df['Date'], format='%Y/%m/%d')
-                    single_contract_df.sort_values('Date', inplace=True)
-                    single_contract_df['Date'] = single_contract_df['Date'].dt.strftime('%Y-%m-%d')
+                    single_contract_df = read_raw_price_file(raw_single_contract_file_path)
                     if not os.path.isdir(consolidated_folder_path):
                         os.mkdir(consolidated_folder_path)
                     single_contract_df.to_csv(instrument_consolidated_folder_path + '\\' + futures_contract_code(year, month) + '.csv', index=False)
+                    single_contract_dfs.append(single_contract_df.assign(Contract=futures_contract_code(year, month)))
+
+        # All single contracts go to one table per symbol, identified by the 'Contract' column
+        if export_store and single_contract_dfs:
+            contracts_df = pd.concat(single_contract_dfs, ignore_index=True, sort=False)
+            contracts_df.drop_duplicates(subset=['Contract', 'Date'], inplace=True)
+            write_store_table(contracts_df, get_store_price_path(symbol, store_path, is_single_contract=True))
+
+def update_price_data(symbol:str, raw_path: str, consolidated_path: str, manifest: dict, export_store=True) -> int:
+    ''' Incrementally updates the price database of some instrument: raw files unchanged since the last update are
+    skipped and only the rows after each file's last ingested date are appended
+    :param manifest: Manifest loaded with manifest.load_manifest (updated in place)
+    :return: Number of rows appended
+    '''
+    consolidated_folder_path = f"{consolidated_path}\\price"
+    store_path = get_store_path(consolidated_path)
+
+    n_rows = 0
+    instrument = get_instrument(symbol)
+    if instrument:
+        instrument_consolidated_folder_path = f"{consolidated_folder_path}\\{symbol}"
+        os.makedirs(instrument_consolidated_folder_path, exist_ok=True)
+        symbol_manifest = manifest.setdefault('price', dict()).setdefault(symbol, dict())
+
+        new_contract_dfs = []
+        for file_key, raw_file_path in get_raw_price_files(symbol, raw_path).items():
+            if not os.path.isfile(raw_file_path):
+                continue
+
+            entry = symbol_manifest.get(file_key)
+            changed, signature = check_raw_file(raw_file_path, entry)
+            if not changed:
+                symbol_manifest[file_key] = dict(entry, **signature)
+                continue
+
+            consolidated_file_path = instrument_consolidated_folder_path + '\\' + file_key + '.csv'
+            last_date = entry['last_date'] if entry else get_last_date(consolidated_file_path)
+
+            price_df = read_raw_price_file(raw_file_path)
+            if last_date:
+                price_df = price_df[price_df['Date'] > last_date]
+
+            if not price_df.empty:
+                price_df.to_csv(consolidated_file_path, mode='a', header=not os.path.isfile(consolidated_file_path), index=False)
+                n_rows += len(price_df)
+                last_date = price_df['Date'].iloc[-1]
+
+                if export_store:
+                    if file_key == 'perpetual_OI':
+                        append_store_table(price_df, get_store_price_path(symbol, store_path))
+                    else:
+                        new_contract_dfs.append(price_df.assign(Contract=file_key))
+
+            symbol_manifest[file_key] = dict(signature, last_date=last_date)
+
+        if new_contract_dfs:
+            contracts_df = pd.concat(new_contract_dfs, ignore_index=True, sort=False)
+            append_store_table(contracts_df, get_store_price_path(symbol, store_path, is_single_contract=True), keys=['Contract', 'Date'])
+
+    return n_rows
+
+def get_raw_price_files(symbol:str, raw_path: str) -> dict:
+    ''' Returns the raw CSI file paths of some instrument by consolidated file name (perpetual_OI or contract code) '''
+    raw_folder_path = f"{raw_path}\\price"
+    csi_symbol = get_instrument(symbol)['csi_symbol']
+
+    raw_files = {'perpetual_OI': raw_folder_path + '\\' + csi_symbol + CSI_MAPPER[symbol]['suffix']['perpetual'] + '.csv'}
+    for year in CSI_MAPPER[symbol]['available_years']:
+        for month in CSI_MAPPER[symbol]['available_months']:
+            contract_code = futures_contract_code(year, month)
+            raw_files[contract_code] = raw_folder_path + '\\' + csi_symbol + CSI_MAPPER[symbol]['suffix']['single_contract'] + contract_code + '.csv'
+
+    return raw_files
+
+def read_raw_price_file(file_path: str) -> pd.DataFrame:
+    ''' Reads and cleans a raw CSI price file, sorted by date (formatted as %Y-%m-%d) '''
+    raw_df = pd.read_csv(file_path, header=0)
+    price_df = clean_df_columns(df=raw_df)
+    price_df['Date'] = pd.to_datetime(price_df['Date'], format='%Y/%m/%d')
+    price_df.sort_values('Date', inplace=True)
+    price_df['Date'] = price_df['Date'].dt.strftime('%Y-%m-%d')
+
+    return price_df
+
+def clean_and_export_price_data_batch(symbols:list, raw_path: str, consolidated_path: str, export_store=True, max_workers=None) -> dict:
+    ''' Cleans and exports the price database of several instruments, one symbol per worker process
+    :return: Time spent (in seconds) on each symbol
+    '''
+    # Created upfront so that the workers don't race to create it
+    consolidated_folder_path = f"{consolidated_path}\\price"
+    if not os.path.isdir(consolidated_folder_path):
+        os.mkdir(consolidated_folder_path)
+
+    timings = dict()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_timed_clean_and_export_price_data, symbol, raw_path, consolidated_path, export_store): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            timings[futures[future]] = future.result()
+
+    return timings
+
+def _timed_clean_and_export_price_data(symbol:str, raw_path: str, consolidated_path: str, export_store: bool) -> float:
+    start_time = perf_counter()
+    clean_and_export_price_data(symbol, raw_path, consolidated_path, export_store=export_store)
+    return perf_counter() - start_time
 
 def get_consolidated_path(symbol:str, data_path: str, is_single_contract=False, contract_code=None) -> str:
     instrument_price_path = f"{data_path}\\price\\{symbol}\\"
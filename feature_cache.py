@@ -0,0 +1,76 @@
+import pandas as pd
+import hashlib
+import json
+import os
+from cot import get_lagged_cot_features, COT_FEATURES
+from manifest import get_file_hash
+from services import COTDataService
+
+class COTFeatureCache():
+    ''' Content-addressed cache of the lagged COT feature frames fed to the backtests. Entries are keyed on the COT
+    source file's hash, the trading dates, the feature list and the lag rules, so any change to them is a cache miss.
+    The least recently used entries are evicted once the cache holds more than max_entries
+    '''
+
+    def __init__(self, cache_path='.\\data\\cache\\cot_features', max_entries=128):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+
+    def get_lagged_features(self, symbol: str, price_dates, features=COT_FEATURES, release_weekday=0, release_delays=None) -> pd.DataFrame:
+        ''' Returns the symbol's lagged COT features (see cot.get_lagged_cot_features), from the cache if possible '''
+        cot_path = COTDataService.get_csv_path(symbol)
+        key = self.get_key(source_hash=get_file_hash(cot_path), price_dates=price_dates, features=features,
+                            release_weekday=release_weekday, release_delays=release_delays)
+
+        cot_df = self.load(key)
+        if cot_df is None:
+            cot_df = COTDataService.get_data_from_csv(symbol)
+            cot_df = get_lagged_cot_features(cot_df, price_dates=price_dates, features=features,
+                                                release_weekday=release_weekday, release_delays=release_delays)
+            self.save(key, cot_df)
+
+        return cot_df
+
+    @staticmethod
+    def get_key(source_hash: str, price_dates, features: list, release_weekday: int, release_delays=None) -> str:
+        price_dates_hash = pd.util.hash_pandas_object(pd.Series(price_dates).astype(str), index=False).to_numpy().tobytes()
+        key_content = json.dumps({
+            'source_hash': source_hash,
+            'price_dates_hash': hashlib.sha256(price_dates_hash).hexdigest(),
+            'features': list(features),
+            'release_weekday': release_weekday,
+            'release_delays': release_delays or dict(),
+        }, sort_keys=True)
+
+        return hashlib.sha256(key_content.encode()).hexdigest()
+
+    def load(self, key: str):
+        ''' Returns the cached frame (None if there isn't one), marking it as recently used '''
+        entry_path = self._get_entry_path(key)
+        if not os.path.isfile(entry_path):
+            return None
+
+        os.utime(entry_path)
+        return pd.read_pickle(entry_path)
+
+    def save(self, key: str, df: pd.DataFrame):
+        os.makedirs(self.cache_path, exist_ok=True)
+        df.to_pickle(self._get_entry_path(key))
+        self.evict()
+
+    def evict(self):
+        ''' Removes the least recently used entries beyond max_entries '''
+        entries = [os.path.join(self.cache_path, file_name) for file_name in os.listdir(self.cache_path) if file_name.endswith('.pkl')]
+        if len(entries) > self.max_entries:
+            entries.sort(key=os.path.getmtime, reverse=True)
+            for entry_path in entries[self.max_entries:]:
+                os.remove(entry_path)
+
+    def clear(self):
+        if os.path.isdir(self.cache_path):
+            for file_name in os.listdir(self.cache_path):
+                if file_name.endswith('.pkl'):
+                    os.remove(os.path.join(self.cache_path, file_name))
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_path, f'{key}.pkl')
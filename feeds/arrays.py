@@ -0,0 +1,186 @@
+import numpy as np
+from backtrader import feed
+
+def dates2num(dates: np.ndarray) -> np.ndarray:
+    ''' Vectorized backtrader date2num: Gregorian ordinal days (as floats), with the time as a fraction of the day '''
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    days = dates.astype('datetime64[D]')
+    ordinals = (days - np.datetime64('0001-01-01', 'D')).astype(np.int64) + 1
+    day_fractions = (dates - days).astype(np.int64) / (24*60*60*1e9)
+
+    return ordinals + day_fractions
+
+class ArrayData(feed.DataBase):
+    ''' Data feed reading from a dict of NumPy arrays by column (as PandasData reads from a DataFrame's columns, and
+    DataFrames are read as well). The arrays are not copied, so the feeds of several runs may be views over the same
+    preloaded dataset. Line params map each line to its column (None if the column is missing)
+    Preloading appends each line's whole column to its buffer at once instead of loading the rows one by one
+    '''
+    params = (
+        ('datetime', 'Date'),
+    )
+
+    def start(self):
+        super(ArrayData, self).start()
+
+        # reset the length with each start
+        self._idx = -1
+
+        columns = self.p.dataname
+        self._dates = dates2num(columns[self.p.datetime])
+        self._columns = list()
+        for datafield in self.getlinealiases():
+            column = getattr(self.p, datafield, None)
+            if datafield == 'datetime' or column is None:
+                continue
+            self._columns.append((getattr(self.lines, datafield), np.asarray(columns[column], dtype=np.float64)))
+
+    def _load(self):
+        self._idx += 1
+
+        if self._idx >= len(self._dates):
+            # exhausted all rows
+            return False
+
+        for line, values in self._columns:
+            line[0] = values[self._idx]
+        self.lines.datetime[0] = self._dates[self._idx]
+
+        return True
+
+    def preload(self):
+        # Filters, input timezones and bounded buffers (exactbars) need the bars to go through load() one by one
+        lines = self.lines.lines
+        if self._filters or self._ffilters or self._tzinput or any(line.mode != line.UnBounded for line in lines):
+            return super(ArrayData, self).preload()
+
+        # Rows within the fromdate/todate params, as load() would keep them
+        start = np.searchsorted(self._dates, self.fromdate, side='left')
+        end = np.searchsorted(self._dates, self.todate, side='right')
+
+        columns = {id(line): values for line, values in self._columns}
+        columns[id(self.lines.datetime)] = self._dates
+        for line in lines:
+            values = columns.get(id(line))
+            if values is None:
+                values = np.full(len(self._dates), np.nan)
+            line.array.frombytes(np.ascontiguousarray(values[start:end], dtype=np.float64).tobytes())
+            line.lencount = end - start
+            line.idx = line.lencount - 1
+
+        self._idx = end - 1
+        self._last()
+        self.home()
+
+class COT_ArrayData(ArrayData):
+
+    linesoverride = True
+
+    lines = (
+        'datetime',
+        'mml_concentration', 'mml_clustering', 'mml_possize',
+        'mms_concentration', 'mms_clustering', 'mms_possize',
+        'pmpu_netoi', 'pmpu_nett', 'pmpu_netpossize'
+    )
+
+    params = (
+        # COT data parameters
+        ('datetime', 'Date'),
+        ('mml_concentration', 'MML_Concentration'),
+        ('mml_clustering', 'MML_Clustering'),
+        ('mml_possize', 'MML_PosSize'),
+        ('mms_concentration', 'MMS_Concentration'),
+        ('mms_clustering', 'MMS_Clustering'),
+        ('mms_possize', 'MMS_PosSize'),
+        ('pmpu_netoi', 'PMPU_Net_OI'),
+        ('pmpu_nett', 'PMPU_Net_T'),
+        ('pmpu_netpossize', 'PMPU_Net_PosSize'),
+    )
+
+class Price_ArrayData(ArrayData):
+
+    linesoverride = True
+
+    lines = ('datetime', 'close', 'open', 'high', 'low', 'openinterest', 'volume', )
+
+    params = (
+        ('datetime', 'Date'),
+        ('close', 'Close'),
+        ('open', 'Open'),
+        ('high', 'High'),
+        ('low', 'Low'),
+        ('openinterest', 'OI'),
+        ('volume', 'Volume'),
+    )
+
+class PriceCOT_ArrayData(ArrayData):
+    ''' Price and (lagged) COT data of a symbol in a single feed, on the trading dates (see cot_bt.merge_bt_data): each
+    COT report is carried forward until the next one, and the cot_report line flags the dates a new report is released
+    '''
+
+    linesoverride = True
+
+    lines = (
+        'datetime', 'close', 'open', 'high', 'low', 'openinterest', 'volume',
+        'mml_concentration', 'mml_clustering', 'mml_possize',
+        'mms_concentration', 'mms_clustering', 'mms_possize',
+        'pmpu_netoi', 'pmpu_nett', 'pmpu_netpossize',
+        'cot_report',
+    )
+
+    params = (
+        ('datetime', 'Date'),
+        ('close', 'Close'),
+        ('open', 'Open'),
+        ('high', 'High'),
+        ('low', 'Low'),
+        ('openinterest', 'OI'),
+        ('volume', 'Volume'),
+        ('mml_concentration', 'MML_Concentration'),
+        ('mml_clustering', 'MML_Clustering'),
+        ('mml_possize', 'MML_PosSize'),
+        ('mms_concentration', 'MMS_Concentration'),
+        ('mms_clustering', 'MMS_Clustering'),
+        ('mms_possize', 'MMS_PosSize'),
+        ('pmpu_netoi', 'PMPU_Net_OI'),
+        ('pmpu_nett', 'PMPU_Net_T'),
+        ('pmpu_netpossize', 'PMPU_Net_PosSize'),
+        ('cot_report', 'COT_Report'),
+    )
+
+# Term-structure feed classes by number of contracts (see get_term_structure_feed)
+_term_structure_feeds = dict()
+
+def get_term_structure_feed(n_contracts: int):
+    ''' Returns the feed class of the front n_contracts of a symbol (see rolls.get_term_structure_arrays): the front
+    contract's prices on the standard price lines, plus close{i}, openinterest{i}, dte{i} and delivery{i} lines for each
+    contract i (1 to n_contracts), all in a single feed
+    '''
+    feed_class = _term_structure_feeds.get(n_contracts)
+    if feed_class is None:
+        lines = list()
+        params = list()
+        for i in range(1, n_contracts + 1):
+            for line, column in [('close', 'Close'), ('openinterest', 'OI'), ('dte', 'DTE'), ('delivery', 'Delivery')]:
+                lines.append(f'{line}{i}')
+                params.append((f'{line}{i}', f'{column}_{i}'))
+
+        feed_class = type(f'TermStructure{n_contracts}_ArrayData', (Price_ArrayData, ), {'lines': tuple(lines), 'params': tuple(params)})
+        _term_structure_feeds[n_contracts] = feed_class
+
+    return feed_class
+
+TermStructure_ArrayData = get_term_structure_feed(3)
+
+def get_column_arrays(df, date_label='Date') -> dict:
+    ''' Converts a DataFrame into the dict of column arrays read by ArrayData (dates as datetime64[ns]) '''
+    arrays = {column: df[column].to_numpy(dtype=np.float64) for column in df.columns if column != date_label}
+    arrays[date_label] = df[date_label].to_numpy().astype('datetime64[ns]')
+    return arrays
+
+def slice_column_arrays(arrays: dict, start_date=None, end_date=None, date_label='Date') -> dict:
+    ''' Returns views (not copies) of the column arrays on the [start_date, end_date) dates '''
+    dates = arrays[date_label]
+    start = 0 if start_date is None else np.searchsorted(dates, np.datetime64(start_date, 'ns'), side='left')
+    end = len(dates) if end_date is None else np.searchsorted(dates, np.datetime64(end_date, 'ns'), side='left')
+    return {column: values[start:end] for column, values in arrays.items()}
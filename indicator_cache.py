@@ -0,0 +1,68 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+class IndicatorCache():
+    ''' Bounded (least recently used) memo of precomputed indicator arrays, keyed on the indicator's class, the
+    content of its data feed and its params. Strategy instances running over the same data (e.g. the runs of a sweep
+    in the same process) replay the cached arrays instead of recomputing them
+    '''
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_arrays(self, indicator, start: int, end: int, compute) -> tuple:
+        ''' Returns the indicator's cached arrays for the [start, end) bars of its once(), calling compute() (which
+        returns a tuple of arrays) on a miss
+        '''
+        key = self.get_key(indicator, start, end)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        arrays = tuple(np.asarray(values, dtype=np.float64) for values in compute())
+        for values in arrays:
+            values.flags.writeable = False
+
+        self._entries[key] = arrays
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        return arrays
+
+    @staticmethod
+    def get_key(indicator, start: int, end: int) -> tuple:
+        params = tuple((name, getattr(indicator.p, name)) for name in indicator.p._getkeys() if name != 'shared')
+        return (type(indicator).__name__, get_data_key(indicator.data), params, start, end)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+def get_data_key(data) -> str:
+    ''' Fingerprint of a (preloaded) data feed's content, computed once per feed '''
+    data_key = getattr(data, '_shared_data_key', None)
+    if data_key is None or data_key[0] != len(data.array):
+        data_hash = hashlib.sha1()
+        for line in data.lines:
+            data_hash.update(np.asarray(line.array, dtype=np.float64).tobytes())
+
+        data_key = (len(data.array), data_hash.hexdigest())
+        data._shared_data_key = data_key
+
+    return data_key[1]
+
+# Cache used by the indicators created with shared=True (one per process)
+shared_indicator_cache = IndicatorCache()
+
+def get_indicator_arrays(indicator, start: int, end: int, compute) -> tuple:
+    ''' Runs compute() for an indicator's once() arrays, through the shared cache if it was created with shared=True '''
+    if indicator.p.shared:
+        return shared_indicator_cache.get_arrays(indicator, start, end, compute)
+    return tuple(compute())
@@ -1,20 +1,133 @@
 import backtrader as bt
-from backtrader.indicators import Highest, Lowest
+import numpy as np
+from array import array
+from collections import deque
+from backtrader.metabase import findowner
+from vector_signals import donchian_channel
+from indicator_cache import get_indicator_arrays
 
 class DonchianChannel(bt.Indicator):
     lines = ('hband','lband','mband', 'wband', )
     params = (
         ('period', 20),
+        ('shared', False),
     )
 
     def __init__(self, *args):
         super(DonchianChannel, self).__init__(*args)
-        period = self.params.period
-        close = self.data.close
-        max = Highest(close, period=period)
-        min = Lowest(close, period=period)
-
-        self.l.hband = max(-1)
-        self.l.lband = min(-1)
-        self.l.mband = (max(-1) + min(-1))/2
-        self.l.wband = max(-1) - min(-1)
\ No newline at end of file
+
+        # Bands are computed over the previous period closes
+        self.addminperiod(self.p.period + 1)
+
+    def next(self):
+        closes = self.data.close.get(ago=-1, size=self.p.period)
+        highest = max(closes)
+        lowest = min(closes)
+
+        self.l.hband[0] = highest
+        self.l.lband[0] = lowest
+        self.l.mband[0] = (highest + lowest)/2
+        self.l.wband[0] = highest - lowest
+
+    def once(self, start, end):
+        close = np.asarray(self.data.close.array[:end], dtype=np.float64)
+        bands = get_indicator_arrays(self, start, end, lambda: donchian_channel(close, period=self.p.period))
+        for line, band in zip([self.l.hband, self.l.lband, self.l.mband, self.l.wband], bands):
+            line.array[start:end] = array('d', band[start:end])
+
+class RollingExtrema(bt.Indicator):
+    ''' Highest and lowest of the last period values (as Highest/Lowest), computed together with monotonic deques
+    in O(1) amortized time per bar, whatever the period
+    '''
+    lines = ('highest', 'lowest', )
+    params = (
+        ('period', 52),
+    )
+
+    def __init__(self, *args):
+        super(RollingExtrema, self).__init__(*args)
+        self.addminperiod(self.p.period)
+        self._window = MonotonicWindow(self.p.period)
+        self._pushed_len = 0
+
+    def prenext(self):
+        self._push()
+
+    def next(self):
+        self._push()
+        self.l.highest[0] = self._window.highest
+        self.l.lowest[0] = self._window.lowest
+
+    def _push(self):
+        # next() runs on every tick of the strategy, also when the data (e.g. a weekly COT line) hasn't advanced
+        if len(self.data) > self._pushed_len:
+            self._pushed_len = len(self.data)
+            self._window.push(self.data[0])
+
+    def once(self, start, end):
+        values = self.data.array
+        highest = self.l.highest.array
+        lowest = self.l.lowest.array
+
+        # end may go beyond the data when it has less than period values
+        window = MonotonicWindow(self.p.period)
+        for i in range(0, min(end, len(values))):
+            window.push(values[i])
+            if i >= start:
+                highest[i] = window.highest
+                lowest[i] = window.lowest
+
+class MonotonicWindow():
+    ''' Rolling max/min over the last period values pushed, keeping decreasing (max) and increasing (min) deques of
+    (index, value) pairs
+    '''
+
+    def __init__(self, period: int):
+        self.period = period
+        self._count = 0
+        self._max_deque = deque()
+        self._min_deque = deque()
+
+    def push(self, value: float):
+        index = self._count
+        self._count += 1
+
+        while self._max_deque and self._max_deque[-1][1] <= value:
+            self._max_deque.pop()
+        self._max_deque.append((index, value))
+
+        while self._min_deque and self._min_deque[-1][1] >= value:
+            self._min_deque.pop()
+        self._min_deque.append((index, value))
+
+        # Dropping values that left the window
+        first_index = index - self.period + 1
+        if self._max_deque[0][0] < first_index:
+            self._max_deque.popleft()
+        if self._min_deque[0][0] < first_index:
+            self._min_deque.popleft()
+
+    @property
+    def highest(self) -> float:
+        return self._max_deque[0][1]
+
+    @property
+    def lowest(self) -> float:
+        return self._min_deque[0][1]
+
+def get_rolling_extrema(owner, line, period: int) -> RollingExtrema:
+    ''' Returns the RollingExtrema of a line over period, creating it only once per strategy, so that every signal
+    requesting the same (line, period) shares it
+    :param owner: Indicator (or strategy) requesting it
+    '''
+    strategy = findowner(owner, bt.Strategy)
+    if strategy is None:
+        strategy = owner
+    if not hasattr(strategy, '_rolling_extrema'):
+        strategy._rolling_extrema = dict()
+
+    key = (id(line), period)
+    if key not in strategy._rolling_extrema:
+        strategy._rolling_extrema[key] = RollingExtrema(line, period=period)
+
+    return strategy._rolling_extrema[key]
@@ -0,0 +1,75 @@
+import argparse
+from time import perf_counter
+from csi import clean_and_export_price_data_batch, update_price_data
+from cot import clean_and_export_cot_data_batch, update_cot_data_batch
+from manifest import load_manifest, save_manifest
+
+# Symbols with consolidated price and COT data
+ALL_SYMBOLS = [
+    'BO', 'C', 'CC', 'CL', 'CT', 'FC', 'GC', 'HG',
+    'HO', 'KC', 'KW', 'LC', 'LH', 'NG', 'PA', 'PL',
+    'QS', 'S', 'SB', 'SI', 'SM', 'W', 'XB'
+]
+
+def run_ingestion(symbols: list, raw_path: str, consolidated_path: str, export_store=True, max_workers=None) -> dict:
+    ''' Refreshes the consolidated price and COT data of all symbols in one pass: price files are processed across a
+    process pool and each raw COT report file is read only once
+    :return: Time spent (in seconds) on each stage
+    '''
+    timings = dict()
+
+    start_time = perf_counter()
+    timings['price_by_symbol'] = clean_and_export_price_data_batch(symbols, raw_path, consolidated_path, export_store=export_store, max_workers=max_workers)
+    timings['price'] = perf_counter() - start_time
+
+    start_time = perf_counter()
+    cot_timings = clean_and_export_cot_data_batch(symbols, raw_path, consolidated_path, export_store=export_store)
+    timings['cot'] = perf_counter() - start_time
+    timings.update({f'cot_{stage}': stage_time for stage, stage_time in cot_timings.items()})
+
+    timings['total'] = timings['price'] + timings['cot']
+    print_timings(timings)
+
+    return timings
+
+def run_incremental_update(symbols: list, raw_path: str, consolidated_path: str, export_store=True) -> dict:
+    ''' Appends only the new rows of changed raw files to the consolidated data, tracking the last ingested dates and
+    raw file signatures in the consolidated path's manifest
+    :return: Number of rows appended on each stage
+    '''
+    manifest = load_manifest(consolidated_path)
+
+    start_time = perf_counter()
+    n_price_rows = sum(update_price_data(symbol, raw_path, consolidated_path, manifest, export_store=export_store) for symbol in symbols)
+    price_time = perf_counter() - start_time
+
+    start_time = perf_counter()
+    n_cot_rows = update_cot_data_batch(symbols, raw_path, consolidated_path, manifest, export_store=export_store)
+    cot_time = perf_counter() - start_time
+
+    save_manifest(manifest, consolidated_path)
+    print(f'price: {n_price_rows} new rows ({price_time:.2f}s)')
+    print(f'cot: {n_cot_rows} new rows ({cot_time:.2f}s)')
+
+    return {'price': n_price_rows, 'cot': n_cot_rows}
+
+def print_timings(timings: dict):
+    for symbol, symbol_time in sorted(timings['price_by_symbol'].items(), key=lambda item: -item[1]):
+        print(f'  price [{symbol}]: {symbol_time:.2f}s')
+    for stage in ['price', 'cot', 'cot_read', 'cot_split', 'cot_export', 'total']:
+        print(f'{stage}: {timings[stage]:.2f}s')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Refreshes the consolidated price and COT data')
+    parser.add_argument('raw_path')
+    parser.add_argument('consolidated_path')
+    parser.add_argument('--symbols', nargs='+', default=ALL_SYMBOLS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-store', action='store_true', help="Don't export the columnar (Parquet) store")
+    parser.add_argument('--incremental', action='store_true', help='Only appends the new rows of changed raw files')
+    args = parser.parse_args()
+
+    if args.incremental:
+        run_incremental_update(args.symbols, args.raw_path, args.consolidated_path, export_store=not args.no_store)
+    else:
+        run_ingestion(args.symbols, args.raw_path, args.consolidated_path, export_store=not args.no_store, max_workers=args.workers)
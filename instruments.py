@@ -204,4 +204,11 @@ def int2str_month_decoder(month: int):
     elif month == 12:
         month_code = 'Z'
     
-    return month_code
\ No newline at end of file
+    return month_code
+
+def str2int_month_decoder(month_code: str):
+    for month in range(1, 13):
+        if int2str_month_decoder(month) == month_code:
+            return month
+
+    return None
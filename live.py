@@ -0,0 +1,292 @@
+import argparse
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from services import PriceDataService
+from feature_cache import COTFeatureCache
+from cot_bt import get_bt_data, SYMBOLS, PRICE_RAW_INPUTS
+from vector_bt import get_comm_inputs, get_kernel_state, _run_kernel, KERNEL_STATE, COT_COLUMNS
+from vector_signals import donchian_channel, breakout_signal, compute_cot_signal, COT_SIGNAL_INPUTS
+
+PRICE_BUFFER_COLUMNS = ['Close', 'High', 'Low']
+PRICE_INPUTS = ['close', 'high', 'low', 'mband', 'breakout']
+
+class LivePortfolio():
+    ''' COT_Breakout portfolio updated day by day: each update only runs the bars appended since the last one, resuming
+    the NumPy kernel of vector_bt (same rules as the Backtrader strategy) from its snapshot, and returns the target
+    orders to be sent for the next session
+    The snapshot holds the kernel state (cash, positions, entries_count, initial COT signals and pending orders), the
+    last values of each symbol's inputs (carried forward on dates without a bar) and only the last bars the indicators
+    look back on (breakout_period prices and cot_component_period COT reports), so an update costs O(new bars)
+    '''
+
+    def __init__(self, symbols: list, cash=1.5e6, slip_perc=0.005, slip_open=False, breakout_period=20, n_entries=3,
+                    cot_component_name=None, cot_component_period=52, cot_threshold=70) -> None:
+        if not cot_component_name:
+            raise ValueError("The COT component name must be passed as a parameter with keyword 'cot_component_name'")
+
+        self.symbols = list(symbols)
+        self.slip_perc = float(slip_perc)
+        self.slip_open = bool(slip_open)
+        self.breakout_period = breakout_period
+        self.n_entries = int(n_entries)
+        self.cot_component_name = cot_component_name
+        self.cot_component_period = cot_component_period
+        self.cot_threshold = cot_threshold
+
+        n_symbols = len(self.symbols)
+        self.comm_inputs = get_comm_inputs(self.symbols)
+        self.state = get_kernel_state(n_symbols, cash=float(cash))
+        self.cot_lines = COT_SIGNAL_INPUTS[cot_component_name]
+
+        # Indicators' lookback windows, by symbol
+        self.price_buffers = {symbol: _get_empty_buffer(PRICE_BUFFER_COLUMNS) for symbol in self.symbols}
+        self.cot_buffers = {symbol: _get_empty_buffer(self.cot_lines) for symbol in self.symbols}
+
+        # Inputs of the last date, carried forward for the symbols without a bar on the next ones
+        self.last_inputs = {name: np.full(n_symbols, np.nan) for name in PRICE_INPUTS + ['cot']}
+        self.last_inputs['price_active'] = np.zeros(n_symbols, dtype=np.bool_)
+        self.last_inputs['cot_active'] = np.zeros(n_symbols, dtype=np.bool_)
+        self.last_date = None
+
+        # Results of the last update
+        self.equity = pd.Series(dtype=np.float64, name='Equity')
+        self.trades = _get_trades_frame(list(), list(), list(), list(), list())
+
+    @property
+    def cash(self) -> float:
+        return float(self.state['account'][0])
+
+    @property
+    def value(self) -> float:
+        return float(self.state['account'][1])
+
+    def get_positions(self) -> pd.Series:
+        return pd.Series(self.state['position'], index=self.symbols, name='position')
+
+    def get_last_dates(self, symbol: str) -> tuple:
+        ''' Dates of the symbol's last price bar and COT report (None before the first update) '''
+        price_dates = self.price_buffers[symbol]['Date']
+        cot_dates = self.cot_buffers[symbol]['Date']
+        return (price_dates[-1] if len(price_dates) else None), (cot_dates[-1] if len(cot_dates) else None)
+
+    def update(self, price_dfs: dict, cot_dfs: dict) -> pd.DataFrame:
+        ''' Runs the bars after the last update's date and returns the orders to be sent (see get_orders). The first
+        update bootstraps the portfolio over the whole history
+        :param price_dfs, cot_dfs: Dicts of DataFrames by symbol, as cot_bt.get_bt_data (or get_new_bt_data) prepares
+        them. The rows already run are skipped, so the whole history may be passed as well
+        '''
+        new_rows = dict()
+        for symbol in self.symbols:
+            price_df = price_dfs.get(symbol)
+            cot_df = cot_dfs.get(symbol)
+            new_rows[symbol] = (
+                _get_new_rows(self.price_buffers[symbol], price_df, PRICE_BUFFER_COLUMNS),
+                _get_new_rows(self.cot_buffers[symbol], cot_df, [COT_COLUMNS[line_name] for line_name in self.cot_lines]),
+            )
+
+        # New dates of the portfolio. Rows dated on (or before) the last update's date, e.g. late COT reports, are
+        # applied on the first new date
+        all_dates = np.concatenate([rows['Date'] for price_rows, cot_rows in new_rows.values() for rows in [price_rows, cot_rows]])
+        dates = np.unique(all_dates if self.last_date is None else all_dates[all_dates > self.last_date])
+        if not len(dates):
+            self.equity = self.equity[:0]
+            self.trades = self.trades[:0]
+            return self.get_orders()
+
+        n_symbols = len(self.symbols)
+        inputs = {name: np.empty((len(dates), n_symbols)) for name in PRICE_INPUTS + ['cot']}
+        price_active = np.empty((len(dates), n_symbols), dtype=np.bool_)
+        cot_active = np.empty((len(dates), n_symbols), dtype=np.bool_)
+        for i, symbol in enumerate(self.symbols):
+            price_rows, cot_rows = new_rows[symbol]
+            price_values = self._get_price_values(symbol, price_rows)
+            cot_values = self._get_cot_values(symbol, cot_rows)
+
+            price_index = np.searchsorted(np.maximum(price_rows['Date'], dates[0]), dates, side='right') - 1
+            for name in PRICE_INPUTS:
+                inputs[name][:, i] = _carry_forward(price_values[name], price_index, self.last_inputs[name][i])
+            price_active[:, i] = _carry_forward(price_values['price_active'], price_index, self.last_inputs['price_active'][i])
+
+            cot_index = np.searchsorted(np.maximum(cot_rows['Date'], dates[0]), dates, side='right') - 1
+            inputs['cot'][:, i] = _carry_forward(cot_values, cot_index, self.last_inputs['cot'][i])
+            cot_active[:, i] = _carry_forward(~np.isnan(cot_values), cot_index, self.last_inputs['cot_active'][i])
+
+            self.price_buffers[symbol] = _get_buffer_tail(self.price_buffers[symbol], price_rows, self.breakout_period)
+            self.cot_buffers[symbol] = _get_buffer_tail(self.cot_buffers[symbol], cot_rows, self.cot_component_period)
+
+        # The orders pending from the last update are filled on the first new bar, at their own date's close
+        self.state['order_bar'][:] = -1
+        values, _, trade_bar, trade_symbol, trade_size, trade_price, trade_commission, _ = _run_kernel(
+            inputs['close'], inputs['high'], inputs['low'], inputs['mband'], inputs['breakout'], inputs['cot'], price_active & cot_active,
+            self.comm_inputs['mult'], self.comm_inputs['margin'], self.comm_inputs['commission'],
+            self.n_entries, self.slip_perc, self.slip_open, *[self.state[name] for name in KERNEL_STATE])
+
+        trade_dates = dates[np.maximum(trade_bar, 0)]
+        if self.last_date is not None:
+            trade_dates[trade_bar < 0] = self.last_date
+        self.trades = _get_trades_frame(trade_dates, np.array(self.symbols, dtype=object)[trade_symbol], trade_size, trade_price, trade_commission)
+        self.equity = pd.Series(values, index=pd.DatetimeIndex(dates, name='Date'), name='Equity')
+
+        for name in PRICE_INPUTS + ['cot']:
+            self.last_inputs[name] = inputs[name][-1].copy()
+        self.last_inputs['price_active'] = price_active[-1].copy()
+        self.last_inputs['cot_active'] = cot_active[-1].copy()
+        self.last_date = dates[-1]
+
+        return self.get_orders()
+
+    def get_orders(self) -> pd.DataFrame:
+        ''' Orders created on the last date, to be filled at its close (as the cheat-on-close market orders of the
+        backtests), with the resulting target positions
+        '''
+        state = self.state
+        indices = np.flatnonzero(state['has_order'])
+        position = state['position'][indices]
+        size = state['order_size'][indices]
+        action = np.where(position == 0, 'entry', np.where(np.sign(size) == np.sign(position), 'increase', 'close'))
+
+        return pd.DataFrame({
+            'Date': np.full(len(indices), self.last_date, dtype='datetime64[ns]'),
+            'symbol': np.array(self.symbols, dtype=object)[indices],
+            'action': action,
+            'size': size,
+            'price': state['order_price'][indices],
+            'stop': self.last_inputs['mband'][indices],
+            'position': position,
+            'target_position': position + size,
+        })
+
+    def _get_price_values(self, symbol: str, price_rows: dict) -> dict:
+        # Indicators of the new price rows, computed over them and the lookback window before them
+        buffer = self.price_buffers[symbol]
+        n_buffer = len(buffer['Date'])
+        close = np.concatenate([buffer['Close'], price_rows['Close']])
+        hband, lband, mband, wband = donchian_channel(close, period=self.breakout_period)
+        breakout = breakout_signal(close, mband, wband)
+        is_valid = np.isfinite(hband) & np.isfinite(lband) & np.isfinite(mband) & np.isfinite(wband) & ~np.isnan(breakout)
+
+        return {
+            'close': price_rows['Close'],
+            'high': price_rows['High'],
+            'low': price_rows['Low'],
+            'mband': mband[n_buffer:],
+            'breakout': breakout[n_buffer:],
+            'price_active': is_valid[n_buffer:],
+        }
+
+    def _get_cot_values(self, symbol: str, cot_rows: dict) -> np.ndarray:
+        # COT signal of the new reports, computed over them and the lookback window before them
+        buffer = self.cot_buffers[symbol]
+        n_buffer = len(buffer['Date'])
+        cot_lines = {line_name: np.concatenate([buffer[line_name], cot_rows[line_name]]) for line_name in self.cot_lines}
+        cot_signal = compute_cot_signal(self.cot_component_name, cot_lines, period=self.cot_component_period, threshold=self.cot_threshold)
+        return cot_signal[n_buffer:]
+
+    def save(self, file_path: str):
+        with open(file_path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(file_path: str):
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+
+def _get_empty_buffer(columns: list) -> dict:
+    buffer = {column: np.empty(0) for column in columns}
+    buffer['Date'] = np.empty(0, dtype='datetime64[ns]')
+    return buffer
+
+def _get_new_rows(buffer: dict, df, columns: list) -> dict:
+    # Rows of df after the buffer's last date, as arrays keyed as the buffer
+    if df is None or df.empty:
+        return {key: values[:0] for key, values in buffer.items()}
+
+    dates = pd.to_datetime(df['Date']).to_numpy().astype('datetime64[ns]')
+    start = np.searchsorted(dates, buffer['Date'][-1], side='right') if len(buffer['Date']) else 0
+    new_rows = {key: df[column].to_numpy(dtype=np.float64)[start:] for key, column in zip(_get_buffer_keys(buffer), columns)}
+    new_rows['Date'] = dates[start:]
+    return new_rows
+
+def _get_buffer_keys(buffer: dict) -> list:
+    return [key for key in buffer.keys() if key != 'Date']
+
+def _get_buffer_tail(buffer: dict, new_rows: dict, size: int) -> dict:
+    return {key: np.concatenate([buffer[key], new_rows[key]])[-size:] for key in buffer.keys()}
+
+def _carry_forward(values: np.ndarray, index: np.ndarray, last_value) -> np.ndarray:
+    # Values of the last row on (or before) each date, or last_value before the first one
+    return np.where(index >= 0, values[np.maximum(index, 0)] if len(values) else last_value, last_value)
+
+def _get_trades_frame(dates, symbols, sizes, prices, commissions) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Date': np.asarray(dates, dtype='datetime64[ns]'),
+        'symbol': np.asarray(symbols, dtype=object),
+        'size': np.asarray(sizes, dtype=np.float64),
+        'price': np.asarray(prices, dtype=np.float64),
+        'commission': np.asarray(commissions, dtype=np.float64),
+    })
+
+def get_new_bt_data(portfolio: LivePortfolio, from_store=True, price_raw_inputs=PRICE_RAW_INPUTS) -> tuple:
+    ''' Prepares the price and (lagged) COT data appended since the portfolio's last update, as cot_bt.get_bt_data
+    does for the whole history. From the store, only the price rows after the last bar are read (and the dates column,
+    which the COT report lag is computed on); from the .csv files, the whole files are read and sliced
+    :return: Tuple (price_dfs, cot_dfs) of dicts of DataFrames by symbol, with dates as datetime64
+    '''
+    if not from_store and portfolio.last_date is None:
+        return get_bt_data(portfolio.symbols, price_raw_inputs=price_raw_inputs)
+
+    feature_cache = COTFeatureCache()
+    price_dfs = dict()
+    cot_dfs = dict()
+    for symbol in portfolio.symbols:
+        last_price_date, last_cot_date = portfolio.get_last_dates(symbol)
+
+        if from_store:
+            price_df = PriceDataService.get_data_from_store(symbol, columns=price_raw_inputs, after_date=last_price_date)
+            price_dates = PriceDataService.get_data_from_store(symbol, columns=['Date'])['Date']
+        else:
+            price_df = PriceDataService.get_data_from_csv(symbol)
+            price_dates = price_df['Date']
+        price_df = price_df[['Date'] + price_raw_inputs]
+
+        cot_df = feature_cache.get_lagged_features(symbol, price_dates=price_dates.to_list())
+        cot_df['Date'] = pd.to_datetime(cot_df['Date'], format='%Y-%m-%d')
+        price_df['Date'] = pd.to_datetime(price_df['Date'], format='%Y-%m-%d')
+
+        # As get_bt_data, the price data starts on the first COT date
+        if len(cot_df):
+            price_df = price_df[price_df['Date'] >= cot_df['Date'].iloc[0]]
+        if last_price_date is not None:
+            price_df = price_df[price_df['Date'] > last_price_date]
+        if last_cot_date is not None:
+            cot_df = cot_df[cot_df['Date'] > last_cot_date]
+
+        price_dfs[symbol] = price_df.reset_index(drop=True)
+        cot_dfs[symbol] = cot_df.reset_index(drop=True)
+
+    return price_dfs, cot_dfs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Updates a live COT_Breakout portfolio with the bars appended since its last update')
+    parser.add_argument('snapshot_path', help='Pickle file of the portfolio (bootstrapped over the whole history if it does not exist)')
+    parser.add_argument('--bootstrap', action='store_true', help='Bootstraps the portfolio again, even if the snapshot exists')
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS)
+    parser.add_argument('--cot-component', default='mm_concentration')
+    parser.add_argument('--csv', action='store_true', help='Reads the .csv files instead of the store')
+    args = parser.parse_args()
+
+    if args.bootstrap or not os.path.isfile(args.snapshot_path):
+        portfolio = LivePortfolio(args.symbols, cot_component_name=args.cot_component)
+    else:
+        portfolio = LivePortfolio.load(args.snapshot_path)
+
+    price_dfs, cot_dfs = get_new_bt_data(portfolio, from_store=not args.csv)
+    orders = portfolio.update(price_dfs, cot_dfs)
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(f'{portfolio.last_date}: value {portfolio.value:.2f}, cash {portfolio.cash:.2f}')
+        print(portfolio.trades)
+        print(orders)
+    portfolio.save(args.snapshot_path)
@@ -0,0 +1,57 @@
+import pandas as pd
+import hashlib
+import json
+import os
+
+def get_manifest_path(consolidated_path: str) -> str:
+    return f"{consolidated_path}\\manifest.json"
+
+def load_manifest(consolidated_path: str) -> dict:
+    ''' Loads the manifest of the last ingested dates and raw file signatures (empty if there isn't one yet) '''
+    manifest_path = get_manifest_path(consolidated_path)
+
+    manifest = dict()
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    return manifest
+
+def save_manifest(manifest: dict, consolidated_path: str):
+    manifest_path = get_manifest_path(consolidated_path)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def check_raw_file(file_path: str, entry=None):
+    ''' Checks if a raw file changed since its manifest entry was recorded. The file is only hashed when its mtime or
+    size differ from the entry's
+    :return: Tuple (changed, signature), where signature is the file's current mtime, size and hash
+    '''
+    signature = {'mtime': os.path.getmtime(file_path), 'size': os.path.getsize(file_path)}
+    if entry and entry.get('mtime') == signature['mtime'] and entry.get('size') == signature['size']:
+        signature['hash'] = entry.get('hash')
+        return False, signature
+
+    signature['hash'] = get_file_hash(file_path)
+    changed = not entry or entry.get('hash') != signature['hash']
+
+    return changed, signature
+
+def get_file_hash(file_path: str) -> str:
+    file_hash = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+def get_last_date(consolidated_file_path: str, date_label='Date'):
+    ''' Returns the last date of a consolidated .csv file (None if the file doesn't exist or is empty) '''
+    if not os.path.isfile(consolidated_file_path):
+        return None
+
+    dates = pd.read_csv(consolidated_file_path, usecols=[date_label])[date_label]
+    if dates.empty:
+        return None
+
+    return str(dates.max())
@@ -0,0 +1,104 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+from cot import get_lagged_cot_features, COT_FEATURES
+from services import PriceDataService, COTDataService
+
+PRICE_FIELDS = ['Close', 'Open', 'High', 'Low', 'OI', 'Volume']
+
+class Panel():
+    ''' Universe data aligned on a single date axis, stored as a (symbol x date x field) float64 array.
+    The values may be a read-only memory map shared by several processes
+    '''
+
+    def __init__(self, symbols: list, dates: np.ndarray, fields: list, values: np.ndarray):
+        self.symbols = list(symbols)
+        self.dates = dates
+        self.fields = list(fields)
+        self.values = values
+        self._symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+
+    def get(self, symbol: str, field: str) -> np.ndarray:
+        ''' Returns a (zero-copy) view of a single symbol's field '''
+        return self.values[self._symbol_index[symbol], :, self._field_index[field]]
+
+    def get_symbol(self, symbol: str) -> np.ndarray:
+        ''' Returns a (zero-copy) (date x field) view of a single symbol '''
+        return self.values[self._symbol_index[symbol]]
+
+    def to_frame(self, symbol: str, dropna=True, date_label='Date') -> pd.DataFrame:
+        ''' Rebuilds the symbol's DataFrame (dates as datetime64), dropping the dates where it has no data '''
+        df = pd.DataFrame(self.get_symbol(symbol), columns=self.fields)
+        df.insert(0, date_label, self.dates)
+        if dropna:
+            df = df.dropna(subset=self.fields, how='all').reset_index(drop=True)
+        return df
+
+def build_panel(dfs: dict, fields: list, date_label='Date', date_format='%Y-%m-%d') -> Panel:
+    ''' Aligns the DataFrames of several symbols on the union of their dates
+    :param dfs: Dict of DataFrames by symbol, with date_label and fields columns
+    '''
+    symbols_dates = dict()
+    for symbol, df in dfs.items():
+        dates = pd.to_datetime(df[date_label], format=date_format).to_numpy().astype('datetime64[ns]')
+        symbols_dates[symbol] = dates
+
+    all_dates = np.unique(np.concatenate(list(symbols_dates.values()))) if symbols_dates else np.array([], dtype='datetime64[ns]')
+    values = np.full((len(dfs), len(all_dates), len(fields)), np.nan, dtype=np.float64)
+    for i, (symbol, df) in enumerate(dfs.items()):
+        date_rows = np.searchsorted(all_dates, symbols_dates[symbol])
+        values[i, date_rows, :] = df[fields].to_numpy(dtype=np.float64)
+
+    return Panel(symbols=list(dfs.keys()), dates=all_dates, fields=fields, values=values)
+
+def build_price_panel(symbols: list, fields=PRICE_FIELDS) -> Panel:
+    ''' Builds the perpetual price panel of the symbols passed '''
+    price_dfs = {symbol: PriceDataService.get_data_from_csv(symbol) for symbol in symbols}
+    return build_panel(price_dfs, fields=fields)
+
+def build_cot_panel(symbols: list, price_panel: Panel, features=COT_FEATURES) -> Panel:
+    ''' Builds the (lagged) COT features panel of the symbols passed on the price panel's date axis. Each report
+    is placed on the date it can be traded, all other dates are NaN
+    '''
+    cot_dfs = dict()
+    for symbol in symbols:
+        price_dates = price_panel.dates[~np.isnan(price_panel.get(symbol, price_panel.fields[0]))]
+
+        cot_df = COTDataService.get_data_from_csv(symbol)
+        cot_df = get_lagged_cot_features(cot_df, price_dates=price_dates, features=features)
+        cot_dfs[symbol] = cot_df.drop_duplicates(subset='Date', keep='last')
+
+    cot_panel = build_panel(cot_dfs, fields=features)
+    return align_panel(cot_panel, price_panel.dates)
+
+def align_panel(panel: Panel, dates: np.ndarray) -> Panel:
+    ''' Reindexes a panel on another date axis (dates missing from it are dropped) '''
+    values = np.full((len(panel.symbols), len(dates), len(panel.fields)), np.nan, dtype=np.float64)
+    date_rows = np.searchsorted(dates, panel.dates)
+    is_aligned = (date_rows < len(dates)) & (dates[np.minimum(date_rows, len(dates)-1)] == panel.dates)
+    values[:, date_rows[is_aligned], :] = panel.values[:, is_aligned, :]
+
+    return Panel(symbols=panel.symbols, dates=dates, fields=panel.fields, values=values)
+
+def save_panel(panel: Panel, panel_path: str, name: str):
+    ''' Persists a panel as .npy files (values and dates) plus a .json file with its symbols and fields '''
+    if not os.path.isdir(panel_path):
+        os.makedirs(panel_path)
+
+    np.save(f"{panel_path}\\{name}.npy", np.ascontiguousarray(panel.values, dtype=np.float64))
+    np.save(f"{panel_path}\\{name}_dates.npy", panel.dates.astype('datetime64[ns]').astype(np.int64))
+    with open(f"{panel_path}\\{name}.json", 'w') as f:
+        json.dump({'symbols': panel.symbols, 'fields': panel.fields}, f)
+
+def load_panel(panel_path: str, name: str, mmap_mode='r') -> Panel:
+    ''' Loads a panel saved with save_panel. With mmap_mode='r' the values are a read-only memory map, so every
+    process loading it shares the same pages instead of holding its own copy
+    '''
+    values = np.load(f"{panel_path}\\{name}.npy", mmap_mode=mmap_mode)
+    dates = np.load(f"{panel_path}\\{name}_dates.npy").astype('datetime64[ns]')
+    with open(f"{panel_path}\\{name}.json", 'r') as f:
+        metadata = json.load(f)
+
+    return Panel(symbols=metadata['symbols'], dates=dates, fields=metadata['fields'], values=values)
@@ -0,0 +1,142 @@
+import argparse
+from time import perf_counter
+import pandas as pd
+import backtrader as bt
+
+class HotPathProfiler(bt.Analyzer):
+    ''' Records the time spent on the hot path of a PortfolioStrategyBase run: the strategy's bar steps, pnext,
+    _is_active and order calls, each indicator's and signal's next/once (nested indicators included) and the broker's
+    order checks and executions. The methods are only wrapped while the analyzer is added to cerebro (and restored
+    when the run stops), so runs without it are not slowed down at all
+    Frames are attributed to the symbol of the indicator, signal or order they run for (or of the frame they run in)
+    '''
+
+    def start(self):
+        self._stack = list()
+        self._stats = dict()
+        self._patched = list()
+
+        strategy = self.strategy
+        self._patch(strategy, '_once', 'strategy.once')
+        self._patch(strategy, '_oncepost', 'strategy.next')
+        self._patch(strategy, '_next', 'strategy.next')
+        self._patch(strategy, 'pnext', 'pnext')
+        self._patch(strategy, '_is_active', '_is_active', get_symbol=lambda args, kwargs: args[0] if args else kwargs.get('symbol'))
+        for method_name in ['buy', 'sell', 'close']:
+            self._patch(strategy, method_name, method_name, get_symbol=_get_order_call_symbol)
+
+        patched_indicators = set()
+        for group_name in ['inds', 'signals']:
+            for symbol, indicators in getattr(strategy, group_name, dict()).items():
+                for name, indicator in indicators.items():
+                    self._patch_indicator(indicator, f'{group_name}.{name}', symbol, patched_indicators)
+
+        broker = strategy.broker
+        self._patch(broker, 'next', 'broker.next')
+        self._patch(broker, 'check_submitted', 'broker.check_submitted')
+        self._patch(broker, '_execute', 'broker.execute', get_symbol=lambda args, kwargs: args[0].data._name)
+
+    def stop(self):
+        # The instance attributes are removed, so the class methods are used again
+        for obj, name in reversed(self._patched):
+            delattr(obj, name)
+        self._patched = list()
+
+        self.rets['stats'] = self.get_report().to_dict('records')
+        self.rets['stacks'] = self.get_collapsed_stacks()
+
+    def _patch_indicator(self, indicator, component: str, symbol, patched_indicators: set):
+        if id(indicator) in patched_indicators:
+            return
+        patched_indicators.add(id(indicator))
+
+        self._patch(indicator, '_next', component, symbol=symbol)
+        self._patch(indicator, '_once', component, symbol=symbol)
+        # Line operations (e.g. a - b) have no children of their own
+        lineiterators = getattr(indicator, '_lineiterators', None)
+        for child in (lineiterators[bt.LineIterator.IndType] if lineiterators is not None else list()):
+            self._patch_indicator(child, type(child).__name__, None, patched_indicators)
+
+    def _patch(self, obj, name: str, component: str, symbol=None, get_symbol=None):
+        func = getattr(obj, name)
+        profiler = self
+
+        def profiled(*args, **kwargs):
+            profiler._enter(component, get_symbol(args, kwargs) if get_symbol is not None else symbol)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler._exit()
+
+        setattr(obj, name, profiled)
+        self._patched.append((obj, name))
+
+    def _enter(self, component: str, symbol=None):
+        if self._stack:
+            parent = self._stack[-1]
+            path = parent[0]
+            symbol = symbol if symbol is not None else parent[1]
+        else:
+            path = tuple()
+
+        label = component if symbol is None else f'{component}[{symbol}]'
+        self._stack.append([path + (label, ), symbol, component, perf_counter(), 0.0])
+
+    def _exit(self):
+        path, symbol, component, start_time, child_time = self._stack.pop()
+        elapsed = perf_counter() - start_time
+
+        stats = self._stats.get(path)
+        if stats is None:
+            stats = self._stats[path] = [component, symbol, 0, 0.0, 0.0]
+        stats[2] += 1
+        stats[3] += elapsed
+        stats[4] += elapsed - child_time
+
+        if self._stack:
+            self._stack[-1][4] += elapsed
+
+    def get_report(self) -> pd.DataFrame:
+        ''' Calls and time (in seconds) by component and symbol, the self time excluding the nested frames' time '''
+        report = pd.DataFrame([stats for stats in self._stats.values()], columns=['component', 'symbol', 'calls', 'total_time', 'self_time'])
+        report['symbol'] = report['symbol'].fillna('')
+        report = report.groupby(['component', 'symbol'], as_index=False).sum()
+        return report.sort_values('self_time', ascending=False).reset_index(drop=True)
+
+    def get_symbol_report(self) -> pd.DataFrame:
+        ''' Self time (in seconds) by symbol and component, with the portfolio-level frames under an empty symbol '''
+        return self.get_report().pivot_table(index='symbol', columns='component', values='self_time', aggfunc='sum', fill_value=0.0)
+
+    def get_collapsed_stacks(self) -> list:
+        ''' Self time of each call stack in the collapsed format of flamegraph.pl (and speedscope), in microseconds '''
+        return [f"{';'.join(path)} {round(stats[4] * 1e6)}" for path, stats in self._stats.items() if round(stats[4] * 1e6) > 0]
+
+    def dump_flamegraph(self, file_path: str):
+        with open(file_path, 'w') as f:
+            f.write('\n'.join(self.get_collapsed_stacks()) + '\n')
+
+def _get_order_call_symbol(args, kwargs):
+    # The data of buy/sell/close is their first argument or the 'data' keyword (the first data feed if not passed)
+    data = kwargs.get('data')
+    if data is None and args:
+        data = args[0]
+    return data._name if data is not None else None
+
+if __name__ == "__main__":
+    from cot_bt import get_bt_data, get_cerebro, SYMBOLS
+    parser = argparse.ArgumentParser(description='Profiles the hot path of a COT_Breakout run')
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS)
+    parser.add_argument('--cot-component', default='mm_concentration')
+    parser.add_argument('--no-runonce', action='store_true', help='Runs the indicators bar by bar (next) instead of vectorized (once)')
+    parser.add_argument('--flamegraph', default=None, help='File the collapsed stacks are dumped to')
+    args = parser.parse_args()
+
+    price_dfs, cot_dfs = get_bt_data(args.symbols)
+    cerebro = get_cerebro(price_dfs, cot_dfs, cot_component_name=args.cot_component, profile=True)
+    profiler = cerebro.run(runonce=not args.no_runonce)[0].analyzers.profiler
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(profiler.get_report())
+        print(profiler.get_symbol_report())
+    if args.flamegraph:
+        profiler.dump_flamegraph(args.flamegraph)
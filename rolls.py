@@ -0,0 +1,373 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+from csi import CSI_MAPPER
+from instruments import futures_contract_code, str2int_month_decoder
+from services import PriceDataService
+
+CONTRACT_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume', 'OI', 'TotalVolume', 'TotalOI']
+# Fields shifted (or scaled) by the roll adjustments, the others are the held contract's
+ADJUSTED_FIELDS = ['Open', 'High', 'Low', 'Close']
+# Field compared between consecutive contracts by each roll rule (None for the calendar rule)
+ROLL_RULES = {'open_interest': 'OI', 'volume': 'Volume', 'calendar': None}
+ADJUSTMENTS = ['back', 'ratio', 'none']
+
+class ContractMatrix():
+    ''' A symbol's single contracts aligned on a single date axis, stored as a (contract x date x field) float64 array,
+    with the contracts sorted by delivery month
+    '''
+
+    def __init__(self, symbol: str, contracts: list, delivery_months: np.ndarray, dates: np.ndarray, fields: list, values: np.ndarray):
+        self.symbol = symbol
+        self.contracts = list(contracts)
+        self.delivery_months = delivery_months
+        self.dates = dates
+        self.fields = list(fields)
+        self.values = values
+        self._contract_index = {contract: i for i, contract in enumerate(self.contracts)}
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+
+        # First and last rows each contract is quoted on (-1 if it never is)
+        quoted = ~np.isnan(self.get('Close'))
+        has_quotes = quoted.any(axis=1)
+        if len(self.dates):
+            self.first_rows = np.where(has_quotes, quoted.argmax(axis=1), -1)
+            self.last_rows = np.where(has_quotes, len(self.dates) - 1 - quoted[:, ::-1].argmax(axis=1), -1)
+        else:
+            self.first_rows = self.last_rows = np.full(len(self.contracts), -1)
+        self._filled_closes = None
+
+    def get(self, field: str) -> np.ndarray:
+        ''' Returns a (zero-copy) (contract x date) view of a field '''
+        return self.values[:, :, self._field_index[field]]
+
+    def get_contract(self, contract: str) -> np.ndarray:
+        ''' Returns a (zero-copy) (date x field) view of a single contract '''
+        return self.values[self._contract_index[contract]]
+
+    def get_contract_index(self, contract: str) -> int:
+        return self._contract_index[contract]
+
+    def get_filled_closes(self) -> np.ndarray:
+        ''' Closes forward filled along the dates (each contract's last quote up to each date) '''
+        if self._filled_closes is None:
+            closes = self.get('Close')
+            quoted_rows = np.where(~np.isnan(closes), np.arange(len(self.dates)), 0)
+            last_quoted_rows = np.maximum.accumulate(quoted_rows, axis=1)
+            self._filled_closes = np.take_along_axis(closes, last_quoted_rows, axis=1)
+
+        return self._filled_closes
+
+    def get_expiry_dates(self) -> np.ndarray:
+        ''' Contracts' expiry dates: the last quote of the contracts that stopped trading before the matrix's last date,
+        and for the others their delivery month shifted by the symbol's median offset between both (the delivery month
+        itself if no contract expired yet)
+        '''
+        last_dates = self.dates[np.maximum(self.last_rows, 0)].astype('datetime64[D]') if len(self.dates) else self.delivery_months
+        expired = (self.last_rows >= 0) & (self.last_rows < len(self.dates) - 1)
+        offset = int(np.median((last_dates[expired] - self.delivery_months[expired]).astype(np.int64))) if expired.any() else 0
+        return np.where(expired, last_dates, self.delivery_months + np.timedelta64(offset, 'D'))
+
+def get_contract_codes(symbol: str) -> list:
+    ''' Returns the symbol's contract codes (see csi.CSI_MAPPER), sorted by delivery month '''
+    years = sorted(set(CSI_MAPPER[symbol]['available_years']))
+    return [futures_contract_code(year, month) for year in years for month in sorted(CSI_MAPPER[symbol]['available_months'])]
+
+def get_delivery_month(contract_code: str) -> np.datetime64:
+    ''' Returns the first day of a contract's delivery month (e.g. 2006H -> 2006-03-01) '''
+    return np.datetime64(f'{contract_code[:4]}-{str2int_month_decoder(contract_code[4:]):02d}-01', 'D')
+
+def get_numeric_delivery_months(delivery_months: np.ndarray) -> np.ndarray:
+    ''' Returns delivery months as the CSI files' NumericDeliveryMonth (e.g. 2006-03-01 -> 200603) '''
+    months = delivery_months.astype('datetime64[M]').astype(np.int64)
+    return (months // 12 + 1970) * 100 + months % 12 + 1
+
+def build_contract_matrix(symbol: str, contract_dfs: dict, fields=CONTRACT_FIELDS, date_label='Date', date_format='%Y-%m-%d') -> ContractMatrix:
+    ''' Aligns the single contracts' DataFrames on the union of their dates (missing fields are left as NaN)
+    :param contract_dfs: Dict of DataFrames by contract code, with date_label and fields columns
+    '''
+    contracts = sorted(contract_dfs.keys(), key=get_delivery_month)
+    contracts_dates = dict()
+    for contract in contracts:
+        contracts_dates[contract] = pd.to_datetime(contract_dfs[contract][date_label], format=date_format).to_numpy().astype('datetime64[ns]')
+
+    all_dates = np.unique(np.concatenate(list(contracts_dates.values()))) if contracts_dates else np.array([], dtype='datetime64[ns]')
+    values = np.full((len(contracts), len(all_dates), len(fields)), np.nan, dtype=np.float64)
+    for i, contract in enumerate(contracts):
+        date_rows = np.searchsorted(all_dates, contracts_dates[contract])
+        values[i, date_rows, :] = contract_dfs[contract].reindex(columns=fields).to_numpy(dtype=np.float64)
+
+    delivery_months = np.array([get_delivery_month(contract) for contract in contracts], dtype='datetime64[D]')
+    return ContractMatrix(symbol=symbol, contracts=contracts, delivery_months=delivery_months, dates=all_dates, fields=fields, values=values)
+
+def load_contract_matrix(symbol: str, from_store=False, fields=CONTRACT_FIELDS) -> ContractMatrix:
+    ''' Builds the contract matrix of the symbol's consolidated single contracts (the .csv files or the store's table) '''
+    contract_dfs = dict()
+    if from_store:
+        contracts_df = PriceDataService.get_data_from_store(symbol, is_single_contract=True)
+        for contract, contract_df in contracts_df.groupby('Contract', sort=False):
+            contract_dfs[contract] = contract_df.sort_values('Date')
+    else:
+        for contract in get_contract_codes(symbol):
+            if os.path.isfile(PriceDataService.get_csv_path(symbol, is_single_contract=True, contract_code=contract)):
+                contract_dfs[contract] = PriceDataService.get_data_from_csv(symbol, is_single_contract=True, contract_code=contract)
+
+    return build_contract_matrix(symbol, contract_dfs, fields=fields)
+
+def get_roll_rows(matrix: ContractMatrix, rule='open_interest', roll_days=None, start_row=0, start_contract=0) -> np.ndarray:
+    ''' Returns the rows each contract is rolled on, from start_contract (held from start_row on) to the last contract:
+    contract k is held up to the row before roll_rows[k], and contracts rolled on the row they'd be held from are skipped
+    - open_interest/volume rules: Rolls on the row after the next contract's OI/Volume first exceeds the held one's
+    - calendar rule: Rolls roll_days calendar days before the held contract's delivery month
+    Contracts are always rolled the row after their last quote, and roll_days (if passed) caps the OI/Volume rolls too
+    '''
+    if rule not in ROLL_RULES:
+        raise ValueError(f"Unknown roll rule: {rule} (expected one of {list(ROLL_RULES.keys())})")
+
+    n_dates = len(matrix.dates)
+    contracts = np.arange(start_contract, len(matrix.contracts))
+
+    # Latest roll rows: the row after each contract's last quote and, with roll_days, the calendar roll
+    bounds = matrix.last_rows[contracts] + 1
+    if rule == 'calendar' or roll_days is not None:
+        roll_dates = matrix.delivery_months[contracts] - np.timedelta64(roll_days or 0, 'D')
+        bounds = np.minimum(bounds, np.searchsorted(matrix.dates, roll_dates.astype(matrix.dates.dtype)))
+
+    # Earliest roll row from each row on (n_dates if none), for each contract and its next one, as a reversed running
+    # minimum of the rows the next contract's field exceeds the held one's (NaNs never do)
+    next_roll_rows = None
+    if ROLL_RULES[rule] is not None and len(contracts) > 1:
+        field = matrix.get(ROLL_RULES[rule])[start_contract:, start_row:]
+        with np.errstate(invalid='ignore'):
+            exceeds = field[1:] > field[:-1]
+        roll_rows = np.where(exceeds, np.arange(start_row + 1, n_dates + 1), n_dates)
+        next_roll_rows = np.minimum.accumulate(roll_rows[:, ::-1], axis=1)[:, ::-1]
+        next_roll_rows = np.concatenate([next_roll_rows, np.full((len(contracts) - 1, 1), n_dates)], axis=1)
+
+    # Each contract is held from the previous one's roll, so the rolls are chained contract by contract (the per-date
+    # work is all done above)
+    roll_rows = np.empty(len(contracts), dtype=np.int64)
+    row = start_row
+    for i in range(len(contracts)):
+        roll_row = bounds[i]
+        if next_roll_rows is not None and i < len(contracts) - 1:
+            roll_row = min(roll_row, next_roll_rows[i, min(row, n_dates) - start_row])
+        row = max(row, min(roll_row, n_dates))
+        roll_rows[i] = row
+
+    return roll_rows
+
+def get_roll_schedule(matrix: ContractMatrix, rule='open_interest', roll_days=None, schedule=None) -> pd.DataFrame:
+    ''' Returns the roll schedule of a contract matrix (see get_roll_rows): the contracts held and the dates they're held
+    from ('Date' and 'Contract' columns)
+    :param schedule: Schedule previously computed on the first dates of the same matrix. Its rolls are kept and only the
+    ones from its last contract on are recomputed (the rules only look at the data up to each roll)
+    '''
+    start_row = 0
+    start_contract = 0
+    kept_schedule = None
+    if schedule is not None and len(schedule):
+        start_row = int(np.searchsorted(matrix.dates, np.datetime64(schedule['Date'].iloc[-1], 'ns')))
+        start_contract = matrix.get_contract_index(schedule['Contract'].iloc[-1])
+        kept_schedule = schedule.iloc[:-1]
+
+    roll_rows = get_roll_rows(matrix, rule=rule, roll_days=roll_days, start_row=start_row, start_contract=start_contract)
+    start_rows = np.concatenate([[start_row], roll_rows[:-1]])
+    held = start_rows < roll_rows
+
+    new_schedule = pd.DataFrame({
+        'Date': pd.DatetimeIndex(matrix.dates[start_rows[held]]).strftime('%Y-%m-%d'),
+        'Contract': [matrix.contracts[i] for i in (start_contract + np.flatnonzero(held))],
+    })
+    if kept_schedule is None:
+        return new_schedule
+    return pd.concat([kept_schedule, new_schedule], ignore_index=True)
+
+def build_continuous_contract(matrix: ContractMatrix, schedule: pd.DataFrame, adjustment='back') -> pd.DataFrame:
+    ''' Builds the continuous series of a roll schedule, with the prices before each roll adjusted by its gap (the
+    contracts' closes on the day before the roll):
+    - back: The difference between the contracts is added to the prices before the roll
+    - ratio: The prices before the roll are multiplied by the ratio between the contracts
+    - none: Raw prices of the contracts held
+    :return: DataFrame with the perpetual .csv files' columns plus the 'Contract' held, on the dates it is quoted
+    '''
+    if adjustment not in ADJUSTMENTS:
+        raise ValueError(f"Unknown adjustment: {adjustment} (expected one of {ADJUSTMENTS})")
+
+    columns = ['Date', 'Contract', 'NumericDeliveryMonth'] + matrix.fields
+    if not len(schedule):
+        return pd.DataFrame(columns=columns)
+
+    start_rows = np.searchsorted(matrix.dates, pd.to_datetime(schedule['Date'], format='%Y-%m-%d').to_numpy().astype(matrix.dates.dtype))
+    contract_indices = np.array([matrix.get_contract_index(contract) for contract in schedule['Contract']], dtype=np.int64)
+
+    rows = np.arange(start_rows[0], len(matrix.dates))
+    segments = np.searchsorted(start_rows, rows, side='right') - 1
+    held_contracts = contract_indices[segments]
+    values = matrix.values[held_contracts, rows].copy()
+
+    # Gap of each roll (segment i -> i + 1), adjusting all the segments before it
+    filled_closes = matrix.get_filled_closes()
+    roll_rows = start_rows[1:] - 1
+    old_closes = filled_closes[contract_indices[:-1], roll_rows]
+    new_closes = filled_closes[contract_indices[1:], roll_rows]
+    adjusted_columns = [matrix.fields.index(field) for field in ADJUSTED_FIELDS if field in matrix.fields]
+    if adjustment == 'back':
+        gaps = np.nan_to_num(new_closes - old_closes, nan=0.0)
+        offsets = np.append(np.cumsum(gaps[::-1])[::-1], 0.0)
+        values[:, adjusted_columns] += offsets[segments, np.newaxis]
+    elif adjustment == 'ratio':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = new_closes / old_closes
+        ratios = np.where(np.isfinite(ratios) & (ratios > 0), ratios, 1.0)
+        factors = np.append(np.cumprod(ratios[::-1])[::-1], 1.0)
+        values[:, adjusted_columns] *= factors[segments, np.newaxis]
+
+    continuous_df = pd.DataFrame(values, columns=matrix.fields)
+    continuous_df.insert(0, 'Date', pd.DatetimeIndex(matrix.dates[rows]).strftime('%Y-%m-%d'))
+    continuous_df.insert(1, 'Contract', [matrix.contracts[i] for i in held_contracts])
+    continuous_df.insert(2, 'NumericDeliveryMonth', get_numeric_delivery_months(matrix.delivery_months[held_contracts]))
+
+    # Dates the held contract isn't quoted on (e.g. before the first contract trades) are left out
+    return continuous_df[~np.isnan(values[:, matrix.fields.index('Close')])].reset_index(drop=True)
+
+def get_term_structure_arrays(matrix: ContractMatrix, n_contracts=3) -> dict:
+    ''' Returns the front n_contracts of each date as the column arrays read by feeds.arrays.get_term_structure_feed:
+    the front contract's Open, High, Low, Close, Volume and OI, and each contract's (i = 1 to n_contracts) Close_i
+    (last quote), OI_i, DTE_i (calendar days to its expiry, see ContractMatrix.get_expiry_dates) and Delivery_i
+    (NumericDeliveryMonth). The contracts listed on a date are the ones quoted on it or on dates before and after it,
+    ranked by delivery month, and dates the front contract isn't quoted on are left out
+    '''
+    rows = np.arange(len(matrix.dates))
+    listed = (matrix.first_rows[:, np.newaxis] <= rows) & (rows <= matrix.last_rows[:, np.newaxis])
+    ranks = np.cumsum(listed, axis=0) - 1
+
+    filled_closes = matrix.get_filled_closes()
+    open_interests = matrix.get('OI')
+    days_to_expiry = (matrix.get_expiry_dates()[:, np.newaxis] - matrix.dates.astype('datetime64[D]')).astype(np.float64)
+    numeric_delivery_months = get_numeric_delivery_months(matrix.delivery_months).astype(np.float64)
+
+    arrays = dict()
+    for i in range(n_contracts):
+        at_rank = listed & (ranks == i)
+        has_contract = at_rank.any(axis=0)
+        contracts = at_rank.argmax(axis=0)
+        if i == 0:
+            front_has_contract = has_contract
+            front_contracts = contracts
+        arrays[f'Close_{i + 1}'] = np.where(has_contract, filled_closes[contracts, rows], np.nan)
+        arrays[f'OI_{i + 1}'] = np.where(has_contract, open_interests[contracts, rows], np.nan)
+        arrays[f'DTE_{i + 1}'] = np.where(has_contract, days_to_expiry[contracts, rows], np.nan)
+        arrays[f'Delivery_{i + 1}'] = np.where(has_contract, numeric_delivery_months[contracts], np.nan)
+
+    for field in ['Open', 'High', 'Low', 'Close', 'Volume', 'OI']:
+        arrays[field] = np.where(front_has_contract, matrix.get(field)[front_contracts, rows], np.nan)
+
+    quoted = ~np.isnan(arrays['Close'])
+    arrays = {column: values[quoted] for column, values in arrays.items()}
+    arrays['Date'] = matrix.dates[quoted]
+    return arrays
+
+def get_term_structure_data(symbols: list, n_contracts=3, from_store=False) -> dict:
+    ''' Returns the term-structure column arrays of several symbols (see get_term_structure_arrays), to be passed to
+    cot_bt.get_cerebro as price_dfs with price_feed=feeds.arrays.get_term_structure_feed(n_contracts)
+    '''
+    return {symbol: get_term_structure_arrays(load_contract_matrix(symbol, from_store=from_store), n_contracts=n_contracts) for symbol in symbols}
+
+class RollScheduleCache():
+    ''' Roll schedules by symbol and roll rule, one .json file per symbol. A cached schedule is only extended with the
+    rolls after its last contract when its matrix gets new dates (see get_roll_schedule), and recomputed from scratch if
+    the matrix doesn't match it anymore (other first date or contracts)
+    '''
+
+    def __init__(self, cache_path='.\\data\\cache\\rolls'):
+        self.cache_path = cache_path
+
+    def get_schedule(self, matrix: ContractMatrix, rule='open_interest', roll_days=None) -> pd.DataFrame:
+        ''' Returns the matrix's roll schedule (see get_roll_schedule), from the cache if possible '''
+        entries = self.load(matrix.symbol)
+        key = self.get_key(rule, roll_days)
+        first_date, last_date = [str(pd.Timestamp(date).date()) for date in (matrix.dates[0], matrix.dates[-1])]
+
+        entry = entries.get(key)
+        if entry is not None and entry['first_date'] == first_date and entry['last_date'] <= last_date \
+            and entry['contracts'] == matrix.contracts[:len(entry['contracts'])]:
+            schedule = pd.DataFrame(entry['schedule'], columns=['Date', 'Contract'])
+            if entry['last_date'] == last_date and len(entry['contracts']) == len(matrix.contracts):
+                return schedule
+        else:
+            schedule = None
+
+        schedule = get_roll_schedule(matrix, rule=rule, roll_days=roll_days, schedule=schedule)
+        entries[key] = {
+            'first_date': first_date,
+            'last_date': last_date,
+            'contracts': matrix.contracts,
+            'schedule': schedule.values.tolist(),
+        }
+        self.save(matrix.symbol, entries)
+
+        return schedule
+
+    @staticmethod
+    def get_key(rule: str, roll_days=None) -> str:
+        return f'{rule}|{roll_days}'
+
+    def load(self, symbol: str) -> dict:
+        entry_path = self._get_entry_path(symbol)
+        if not os.path.isfile(entry_path):
+            return dict()
+
+        with open(entry_path, 'r') as f:
+            return json.load(f)
+
+    def save(self, symbol: str, entries: dict):
+        os.makedirs(self.cache_path, exist_ok=True)
+        with open(self._get_entry_path(symbol), 'w') as f:
+            json.dump(entries, f)
+
+    def clear(self):
+        if os.path.isdir(self.cache_path):
+            for file_name in os.listdir(self.cache_path):
+                if file_name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_path, file_name))
+
+    def _get_entry_path(self, symbol: str) -> str:
+        return os.path.join(self.cache_path, f'{symbol}.json')
+
+def get_continuous_contract(symbol: str, rule='open_interest', adjustment='back', roll_days=None, matrix=None, cache=None) -> pd.DataFrame:
+    ''' Returns the symbol's continuous contract (see build_continuous_contract)
+    :param matrix: Symbol's contract matrix (loaded from the consolidated .csv files if not passed)
+    :param cache: RollScheduleCache the roll schedule is taken from (computed on the fly if not passed)
+    '''
+    matrix = matrix if matrix is not None else load_contract_matrix(symbol)
+    if cache is not None:
+        schedule = cache.get_schedule(matrix, rule=rule, roll_days=roll_days)
+    else:
+        schedule = get_roll_schedule(matrix, rule=rule, roll_days=roll_days)
+
+    return build_continuous_contract(matrix, schedule, adjustment=adjustment)
+
+def get_continuous_variants(symbol: str, variants: list, matrix=None, cache=None) -> list:
+    ''' Returns the symbol's continuous contracts of several roll variants, loading its contracts once and computing
+    each roll schedule once (variants only differing on the adjustment share it)
+    :param variants: List of dicts with get_continuous_contract's rule, adjustment and roll_days keys
+    '''
+    matrix = matrix if matrix is not None else load_contract_matrix(symbol)
+
+    schedules = dict()
+    continuous_dfs = list()
+    for variant in variants:
+        rule = variant.get('rule', 'open_interest')
+        roll_days = variant.get('roll_days')
+        key = RollScheduleCache.get_key(rule, roll_days)
+        if key not in schedules:
+            if cache is not None:
+                schedules[key] = cache.get_schedule(matrix, rule=rule, roll_days=roll_days)
+            else:
+                schedules[key] = get_roll_schedule(matrix, rule=rule, roll_days=roll_days)
+
+        continuous_dfs.append(build_continuous_contract(matrix, schedules[key], adjustment=variant.get('adjustment', 'back')))
+
+    return continuous_dfs
@@ -1,4 +1,5 @@
 from abc import ABC, abstractclassmethod
+from store import read_store_table, get_store_price_path, get_store_cot_path
 import pandas as pd
 import os
 
@@ -8,12 +9,21 @@ class DataServiceInterface(ABC):
     def get_data_from_csv(cls):
         pass
 
+    @abstractclassmethod
+    def get_data_from_store(cls):
+        pass
+
 class COTDataService(DataServiceInterface):
     __base_path = '.\\data\\cot'
+    __store_path = '.\\data\\store'
     
+    @classmethod
+    def get_csv_path(cls, instrument_symbol: str) -> str:
+        return f"{cls.__base_path}\\{instrument_symbol}.csv"
+
     @classmethod
     def get_data_from_csv(cls, instrument_symbol: str) -> pd.DataFrame:
-        cot_path = f"{cls.__base_path}\\{instrument_symbol}.csv"
+        cot_path = cls.get_csv_path(instrument_symbol)
 
         cot_df = pd.DataFrame()
         if os.path.isfile(cot_path):
@@ -22,22 +32,71 @@ class COTDataService(DataServiceInterface):
             raise Warning(f"There isn't a CoT .csv file for the following symbol: {instrument_symbol}")
 
         return cot_df
+
+    @classmethod
+    def get_data_from_store(cls, instrument_symbol: str, columns=None, parse_dates=False) -> pd.DataFrame:
+        cot_path = get_store_cot_path(instrument_symbol, cls.__store_path)
+
+        cot_df = pd.DataFrame()
+        if os.path.isfile(cot_path):
+            cot_df = read_store_table(cot_path, columns=columns, parse_dates=parse_dates)
+        else:
+            raise Warning(f"There isn't a CoT store file for the following symbol: {instrument_symbol}")
+
+        return cot_df
+
+    @classmethod
+    def get_universe_from_store(cls, instrument_symbols: list, columns=None, parse_dates=False) -> pd.DataFrame:
+        cot_dfs = [cls.get_data_from_store(symbol, columns=columns, parse_dates=parse_dates).assign(symbol=symbol) for symbol in instrument_symbols]
+        return pd.concat(cot_dfs, ignore_index=True, sort=False)
     
 class PriceDataService(DataServiceInterface):
     __base_path = '.\\data\\price'
+    __store_path = '.\\data\\store'
     
     @classmethod
-    def get_data_from_csv(cls, instrument_symbol: str, is_single_contract=False, contract_code=None) -> pd.DataFrame:
+    def get_csv_path(cls, instrument_symbol: str, is_single_contract=False, contract_code=None) -> str:
         price_path = f"{cls.__base_path}\\{instrument_symbol}\\"
         if not is_single_contract:
             price_path += 'perpetual_OI.csv'
         else:
             price_path +=  f'{contract_code}.csv'
 
+        return price_path
+
+    @classmethod
+    def get_data_from_csv(cls, instrument_symbol: str, is_single_contract=False, contract_code=None) -> pd.DataFrame:
+        price_path = cls.get_csv_path(instrument_symbol, is_single_contract=is_single_contract, contract_code=contract_code)
+
         price_df = pd.DataFrame()
         if os.path.isfile(price_path):
             price_df = pd.read_csv(price_path, header=0)
         else:
             raise Warning(f"There isn't a price .csv file for the following symbol: {instrument_symbol}")
 
-        return price_df
\ No newline at end of file
+        return price_df
+
+    @classmethod
+    def get_data_from_store(cls, instrument_symbol: str, is_single_contract=False, contract_code=None, columns=None, parse_dates=False, after_date=None) -> pd.DataFrame:
+        price_path = get_store_price_path(instrument_symbol, cls.__store_path, is_single_contract=is_single_contract)
+
+        if is_single_contract and columns is not None and 'Contract' not in columns:
+            columns = list(columns) + ['Contract']
+
+        price_df = pd.DataFrame()
+        if os.path.isfile(price_path):
+            keys = ['Contract', 'Date'] if is_single_contract else None
+            price_df = read_store_table(price_path, columns=columns, keys=keys, parse_dates=parse_dates, after_date=after_date)
+        else:
+            raise Warning(f"There isn't a price store file for the following symbol: {instrument_symbol}")
+
+        # Single contracts share one table per symbol
+        if is_single_contract and contract_code is not None:
+            price_df = price_df[price_df['Contract'] == contract_code].reset_index(drop=True)
+
+        return price_df
+
+    @classmethod
+    def get_universe_from_store(cls, instrument_symbols: list, columns=None, parse_dates=False) -> pd.DataFrame:
+        price_dfs = [cls.get_data_from_store(symbol, columns=columns, parse_dates=parse_dates).assign(symbol=symbol) for symbol in instrument_symbols]
+        return pd.concat(price_dfs, ignore_index=True, sort=False)
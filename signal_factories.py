@@ -1,46 +1,8 @@
-from signals import COTSignalBase
+from signals import COTSignalBase, BreakoutSignalBase
+from signals import IntradayBreakoutSignal, CloseBreakoutSignal
 from signals import MMClusteringPosSize_Signal, MMConcentration_Signal
 from signals import PMPUNetT_Signal, PMPUNetOI_Signal, PMPUNetPosSize_Signal
-
-from backtrader import Indicator
-from indicators import DonchianChannel
-
-class BreakoutSignalBase(Indicator):
-    params = (
-        ('period', 20),
-    )
-
-    def __init__(self, *args):
-        super(BreakoutSignalBase, self).__init__(*args)
-        self.donchian = DonchianChannel(self.data, period=self.p.period)
-
-    @staticmethod
-    def get_breakout_signal(price, mband, wband):
-        breakout_signal = 2*(price - mband) / wband
-
-        if breakout_signal >= 2:
-            breakout_signal = 2
-        elif breakout_signal <= -2:
-            breakout_signal = -2
-        
-        return breakout_signal
-
-class IntradayBreakoutSignal(BreakoutSignalBase):
-    lines = ('long_signal', 'short_signal', )
-
-    def next(self):
-        mband = self.donchian.mband[0]
-        wband = self.donchian.wband[0]
-        self.l.long_signal[0] = self.get_breakout_signal(price=self.data.high[0], mband=mband, wband=wband)
-        self.l.short_signal[0] = self.get_breakout_signal(price=self.data.low[0], mband=mband, wband=wband)
-
-class CloseBreakoutSignal(BreakoutSignalBase):
-    lines = ('signal', )
-
-    def next(self):
-        mband = self.donchian.mband[0]
-        wband = self.donchian.wband[0]
-        self.l.signal[0] = self.get_breakout_signal(price=self.data.close[0], mband=mband, wband=wband)
+from signals import VectorizedCOTSignal
 
 class SignalFactoryBase():
 
@@ -51,9 +13,13 @@ class COTSignalFactory(SignalFactoryBase):
 
     ALL_NAMES = ['mm_concentration', 'mm_clustering&possize', 'pmpu_oi', 'pmpu_t', 'pmpu_possize']
 
-    def create_COT_signal(self, period=1, threshold=70, name=None) -> COTSignalBase:
+    def create_COT_signal(self, period=1, threshold=70, name=None, vectorized=False, shared=False) -> COTSignalBase:
         if name in self.ALL_NAMES:
-            if name == 'mm_concentration':
+            # Shared signals are always vectorized, as only their arrays can be reused. So are the signals of merged price
+            # & COT feeds, as their periods must count the reports rather than the feed's (trading date) bars
+            if vectorized or shared or 'cot_report' in self.data.getlinealiases():
+                cot_signal =  VectorizedCOTSignal(self.data, name=name, period=period, threshold=threshold, shared=shared)
+            elif name == 'mm_concentration':
                 cot_signal =  MMConcentration_Signal(self.data, period=period, threshold=threshold)
             elif name == 'mm_clustering&possize':
                 cot_signal =  MMClusteringPosSize_Signal(self.data, period=period, threshold=threshold)
@@ -69,11 +35,11 @@ class COTSignalFactory(SignalFactoryBase):
     
 class BreakoutSignalFactory(SignalFactoryBase):
 
-    def create_breakout_signal(self, period=20, intraday=True) -> BreakoutSignalBase:
+    def create_breakout_signal(self, period=20, intraday=True, shared=False) -> BreakoutSignalBase:
         if intraday:
-            breakout_signal = IntradayBreakoutSignal(self.data, period=period)
+            breakout_signal = IntradayBreakoutSignal(self.data, period=period, shared=shared)
         else:
-            breakout_signal = CloseBreakoutSignal(self.data, period=period)
+            breakout_signal = CloseBreakoutSignal(self.data, period=period, shared=shared)
         return breakout_signal
 
 
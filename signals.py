@@ -1,15 +1,19 @@
 import backtrader as bt
-from backtrader.indicators import Lowest, Highest
-from indicators import DonchianChannel
+import numpy as np
+from array import array
+from indicators import DonchianChannel, get_rolling_extrema
+from vector_signals import compute_cot_signal, breakout_signal, COT_SIGNAL_INPUTS
+from indicator_cache import get_indicator_arrays
 
 class BreakoutSignalBase(bt.Indicator):
     params = (
         ('period', 20),
+        ('shared', False),
     )
 
     def __init__(self, *args):
         super(BreakoutSignalBase, self).__init__(*args)
-        self.donchian = DonchianChannel(self.data, period=self.p.period)
+        self.donchian = DonchianChannel(self.data, period=self.p.period, shared=self.p.shared)
 
     @staticmethod
     def get_breakout_signal(price, mband, wband):
@@ -22,6 +26,15 @@ class BreakoutSignalBase(bt.Indicator):
         
         return breakout_signal
 
+    def _once_breakout_signal(self, signal_lines, price_lines, start, end):
+        # Array version of get_breakout_signal for Backtrader's runonce mode
+        mband = np.asarray(self.donchian.mband.array[start:end])
+        wband = np.asarray(self.donchian.wband.array[start:end])
+        compute = lambda: [breakout_signal(np.asarray(price_line.array[start:end]), mband, wband) for price_line in price_lines]
+
+        for signal_line, signal in zip(signal_lines, get_indicator_arrays(self, start, end, compute)):
+            signal_line.array[start:end] = array('d', signal)
+
 class IntradayBreakoutSignal(BreakoutSignalBase):
     lines = ('long_signal', 'short_signal', )
 
@@ -31,6 +44,9 @@ class IntradayBreakoutSignal(BreakoutSignalBase):
         self.l.long_signal[0] = self.get_breakout_signal(price=self.data.high[0], mband=mband, wband=wband)
         self.l.short_signal[0] = self.get_breakout_signal(price=self.data.low[0], mband=mband, wband=wband)
 
+    def once(self, start, end):
+        self._once_breakout_signal([self.l.long_signal, self.l.short_signal], [self.data.high, self.data.low], start, end)
+
 class CloseBreakoutSignal(BreakoutSignalBase):
     lines = ('signal', )
 
@@ -39,6 +55,9 @@ class CloseBreakoutSignal(BreakoutSignalBase):
         wband = self.donchian.wband[0]
         self.l.signal[0] = self.get_breakout_signal(price=self.data.close[0], mband=mband, wband=wband)
 
+    def once(self, start, end):
+        self._once_breakout_signal([self.l.signal], [self.data.close], start, end)
+
 class COTSignalBase(bt.Indicator):
     lines = ('signal', )
 
@@ -47,19 +66,25 @@ class COTSignalBase(bt.Indicator):
         ('threshold', 70),
     )
 
+    def _get_stochastic(self, line, normalize='range'):
+        # Rolling highest/lowest are shared by every signal requesting the same (line, period)
+        extrema = get_rolling_extrema(self, line, self.p.period)
+        if normalize == 'range':
+            return 100*(line - extrema.lowest) / (extrema.highest - extrema.lowest)
+        else:
+            return 100*(line - extrema.lowest) / (extrema.highest + extrema.lowest)
+
 class MMConcentration_Signal(COTSignalBase):
     def __init__(self, *args):
         super(MMConcentration_Signal, self).__init__(*args)
 
-        period = self.p.period
-
         # Money Managers Long (MML) Concentration
         mml_conc = self.data.mml_concentration
-        self._stoch_mml_conc = 100*(mml_conc - Lowest(mml_conc, period=period)) / (Highest(mml_conc, period=period) - Lowest(mml_conc, period=period))
+        self._stoch_mml_conc = self._get_stochastic(mml_conc, normalize='range')
 
         # Money Managers Short (MMS) Concentration
         mms_conc = self.data.mms_concentration
-        self._stoch_mms_conc = 100*(mms_conc - Lowest(mms_conc, period=period)) / (Highest(mms_conc, period=period) - Lowest(mms_conc, period=period))
+        self._stoch_mms_conc = self._get_stochastic(mms_conc, normalize='range')
     
     def next(self):
         threshold = self.p.threshold
@@ -105,19 +130,17 @@ class MMClusteringPosSize_Signal(COTSignalBase):
     def __init__(self, *args):
         super(MMClusteringPosSize_Signal, self).__init__(*args)
 
-        period = self.p.period
-
         # Money Managers Long (MML) Clustering & Position Size
         mml_clus = self.data.mml_clustering
         mml_possize = self.data.mml_possize
-        self._stoch_mml_clus = 100*(mml_clus - Lowest(mml_clus, period=period)) / (Highest(mml_clus, period=period) + Lowest(mml_clus, period=period))
-        self._stoch_mml_possize = 100*(mml_possize - Lowest(mml_possize, period=period)) / (Highest(mml_possize, period=period) + Lowest(mml_possize, period=period))
+        self._stoch_mml_clus = self._get_stochastic(mml_clus, normalize='sum')
+        self._stoch_mml_possize = self._get_stochastic(mml_possize, normalize='sum')
 
         # Money Managers Short (MMS) Clustering  & Position Size
         mms_clus = self.data.mms_clustering
         mms_possize = self.data.mms_possize
-        self._stoch_mms_clus = 100*(mms_clus - Lowest(mms_clus, period=period)) / (Highest(mms_clus, period=period) + Lowest(mms_clus, period=period))
-        self._stoch_mms_possize = 100*(mms_possize - Lowest(mms_possize, period=period)) / (Highest(mms_possize, period=period) + Lowest(mms_possize, period=period))
+        self._stoch_mms_clus = self._get_stochastic(mms_clus, normalize='sum')
+        self._stoch_mms_possize = self._get_stochastic(mms_possize, normalize='sum')
     
     def next(self):
         threshold = self.p.threshold
@@ -211,23 +234,71 @@ class PMPUNet_SignalBase(COTSignalBase):
 class PMPUNetOI_Signal(PMPUNet_SignalBase):
     def __init__(self, *args):
         super(PMPUNetOI_Signal, self).__init__(*args)
-        period = self.p.period
         pmpu_net = self.data.pmpu_netoi
         
-        self._stoch_pmpu_net = 100*(pmpu_net - Lowest(pmpu_net, period=period)) / (Highest(pmpu_net, period=period) + Lowest(pmpu_net, period=period))
+        self._stoch_pmpu_net = self._get_stochastic(pmpu_net, normalize='sum')
     
 class PMPUNetT_Signal(PMPUNet_SignalBase):
     def __init__(self, *args):
         super(PMPUNetT_Signal, self).__init__(*args)
-        period = self.p.period
         pmpu_net = self.data.pmpu_nett
         
-        self._stoch_pmpu_net = 100*(pmpu_net - Lowest(pmpu_net, period=period)) / (Highest(pmpu_net, period=period) + Lowest(pmpu_net, period=period))
+        self._stoch_pmpu_net = self._get_stochastic(pmpu_net, normalize='sum')
 
 class PMPUNetPosSize_Signal(PMPUNet_SignalBase):
     def __init__(self, *args):
         super(PMPUNetPosSize_Signal, self).__init__(*args)
-        period = self.p.period
         pmpu_net = self.data.pmpu_netpossize
         
-        self._stoch_pmpu_net = 100*(pmpu_net - Lowest(pmpu_net, period=period)) / (Highest(pmpu_net, period=period) + Lowest(pmpu_net, period=period))
+        self._stoch_pmpu_net = self._get_stochastic(pmpu_net, normalize='sum')
+
+class VectorizedCOTSignal(COTSignalBase):
+    ''' Any COTSignalFactory signal (by name) computed with NumPy for the whole (preloaded) COT feed at once, then
+    just replayed bar by bar. Without preloading, only the bars added since the last computation are computed, over
+    them and the lookback window before them
+    The COT feed may also be a merged price & COT feed, with the reports on the trading dates
+    '''
+    params = (
+        ('name', None),
+        ('shared', False),
+    )
+
+    def __init__(self, *args):
+        super(VectorizedCOTSignal, self).__init__(*args)
+        self.addminperiod(self.p.period)
+        self._values = np.array([])
+        self._values_start = 0
+        self._report_rows = list()
+
+    def _compute(self, start=0) -> np.ndarray:
+        ''' Signal of the feed's bars from start on '''
+        line_names = COT_SIGNAL_INPUTS[self.p.name]
+        cot_arrays = {line_name: getattr(self.data.lines, line_name).array for line_name in line_names}
+        end = len(cot_arrays[line_names[0]])
+        if 'cot_report' not in self.data.getlinealiases():
+            first = max(start - self.p.period + 1, 0)
+            cot_lines = {line_name: np.asarray(values[first:end], dtype=np.float64) for line_name, values in cot_arrays.items()}
+            return compute_cot_signal(self.p.name, cot_lines, period=self.p.period, threshold=self.p.threshold)[start - first:]
+
+        # Merged price & COT feeds (see feeds.arrays.PriceCOT_ArrayData) carry each report forward on the trading
+        # dates: the signal is computed on the reports' rows (so its period still counts reports) and carried forward
+        is_report = np.asarray(self.data.lines.cot_report.array[start:end], dtype=np.float64) > 0
+        previous_rows = self._report_rows[-self.p.period:] if start > 0 else list()
+        report_rows = previous_rows + (start + np.flatnonzero(is_report)).tolist()
+        report_values = compute_cot_signal(self.p.name, {line_name: np.array([values[row] for row in report_rows], dtype=np.float64) for line_name, values in cot_arrays.items()},
+                                            period=self.p.period, threshold=self.p.threshold)
+        self._report_rows = report_rows[-self.p.period:]
+
+        report_indices = len(previous_rows) - 1 + np.cumsum(is_report)
+        return np.where(report_indices >= 0, np.append(report_values, np.nan)[report_indices], np.nan)
+
+    def next(self):
+        i = len(self) - 1
+        if i >= self._values_start + len(self._values):
+            self._values_start += len(self._values)
+            self._values = self._compute(start=self._values_start)
+        self.l.signal[0] = self._values[i - self._values_start]
+
+    def once(self, start, end):
+        values, = get_indicator_arrays(self, start, end, lambda: [self._compute()])
+        self.l.signal.array[start:end] = array('d', values[start:end])
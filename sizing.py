@@ -0,0 +1,89 @@
+import numpy as np
+from instruments import get_instrument
+
+def get_risk_sizes(mult, prices, stops, aum: float, n_entries: int, risk_per_entry=0.005, max_position=0.3) -> np.ndarray:
+    ''' Risk-based sizes of entries (DaniPortfolio's sizing rule): sizes whose worst case loss (down to the stop) is risk_per_entry
+    of the AuM split over n_entries, capped at max_position of the AuM, floored and at least 1
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Worst Case Loss <= 0.5% AuM
+        wc_loss = mult * np.abs(prices - stops)
+        size_wc = ((risk_per_entry * aum) / n_entries) / wc_loss
+
+        # Individual positions <= 30% AuM
+        size_ind_pos = np.where(prices*size_wc > max_position * aum, max_position * aum / prices, size_wc)
+        size = np.minimum(size_wc, size_ind_pos)
+
+    # Size always FLOORED and >= 1
+    return np.where(size < 1, 1.0, np.floor(size))
+
+class PortfolioSizer():
+    ''' Sizes all of a bar's candidate entries at once: each entry gets its risk-based size (see get_risk_sizes), then
+    the new entries are scaled down together so that the portfolio stays within its limits, all of them as fractions
+    of the AuM (None for no limit):
+    - max_gross_exposure: Gross notional exposure (|size| x price x multiplier) of all positions
+    - max_category_exposure: Gross notional exposure of each category's positions (see instruments.get_instrument)
+    - max_margin_usage: Margin of all positions
+    Entries scaled down to less than a contract are dropped (size 0)
+    '''
+
+    def __init__(self, mult, margin, categories: list, n_entries: int, risk_per_entry=0.005, max_position=0.3,
+                    max_gross_exposure=None, max_category_exposure=None, max_margin_usage=None) -> None:
+        self.mult = np.asarray(mult, dtype=np.float64)
+        self.margin = np.asarray(margin, dtype=np.float64)
+        self.categories, self.category_indices = np.unique(np.asarray(categories, dtype=object).astype(str), return_inverse=True)
+        self.n_entries = n_entries
+        self.risk_per_entry = risk_per_entry
+        self.max_position = max_position
+        self.max_gross_exposure = max_gross_exposure
+        self.max_category_exposure = max_category_exposure
+        self.max_margin_usage = max_margin_usage
+
+    @classmethod
+    def from_comminfos(cls, symbols: list, comminfos: list, n_entries: int, **limits):
+        ''' Builds the sizer of the symbols passed, with their commission schemes' multipliers and margins '''
+        return cls(mult=[comminfo.p.mult for comminfo in comminfos], margin=[comminfo.p.margin for comminfo in comminfos],
+                    categories=[get_instrument(symbol).get('category', 'Other') for symbol in symbols], n_entries=n_entries, **limits)
+
+    @property
+    def has_limits(self) -> bool:
+        return self.max_gross_exposure is not None or self.max_category_exposure is not None or self.max_margin_usage is not None
+
+    def get_sizes(self, indices, prices, stops, aum: float, positions=None, marks=None) -> np.ndarray:
+        ''' Returns the (unsigned) sizes of a bar's candidate entries
+        :param indices: Symbols' indices of the entries (in the mult, margin and categories arrays)
+        :param prices, stops: Entries' execution and stop prices
+        :param positions, marks: Current positions and prices of all symbols (only needed with portfolio limits)
+        '''
+        indices = np.asarray(indices, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        sizes = get_risk_sizes(self.mult[indices], prices, np.asarray(stops, dtype=np.float64), aum, self.n_entries,
+                                risk_per_entry=self.risk_per_entry, max_position=self.max_position)
+        if not self.has_limits or not len(indices):
+            return sizes.astype(np.int64)
+
+        positions = np.abs(np.asarray(positions, dtype=np.float64))
+        # Flat symbols carry no exposure, even without a price yet (NaN marks)
+        exposures = np.where(positions > 0, positions * np.asarray(marks, dtype=np.float64) * self.mult, 0.0)
+        new_exposures = sizes * prices * self.mult[indices]
+
+        scales = np.ones(len(indices))
+        if self.max_gross_exposure is not None:
+            scales = np.minimum(scales, _get_budget_scale(self.max_gross_exposure * aum - exposures.sum(), new_exposures.sum()))
+
+        if self.max_category_exposure is not None:
+            n_categories = len(self.categories)
+            category_exposures = np.bincount(self.category_indices, weights=exposures, minlength=n_categories)
+            new_category_exposures = np.bincount(self.category_indices[indices], weights=new_exposures, minlength=n_categories)
+            category_scales = _get_budget_scale(self.max_category_exposure * aum - category_exposures, new_category_exposures)
+            scales = np.minimum(scales, category_scales[self.category_indices[indices]])
+
+        if self.max_margin_usage is not None:
+            scales = np.minimum(scales, _get_budget_scale(self.max_margin_usage * aum - (positions * self.margin).sum(), (sizes * self.margin[indices]).sum()))
+
+        return np.where(scales < 1, np.floor(sizes * scales), sizes).astype(np.int64)
+
+def _get_budget_scale(budget, demand):
+    # Fraction of the demand that fits in the remaining budget (1 if all of it fits, 0 if the budget is spent)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.clip(np.where(demand > 0, budget / demand, 1.0), 0.0, 1.0)
@@ -0,0 +1,123 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+
+def get_store_path(consolidated_path:str) -> str:
+    return f"{consolidated_path}\\store"
+
+def get_store_price_path(symbol:str, store_path:str, is_single_contract=False) -> str:
+    instrument_store_path = f"{store_path}\\price\\{symbol}\\"
+    if not is_single_contract:
+        instrument_store_path += 'perpetual_OI.parquet'
+    else:
+        instrument_store_path += 'contracts.parquet'
+
+    return instrument_store_path
+
+def get_store_cot_path(symbol:str, store_path:str) -> str:
+    return f"{store_path}\\cot\\{symbol}.parquet"
+
+def get_store_parts_path(file_path:str) -> str:
+    ''' Folder of the part files appended to a store table (see append_store_table) '''
+    return os.path.splitext(file_path)[0] + '_parts'
+
+def get_store_part_paths(file_path:str) -> list:
+    ''' Part files appended to a store table, in the order they were appended '''
+    parts_path = get_store_parts_path(file_path)
+    if not os.path.isdir(parts_path):
+        return []
+
+    return [os.path.join(parts_path, file_name) for file_name in sorted(os.listdir(parts_path)) if file_name.endswith('.parquet')]
+
+def write_store_table(df:pd.DataFrame, file_path:str, date_label='Date', date_format='%Y-%m-%d'):
+    ''' Writes a consolidated DataFrame as a typed Parquet table (dates as int64 ns, numbers as float64), replacing the
+    table and the parts appended to it
+    '''
+    _write_store_file(df, file_path, date_label=date_label, date_format=date_format)
+
+    parts_path = get_store_parts_path(file_path)
+    if os.path.isdir(parts_path):
+        shutil.rmtree(parts_path)
+
+def _write_store_file(df:pd.DataFrame, file_path:str, date_label='Date', date_format='%Y-%m-%d'):
+    folder_path = os.path.dirname(file_path)
+    if folder_path:
+        os.makedirs(folder_path, exist_ok=True)
+
+    store_df = df.copy()
+    dates = pd.to_datetime(store_df[date_label], format=date_format)
+    store_df[date_label] = dates.to_numpy().astype('datetime64[ns]').astype(np.int64)
+    for column in store_df.columns:
+        if column == date_label:
+            continue
+
+        # Text columns (e.g. 'Name') are kept, numbers stored in object columns are converted
+        if not pd.api.types.is_numeric_dtype(store_df[column]):
+            try:
+                store_df[column] = pd.to_numeric(store_df[column])
+            except (ValueError, TypeError):
+                continue
+        store_df[column] = store_df[column].astype(np.float64)
+
+    store_df.to_parquet(file_path, index=False)
+
+def read_store_table(file_path:str, columns=None, keys=None, date_label='Date', date_format='%Y-%m-%d', parse_dates=False, after_date=None) -> pd.DataFrame:
+    ''' Reads a table written by write_store_table, with the parts appended to it (see append_store_table)
+    :param columns: Columns to be read (all of them by default). The date column is always read
+    :param keys: Columns identifying a row (the date column by default): appended rows replace the earlier ones with
+    the same keys
+    :param parse_dates: Returns dates as datetime64 if True, or as strings in date_format (like the .csv files) if False
+    :param after_date: Only reads the rows after this date (filtered while reading the Parquet files)
+    '''
+    if columns is not None and date_label not in columns:
+        columns = [date_label] + list(columns)
+
+    filters = None
+    if after_date is not None:
+        filters = [(date_label, '>', int(pd.Timestamp(after_date).as_unit('ns').value))]
+
+    part_paths = get_store_part_paths(file_path)
+    if not part_paths:
+        df = pd.read_parquet(file_path, columns=columns, filters=filters)
+    else:
+        keys = keys if keys is not None else [date_label]
+        read_columns = columns + [key for key in keys if key not in columns] if columns is not None else None
+        dfs = [pd.read_parquet(path, columns=read_columns, filters=filters) for path in [file_path] + part_paths]
+        df = pd.concat(dfs, ignore_index=True, sort=False)
+        df = df.drop_duplicates(subset=keys, keep='last').sort_values(keys, kind='stable').reset_index(drop=True)
+        if columns is not None:
+            df = df[columns]
+
+    dates = pd.to_datetime(df[date_label].to_numpy(dtype=np.int64), unit='ns')
+    if parse_dates:
+        df[date_label] = dates
+    else:
+        df[date_label] = dates.strftime(date_format)
+
+    return df
+
+def append_store_table(df:pd.DataFrame, file_path:str, keys=None, max_parts=16, date_label='Date', date_format='%Y-%m-%d'):
+    ''' Appends rows to a table written by write_store_table (rows with the same keys are replaced). The rows are
+    written as a new part file next to the table, so that only the new rows are written, and the parts are merged into the table
+    (see compact_store_table) once there are max_parts of them
+    :param keys: Columns identifying a row (the date column by default)
+    '''
+    if not os.path.isfile(file_path):
+        write_store_table(df, file_path, date_label=date_label, date_format=date_format)
+        return
+
+    part_paths = get_store_part_paths(file_path)
+    part_path = os.path.join(get_store_parts_path(file_path), f'part-{len(part_paths):05d}.parquet')
+    _write_store_file(df, part_path, date_label=date_label, date_format=date_format)
+
+    if len(part_paths) + 1 >= max_parts:
+        compact_store_table(file_path, keys=keys, date_label=date_label, date_format=date_format)
+
+def compact_store_table(file_path:str, keys=None, date_label='Date', date_format='%Y-%m-%d'):
+    ''' Merges the parts appended to a table into it (see append_store_table) '''
+    if not get_store_part_paths(file_path):
+        return
+
+    df = read_store_table(file_path, keys=keys, date_label=date_label, date_format=date_format)
+    write_store_table(df, file_path, date_label=date_label, date_format=date_format)
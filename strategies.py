@@ -1,7 +1,9 @@
 import backtrader as bt
 from signal_factories import COTSignalFactory, BreakoutSignalFactory
 from indicators import DonchianChannel
-from math import floor, isnan
+from sizing import PortfolioSizer, get_risk_sizes
+from math import isnan, inf
+import numpy as np
 import pandas as pd
 
 class PortfolioStrategyBase(bt.Strategy):
@@ -13,6 +15,12 @@ class PortfolioStrategyBase(bt.Strategy):
         self.inds=self.dict_of_dicts(*symbols)
         self.signals=self.dict_of_dicts(*symbols)
 
+        # Warm-up tracking (see _is_active): symbols' activation bars and dates, and the lengths their indicators and
+        # signals must reach before being active
+        self.activation_bars={symbol: None for symbol in symbols}
+        self.activation_dates={symbol: None for symbol in symbols}
+        self._ready_lens=dict()
+
     @property
     def aum(self):
         return self._aum
@@ -56,20 +64,47 @@ class PortfolioStrategyBase(bt.Strategy):
         raise NotImplementedError
 
     def _is_active(self, symbol: str):
-        # Checking if all of the symbol's Indicators have been initiated
-        for _, ind in self.inds[symbol].items():
-            for line in ind.lines:
-                if len(line) == 0 or isnan(line[0]):
-                    return False
-
-        # Checking if all of the symbol's Signals have been initiated
-        for _, ind in self.signals[symbol].items():
-            for line in ind.lines:
-                if len(line) == 0 or isnan(line[0]):
-                    return False
-
+        # Once warmed up, a symbol's Indicators & Signals stay initiated: the activation bar is cached
+        if self.activation_bars[symbol] is not None:
+            return True
+
+        ready_lens = self._ready_lens.get(symbol)
+        if ready_lens is None:
+            ready_lens = self._ready_lens[symbol] = self._get_ready_lens(symbol)
+
+        # Checking if all of the symbol's Indicators & Signals have been initiated
+        for ind, ready_len, is_preloaded in ready_lens:
+            if len(ind) < ready_len:
+                return False
+            if not is_preloaded:
+                for line in ind.lines:
+                    if len(line) == 0 or isnan(line[0]):
+                        return False
+
+        self.activation_bars[symbol] = len(self)
+        self.activation_dates[symbol] = self.datetime.datetime(0)
         return True
-    
+
+    def _get_ready_lens(self, symbol: str) -> list:
+        ''' Returns the length each of the symbol's Indicators & Signals must reach before being initiated. With their
+        values preloaded (runonce), it is given by their lines' first valid (not NaN) value. Otherwise, it is their
+        minperiod and their lines' current values must also be checked
+        :return: List of tuples (indicator, ready length, preloaded)
+        '''
+        ready_lens = list()
+        for ind in list(self.inds[symbol].values()) + list(self.signals[symbol].values()):
+            is_preloaded = all(len(line.array) > len(line) for line in ind.lines)
+            if is_preloaded:
+                ready_len = 0
+                for line in ind.lines:
+                    is_valid = ~np.isnan(np.asarray(line.array, dtype=np.float64))
+                    ready_len = max(ready_len, int(np.argmax(is_valid)) + 1 if is_valid.any() else inf)
+            else:
+                ready_len = ind._minperiod
+            ready_lens.append((ind, ready_len, is_preloaded))
+
+        return ready_lens
+
     @staticmethod
     def dict_of_dicts(*args, **kwargs):
         if not args and not kwargs:
@@ -80,49 +115,55 @@ class PortfolioStrategyBase(bt.Strategy):
             return {arg: dict(kwargs) for arg in args}
 
 class DaniPortfolio(PortfolioStrategyBase):
-    def __init__(self, symbols, intraday: bool, breakout_period: int, n_entries: int) -> None:
+    def __init__(self, symbols, intraday: bool, breakout_period: int, n_entries: int, shared_indicators=False,
+                max_gross_exposure=None, max_category_exposure=None, max_margin_usage=None) -> None:
         super(DaniPortfolio, self).__init__(symbols)
         self.intraday=intraday
         self.breakout_period=breakout_period
         self.n_entries=n_entries
+        # Reuses the indicators' (runonce) arrays across strategy instances of the same process (see indicator_cache)
+        self.shared_indicators=shared_indicators
         self.entries_count={symbol: 0 for symbol in symbols}
 
         for symbol in symbols:
             data = self.getdatabyname(symbol)
 
             # Donchian Channel Indicator
-            self.inds[symbol]['donchian'] = DonchianChannel(data, period=self.breakout_period)
+            self.inds[symbol]['donchian'] = DonchianChannel(data, period=self.breakout_period, shared=self.shared_indicators)
 
             # Breakout Signal
             breakout_signal_factory = BreakoutSignalFactory(data)
             self.signals[symbol]['breakout'] = breakout_signal_factory.create_breakout_signal(period=self.breakout_period, 
-                                                                                                intraday=self.intraday)
+                                                                                                intraday=self.intraday,
+                                                                                                shared=self.shared_indicators)
+
+        # Portfolio-level sizing of each bar's entries, with the brokers' commission schemes and optional portfolio
+        # limits (fractions of the AuM)
+        comminfos = [self.broker.getcommissioninfo(self.getdatabyname(symbol)) for symbol in symbols]
+        self.portfolio_sizer=PortfolioSizer.from_comminfos(symbols, comminfos, n_entries=self.n_entries, max_gross_exposure=max_gross_exposure,
+                                    max_category_exposure=max_category_exposure, max_margin_usage=max_margin_usage)
+        self._sizer_indices={symbol: i for i, symbol in enumerate(symbols)}
 
     #- RISK MANAGEMENT RULES
     def _get_position_sizing(self, mult: float, price: float, stop: float) -> int:
-        # Worst Case Loss <= 0.5% AuM
-        wc_loss = mult * abs(price - stop)
-        size_wc = ((0.005 * self.aum) / self.n_entries) / wc_loss
+        # Worst Case Loss <= 0.5% AuM, individual positions <= 30% AuM, size always FLOORED and >= 1
+        return int(get_risk_sizes(mult, price, stop, self.aum, self.n_entries))
 
-        # Individual positions <= 30% AuM
-        if price*size_wc > 0.3 * self.aum:
-            size_ind_pos = 0.3 * self.aum / price
-        else:
-            size_ind_pos = size_wc
-        
-        # Position Sizing
-        size = min(size_wc, size_ind_pos)
-
-        # Size always FLOORED and >= 1:
-        if size < 1:
-            return 1
-        else:
-            return floor(size)
+    def _get_position_sizes(self, symbols: list, prices: list, stops: list):
+        ''' Sizes several entries at once, with the same rules as _get_position_sizing and the portfolio limits '''
+        positions = marks = None
+        if self.portfolio_sizer.has_limits:
+            datas = [self.getdatabyname(symbol) for symbol in self.symbols]
+            positions = [self.broker.getposition(data).size for data in datas]
+            marks = [data.close[0] if len(data) else 0.0 for data in datas]
+
+        return self.portfolio_sizer.get_sizes([self._sizer_indices[symbol] for symbol in symbols], prices, stops, self.aum,
+                                    positions=positions, marks=marks)
 
 class BreakoutOnly(DaniPortfolio):
     
-    def __init__(self, symbol, intraday=False, breakout_period=20, n_entries=3) -> None:
-        super().__init__(symbol, intraday, breakout_period, n_entries)
+    def __init__(self, symbol, intraday=False, breakout_period=20, n_entries=3, shared_indicators=False) -> None:
+        super().__init__(symbol, intraday, breakout_period, n_entries, shared_indicators)
     
     def pnext(self):
         if self._is_active():
@@ -194,8 +235,11 @@ class COT_Breakout(DaniPortfolio):
     def __init__(self, 
                 symbols, intraday=False,
                 breakout_period=20, n_entries=3,
-                cot_component_name=None, cot_component_period=52, cot_threshold=70) -> None:
-        super(COT_Breakout, self).__init__(symbols, intraday, breakout_period, n_entries)
+                cot_component_name=None, cot_component_period=52, cot_threshold=70,
+                cot_vectorized=False, shared_indicators=False,
+                max_gross_exposure=None, max_category_exposure=None, max_margin_usage=None) -> None:
+        super(COT_Breakout, self).__init__(symbols, intraday, breakout_period, n_entries, shared_indicators,
+                                            max_gross_exposure, max_category_exposure, max_margin_usage)
 
         if not cot_component_name:
                 raise ValueError("The COT component name must be passed as a parameter with keyword 'cot_component_name'")
@@ -204,26 +248,96 @@ class COT_Breakout(DaniPortfolio):
 
         for symbol in symbols:
             # COT Signal
-            data = self.getdatabyname(self._get_cot_dataname(symbol))
+            data = self._get_cot_data(symbol)
             cot_signal_factory = COTSignalFactory(data)
             self.signals[symbol]['cot'] = cot_signal_factory.create_COT_signal(name=cot_component_name,
                                                                     period=cot_component_period, 
-                                                                    threshold=cot_threshold)
+                                                                    threshold=cot_threshold,
+                                                                    vectorized=cot_vectorized,
+                                                                    shared=self.shared_indicators)
             self.initial_cot_signal[symbol] = None
 
-    def pnext(self):
+    def start(self):
+        super(COT_Breakout, self).start()
+
+        # Per-symbol handles, fetched once instead of on every bar
+        self._symbol_handles = list()
         for symbol in self.symbols:
+            data = self.getdatabyname(symbol)
+            self._symbol_handles.append((symbol, data, self.broker.getcommissioninfo(data), self.broker.getposition(data),
+                                        self.inds[symbol]['donchian'], self.signals[symbol]['breakout'], self.signals[symbol]['cot']))
+        self._symbol_indices = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+        # Symbols in play (see _get_symbols_in_play): open positions and, once built, the bars of each symbol's breakouts
+        self._open_symbols = set()
+        self._schedule = None
+        self._calendar = None
+        self._pending_activation = list(range(len(self.symbols)))
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            i = self._symbol_indices.get(order.data._name)
+            if i is not None:
+                if self._symbol_handles[i][3].size != 0:
+                    self._open_symbols.add(i)
+                else:
+                    self._open_symbols.discard(i)
+
+    def _get_symbols_in_play(self) -> list:
+        ''' Returns the handles of the symbols that may trade on the current bar, in the symbols' order: the ones with
+        an open position and, as new positions need a breakout, the flat ones with a breakout on the bar. Without
+        preloaded (runonce) signals, all symbols are returned
+        '''
+        # Symbols are still checked on every bar until they are active, so that their activation bar is recorded
+        if self._pending_activation:
+            self._pending_activation = [i for i in self._pending_activation if not self._is_active(self.symbols[i])]
+
+        if self._schedule is None:
+            self._schedule = self._get_breakout_schedule()
+        if self._schedule is False:
+            return self._symbol_handles
+
+        bar = len(self) - 1
+        if bar >= len(self._calendar) or self.datetime[0] != self._calendar[bar]:
+            # The bars don't follow the datas' calendar (e.g. datas with repeated dates): all symbols are evaluated
+            self._schedule = False
+            return self._symbol_handles
+
+        breakout_symbols = self._schedule.get(bar)
+        if breakout_symbols:
+            return [self._symbol_handles[i] for i in sorted(self._open_symbols.union(breakout_symbols))]
+        return [self._symbol_handles[i] for i in sorted(self._open_symbols)]
+
+    def _get_breakout_schedule(self):
+        ''' Maps each bar of the strategy (the union of the datas' dates) to the symbols with a breakout signal on it,
+        as seen by the strategy (a symbol keeps its last value on the dates it has no bar on)
+        :return: Dict of symbols' indices by bar, or False if the datas and signals aren't preloaded
+        '''
+        breakout_lines = [handle[5].signal for handle in self._symbol_handles]
+        if not all(len(data.datetime.array) > len(data) for data in self.datas) or not all(len(line.array) > len(line) for line in breakout_lines):
+            return False
+
+        self._calendar = np.unique(np.concatenate([np.asarray(data.datetime.array) for data in self.datas]))
+        schedule = dict()
+        for i, (handle, line) in enumerate(zip(self._symbol_handles, breakout_lines)):
+            rows = np.searchsorted(np.asarray(handle[1].datetime.array), self._calendar, side='right') - 1
+            breakout = np.asarray(line.array, dtype=np.float64)[np.maximum(rows, 0)]
+            for bar in np.flatnonzero((rows >= 0) & (np.abs(breakout) > 1)).tolist():
+                schedule.setdefault(bar, list()).append(i)
+
+        return schedule
+
+    def pnext(self):
+        # The bar's orders are collected in the symbols' order and their entries sized together (see _submit_orders)
+        orders = list()
+        for symbol, data, comminfo, position, donchian, breakout, cot in self._get_symbols_in_play():
             if self._is_active(symbol):
-                data = self.getdatabyname(symbol)
-                comminfo = self.broker.getcommissioninfo(data)
-                position = self.broker.getposition(data)
-                donchian = self.inds[symbol]['donchian']
-                breakout_signal = self.signals[symbol]['breakout'].signal[0]
+                breakout_signal = breakout.signal[0]
                 stop = donchian.mband[0]
 
                 #- NEW POSITIONS
                 if not position and self.entries_count[symbol] == 0:
-                    cot_signal = self.signals[symbol]['cot'].signal[0]
+                    cot_signal = cot.signal[0]
 
                     # LONG side
                     if cot_signal > 0 and breakout_signal > 1:
@@ -231,10 +345,7 @@ class COT_Breakout(DaniPortfolio):
                             exec_price = donchian.hband[0]
                         else:
                             exec_price = data.close[0]
-                        size = self._get_position_sizing(mult=comminfo.p.mult, price=exec_price, stop=stop)
-                        self.buy(data=data, size=size)
-                        self.entries_count[symbol] += 1
-                        self.initial_cot_signal[symbol] = cot_signal
+                        orders.append((symbol, data, 1, exec_price, stop, cot_signal))
 
                     # SHORT side
                     elif cot_signal < 0 and breakout_signal < -1:
@@ -242,10 +353,7 @@ class COT_Breakout(DaniPortfolio):
                             exec_price = donchian.lband[0]
                         else:
                             exec_price = data.close[0]
-                        size = self._get_position_sizing(mult=comminfo.p.mult, price=exec_price, stop=stop)
-                        self.sell(data=data, size=size)
-                        self.entries_count[symbol] += 1
-                        self.initial_cot_signal[symbol] = cot_signal
+                        orders.append((symbol, data, -1, exec_price, stop, cot_signal))
 
                 #- ONGOING POSITIONS
                 else:
@@ -255,8 +363,7 @@ class COT_Breakout(DaniPortfolio):
 
                         # LONG POSITION STOP RULE
                         if (self.intraday and data.low[0] < stop) or data.close[0] < stop:
-                            self.close(data=data)
-                            self.entries_count[symbol] = 0
+                            orders.append((symbol, data, 0, None, None, None))
 
                         # INCREASE position after CONSECUTIVE BREAKOUTS
                         elif breakout_signal > 1 and self.entries_count[symbol] < self.n_entries:
@@ -264,17 +371,14 @@ class COT_Breakout(DaniPortfolio):
                                 exec_price = donchian.hband[0]
                             else:
                                 exec_price = data.close[0]
-                            size = self._get_position_sizing(mult=comminfo.p.mult, price=exec_price, stop=stop)
-                            self.buy(data=data, size=size)
-                            self.entries_count[symbol] += 1
+                            orders.append((symbol, data, 1, exec_price, stop, None))
 
                     # SHORT
                     elif position.size < 0:
 
                         # SHORT POSITION STOP RULE
                         if (self.intraday and data.high[0] > stop) or data.close[0] > stop:
-                            self.close(data=data)
-                            self.entries_count[symbol] = 0
+                            orders.append((symbol, data, 0, None, None, None))
 
                         # INCREASE position after CONSECUTIVE BREAKOUTS
                         elif breakout_signal < -1 and self.entries_count[symbol] < self.n_entries:
@@ -282,10 +386,49 @@ class COT_Breakout(DaniPortfolio):
                                 exec_price = donchian.lband[0]
                             else:
                                 exec_price = data.close[0]
-                            size = self._get_position_sizing(mult=comminfo.p.mult, price=exec_price, stop=stop)
-                            self.sell(data=data, size=size)
-                            self.entries_count[symbol] += 1
+                            orders.append((symbol, data, -1, exec_price, stop, None))
+
+        if orders:
+            self._submit_orders(orders)
+
+    def _submit_orders(self, orders: list):
+        ''' Sizes the entries of a bar's orders in one go (see DaniPortfolio._get_position_sizes) and submits the
+        orders in the order passed
+        :param orders: List of tuples (symbol, data, side, exec_price, stop, cot_signal), with side 1 (buy), -1 (sell)
+        or 0 (close) and the COT signal of new positions (None for the others)
+        '''
+        entries = [order for order in orders if order[2] != 0]
+        if entries:
+            sizes = self._get_position_sizes(symbols=[order[0] for order in entries], prices=[order[3] for order in entries],
+                                                stops=[order[4] for order in entries])
+            entry_sizes = iter(sizes.tolist())
+
+        for symbol, data, side, _, _, cot_signal in orders:
+            if side == 0:
+                self.close(data=data)
+                self.entries_count[symbol] = 0
+                continue
+
+            # Entries left without a contract by the portfolio limits are dropped
+            size = next(entry_sizes)
+            if size <= 0:
+                continue
+
+            if side > 0:
+                self.buy(data=data, size=size)
+            else:
+                self.sell(data=data, size=size)
+            self.entries_count[symbol] += 1
+            if cot_signal is not None:
+                self.initial_cot_signal[symbol] = cot_signal
 
     @staticmethod
     def _get_cot_dataname(symbol: str) -> str:
-        return f'{symbol}_cot'
\ No newline at end of file
+        return f'{symbol}_cot'
+
+    def _get_cot_data(self, symbol: str):
+        # Without a COT feed of its own, the symbol's feed is a merged price & COT one (see feeds.arrays.PriceCOT_ArrayData)
+        cot_dataname = self._get_cot_dataname(symbol)
+        if cot_dataname in self.getdatanames():
+            return self.getdatabyname(cot_dataname)
+        return self.getdatabyname(symbol)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+import backtrader as bt
+from cot_bt import get_bt_data, get_cerebro, SYMBOLS
+from signal_factories import COTSignalFactory
+
+# COT_Breakout parameters swept by default
+DEFAULT_PARAM_GRID = {
+    'cot_component_name': COTSignalFactory.ALL_NAMES,
+    'cot_component_period': [26, 52, 104],
+    'cot_threshold': [60, 70, 80],
+    'breakout_period': [10, 20, 40],
+    'n_entries': [1, 3],
+}
+
+# Prepared data of the worker processes, set once per process by _init_worker
+_worker_data = dict()
+
+def get_param_grid(param_grid: dict) -> list:
+    ''' Expands a dict of parameter values lists into every parameter combination (one dict per sweep cell) '''
+    names = list(param_grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*[param_grid[name] for name in names])]
+
+def get_cell_key(params: dict, symbols: list, shared_indicators=False) -> str:
+    ''' Key of a sweep cell: its params, with the universe and indicators' mode it was run with '''
+    return json.dumps({'params': params, 'symbols': list(symbols), 'shared_indicators': shared_indicators}, sort_keys=True)
+
+def load_completed_cells(results_path: str) -> set:
+    ''' Returns the keys of the cells already run successfully in a results file (empty if there isn't one yet).
+    A truncated last line, left by an interrupted sweep, is ignored, as are the lines without their universe
+    '''
+    completed = set()
+    if os.path.isfile(results_path):
+        with open(results_path, 'r') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 'error' not in result and 'symbols' in result:
+                    completed.add(get_cell_key(result['params'], result['symbols'], shared_indicators=result.get('shared_indicators', False)))
+
+    return completed
+
+class InitialValue(bt.Analyzer):
+    ''' Broker value when the run starts '''
+
+    def start(self):
+        self.rets['initial_value'] = self.strategy.broker.getvalue()
+
+def add_metric_analyzers(cerebro: bt.Cerebro):
+    ''' Adds the analyzers read by get_run_metrics '''
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe', timeframe=bt.TimeFrame.Days, annualize=True)
+    cerebro.addanalyzer(InitialValue, _name='initial_value')
+
+def get_run_metrics(strategy) -> dict:
+    ''' Summary metrics of a finished COT_Breakout run, from the analyzers added by add_metric_analyzers '''
+    drawdown = strategy.analyzers.drawdown.get_analysis()
+    trades = strategy.analyzers.trades.get_analysis()
+    sharpe = strategy.analyzers.sharpe.get_analysis()
+    initial_value = strategy.analyzers.initial_value.get_analysis()['initial_value']
+
+    final_value = strategy.broker.getvalue()
+    return {
+        'final_value': final_value,
+        'total_return': final_value / initial_value - 1,
+        'max_drawdown': drawdown['max']['drawdown'],
+        'sharpe_ratio': sharpe.get('sharperatio'),
+        'n_trades': trades.get('total', dict()).get('closed', 0),
+    }
+
+def run_cell(price_dfs: dict, cot_dfs: dict, params: dict, shared_indicators=False) -> dict:
+    ''' Runs a single sweep cell (COT_Breakout with the params passed) and returns its metrics '''
+    start_time = perf_counter()
+    cerebro = get_cerebro(price_dfs, cot_dfs, shared_indicators=shared_indicators, **params)
+    add_metric_analyzers(cerebro)
+    strategy = cerebro.run()[0]
+
+    metrics = get_run_metrics(strategy)
+    metrics['run_time'] = perf_counter() - start_time
+    return metrics
+
+def _init_worker(price_dfs: dict, cot_dfs: dict, shared_indicators: bool):
+    # The prepared data is sent once to each worker process, not once per cell
+    _worker_data['price_dfs'] = price_dfs
+    _worker_data['cot_dfs'] = cot_dfs
+    _worker_data['shared_indicators'] = shared_indicators
+
+def _run_worker_cell(params: dict) -> dict:
+    shared_indicators = _worker_data['shared_indicators']
+    result = {'params': params, 'symbols': list(_worker_data['price_dfs'].keys()), 'shared_indicators': shared_indicators}
+    try:
+        result['metrics'] = run_cell(_worker_data['price_dfs'], _worker_data['cot_dfs'], params, shared_indicators=shared_indicators)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+
+    return result
+
+def run_sweep(param_grid: dict, results_path: str, symbols=SYMBOLS, max_workers=None, shared_indicators=False) -> list:
+    ''' Runs COT_Breakout over every cell of a parameter grid across a process pool. The data is prepared once and
+    shared by the workers, each result is appended to results_path (one JSON line per cell) as soon as the cell
+    finishes, and cells already in results_path (with the same symbols and shared_indicators) are skipped, so an
+    interrupted sweep resumes where it stopped
+    :param param_grid: Dict of COT_Breakout parameter values lists (see DEFAULT_PARAM_GRID)
+    :param shared_indicators: Reuses the indicators computed by a worker across its cells (see indicator_cache)
+    :return: Results of the cells run
+    '''
+    cells = get_param_grid(param_grid)
+    completed = load_completed_cells(results_path)
+    pending_cells = [params for params in cells if get_cell_key(params, symbols, shared_indicators=shared_indicators) not in completed]
+    print(f'{len(cells)} cells, {len(cells) - len(pending_cells)} already completed')
+    if not pending_cells:
+        return list()
+
+    price_dfs, cot_dfs = get_bt_data(symbols)
+
+    results_folder = os.path.dirname(results_path)
+    if results_folder:
+        os.makedirs(results_folder, exist_ok=True)
+
+    results = list()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(price_dfs, cot_dfs, shared_indicators)) as executor:
+        futures = [executor.submit(_run_worker_cell, params) for params in pending_cells]
+        with open(results_path, 'a') as f:
+            for future in as_completed(futures):
+                result = future.result()
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                results.append(result)
+
+                status = result['error'] if 'error' in result else f"final value {result['metrics']['final_value']:.2f}"
+                print(f"[{len(results)}/{len(pending_cells)}] {json.dumps(result['params'], sort_keys=True)}: {status}")
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Runs a COT_Breakout parameter sweep')
+    parser.add_argument('results_path', help='.jsonl file the results are appended to (and resumed from)')
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shared-indicators', action='store_true', help='Reuses indicators across the runs of each worker')
+    parser.add_argument('--grid', default=None, help='JSON file with the parameter grid (DEFAULT_PARAM_GRID if not passed)')
+    args = parser.parse_args()
+
+    param_grid = DEFAULT_PARAM_GRID
+    if args.grid:
+        with open(args.grid, 'r') as f:
+            param_grid = json.load(f)
+
+    run_sweep(param_grid, args.results_path, symbols=args.symbols, max_workers=args.workers, shared_indicators=args.shared_indicators)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from cot import cot_week2day, cot_week2day_batch
+from cot_legacy import legacy_cot_week2day
+
+@pytest.fixture
+def weekly_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2020-01-07', periods=60, freq='W-TUE').strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'Date': dates,
+        'MML_OI': rng.integers(1000, 5000, len(dates)).astype(np.float64),
+        'MML_Concentration': np.round(rng.uniform(0, 60, len(dates)), 1),
+    })
+
+@pytest.fixture
+def daily_dates(weekly_df) -> list:
+    # From before the first report to well after the last one (past the 6 days cutoff)
+    first_date = pd.Timestamp(weekly_df['Date'].iloc[0]) - pd.Timedelta(days=10)
+    last_date = pd.Timestamp(weekly_df['Date'].iloc[-1]) + pd.Timedelta(days=20)
+    return pd.bdate_range(first_date, last_date).strftime('%Y-%m-%d').to_list()
+
+def assert_same_frames(df: pd.DataFrame, expected_df: pd.DataFrame):
+    assert df.columns.to_list() == expected_df.columns.to_list()
+    assert df['Date'].to_list() == expected_df['Date'].to_list()
+    values = df.drop(columns='Date').to_numpy(dtype=np.float64)
+    expected_values = expected_df.drop(columns='Date').to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(values, expected_values)
+
+def test_cot_week2day_matches_legacy(weekly_df, daily_dates):
+    assert_same_frames(cot_week2day(weekly_df, daily_dates), legacy_cot_week2day(weekly_df, daily_dates))
+
+def test_cot_week2day_staleness_cutoff(weekly_df, daily_dates):
+    df = cot_week2day(weekly_df, daily_dates)
+    last_report_date = pd.Timestamp(weekly_df['Date'].iloc[-1])
+    days_after = (pd.to_datetime(df['Date']) - last_report_date).dt.days.to_numpy()
+
+    # Days after the last report keep its values for less than 6 days
+    is_fresh = (days_after >= 0) & (days_after < 6)
+    is_stale = days_after >= 6
+    assert is_fresh.any() and is_stale.any()
+    assert (df.loc[is_fresh, 'MML_OI'] == weekly_df['MML_OI'].iloc[-1]).all()
+    assert df.loc[is_stale, ['MML_OI', 'MML_Concentration']].isna().all().all()
+
+    assert_same_frames(df, legacy_cot_week2day(weekly_df, daily_dates))
+
+def test_cot_week2day_empty_daily_dates(weekly_df):
+    df = cot_week2day(weekly_df, [])
+    assert df.empty
+    assert_same_frames(df, legacy_cot_week2day(weekly_df, []))
+
+def test_cot_week2day_empty_weekly_frame(weekly_df, daily_dates):
+    df = cot_week2day(weekly_df.iloc[:0], daily_dates)
+    assert df['Date'].to_list() == daily_dates
+    assert df[['MML_OI', 'MML_Concentration']].isna().all().all()
+
+def test_cot_week2day_batch_matches_single(weekly_df, daily_dates):
+    cot_dfs = {'CC': weekly_df, 'KC': weekly_df.iloc[10:40]}
+    batch_df = cot_week2day_batch(cot_dfs, daily_dates)
+    for symbol, cot_df in cot_dfs.items():
+        symbol_df = batch_df[batch_df['symbol'] == symbol].drop(columns='symbol').reset_index(drop=True)
+        assert_same_frames(symbol_df, legacy_cot_week2day(cot_df, daily_dates))
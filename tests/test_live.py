@@ -0,0 +1,105 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from cot_bt import get_bt_data
+from live import LivePortfolio
+from vector_bt import run_vector_backtest, COT_COLUMNS
+from vector_signals import compute_cot_signal, COT_SIGNAL_INPUTS
+
+SYMBOLS = ['CC', 'KC', 'C']
+COT_COMPONENT_NAME = 'mm_concentration'
+
+@pytest.fixture(scope='module')
+def bt_data() -> tuple:
+    return get_bt_data(SYMBOLS)
+
+def slice_bt_data(price_dfs: dict, cot_dfs: dict, start_date=None, end_date=None) -> tuple:
+    ''' Rows of the (start_date, end_date] dates '''
+    def slice_df(df):
+        is_in = np.ones(len(df), dtype=bool)
+        if start_date is not None:
+            is_in &= (df['Date'] > start_date).to_numpy()
+        if end_date is not None:
+            is_in &= (df['Date'] <= end_date).to_numpy()
+        return df[is_in].reset_index(drop=True)
+
+    return {symbol: slice_df(df) for symbol, df in price_dfs.items()}, {symbol: slice_df(df) for symbol, df in cot_dfs.items()}
+
+def test_incremental_updates_match_full_run(bt_data, tmp_path):
+    price_dfs, cot_dfs = bt_data
+    equity, trades = run_vector_backtest(price_dfs, cot_dfs, cot_component_name=COT_COMPONENT_NAME)
+    dates = equity.index
+
+    # Bootstrap on the first half of the history, then daily updates (with a snapshot round trip) and a final catch-up
+    bootstrap_date = dates[len(dates)//2]
+    daily_dates = dates[len(dates)//2 + 1:len(dates)//2 + 301]
+    portfolio = LivePortfolio(SYMBOLS, cot_component_name=COT_COMPONENT_NAME)
+    portfolio.update(*slice_bt_data(price_dfs, cot_dfs, end_date=bootstrap_date))
+    live_equity = [portfolio.equity]
+    live_trades = [portfolio.trades]
+
+    snapshot_path = os.path.join(tmp_path, 'portfolio.pkl')
+    previous_date = bootstrap_date
+    for i, date in enumerate(daily_dates):
+        portfolio.update(*slice_bt_data(price_dfs, cot_dfs, start_date=previous_date, end_date=date))
+        live_equity.append(portfolio.equity)
+        live_trades.append(portfolio.trades)
+        previous_date = date
+
+        if i == len(daily_dates)//2:
+            portfolio.save(snapshot_path)
+            portfolio = LivePortfolio.load(snapshot_path)
+
+    portfolio.update(price_dfs, cot_dfs)
+    live_equity.append(portfolio.equity)
+    live_trades.append(portfolio.trades)
+
+    live_equity = pd.concat(live_equity)
+    assert live_equity.index.equals(dates)
+    np.testing.assert_array_equal(live_equity.to_numpy(), equity.to_numpy())
+
+    sort_columns = ['Date', 'symbol']
+    live_trades = pd.concat(live_trades, ignore_index=True).sort_values(sort_columns).reset_index(drop=True)
+    trades = trades.sort_values(sort_columns).reset_index(drop=True)
+    assert len(live_trades) == len(trades) > 0
+    pd.testing.assert_frame_equal(live_trades, trades, check_dtype=False)
+
+    # Updating again without new bars changes nothing
+    orders = portfolio.update(price_dfs, cot_dfs)
+    assert portfolio.trades.empty
+    assert portfolio.value == equity.iloc[-1]
+    assert orders.equals(portfolio.get_orders())
+
+def test_late_cot_report_applied_on_next_date(bt_data):
+    price_dfs, cot_dfs = bt_data
+    symbol = SYMBOLS[0]
+    cot_df = cot_dfs[symbol]
+
+    cot_lines = {line_name: cot_df[COT_COLUMNS[line_name]].to_numpy(dtype=np.float64) for line_name in COT_SIGNAL_INPUTS[COT_COMPONENT_NAME]}
+    cot_signal = compute_cot_signal(COT_COMPONENT_NAME, cot_lines)
+
+    # A report changing the signal, released on a trading date, which only arrives after that date was run
+    price_dates = price_dfs[symbol]['Date']
+    report_row = next(row for row in range(len(cot_df)//2, len(cot_df) - 1) if cot_signal[row] != cot_signal[row - 1])
+    report_date = cot_df['Date'].iloc[report_row]
+    next_date = price_dates[price_dates > report_date].iloc[0]
+    assert cot_df['Date'].iloc[report_row + 1] > next_date
+
+    bootstrap_price_dfs, bootstrap_cot_dfs = slice_bt_data(price_dfs, cot_dfs, end_date=report_date)
+    bootstrap_cot_dfs[symbol] = bootstrap_cot_dfs[symbol].iloc[:-1]
+    portfolio = LivePortfolio(SYMBOLS, cot_component_name=COT_COMPONENT_NAME)
+    portfolio.update(bootstrap_price_dfs, bootstrap_cot_dfs)
+    assert portfolio.get_last_dates(symbol)[1] < report_date
+    assert portfolio.last_inputs['cot'][0] == cot_signal[report_row - 1]
+
+    # Without a new date, the late report waits
+    portfolio.update({symbol: price_dfs[symbol][price_dates <= report_date]}, {symbol: cot_df.iloc[:report_row + 1]})
+    assert portfolio.last_inputs['cot'][0] == cot_signal[report_row - 1]
+    assert portfolio.get_last_dates(symbol)[1] < report_date
+
+    portfolio.update(*slice_bt_data(price_dfs, cot_dfs, end_date=next_date))
+    assert portfolio.last_date == next_date
+    assert portfolio.get_last_dates(symbol)[1] == report_date
+    assert portfolio.last_inputs['cot'][0] == cot_signal[report_row]
+    assert portfolio.last_inputs['cot_active'][0]
@@ -0,0 +1,166 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+from feeds.arrays import get_term_structure_feed, dates2num
+from rolls import build_contract_matrix, get_roll_schedule, build_continuous_contract, get_term_structure_arrays, RollScheduleCache
+
+CONTRACTS = ['2020H', '2020M', '2020U', '2020Z']
+LAST_DATES = ['2020-02-20', '2020-05-20', '2020-08-20', '2020-11-20']
+# Dates each contract's OI/Volume first exceeds the previous contract's one
+OI_SWITCH_DATES = [None, '2020-02-10', '2020-05-11', '2020-08-10']
+VOLUME_SWITCH_DATES = [None, '2020-02-03', '2020-05-04', '2020-08-03']
+
+def get_switch_values(dates: pd.DatetimeIndex, switch_date, next_switch_date) -> np.ndarray:
+    ''' 100 before the contract's switch date, 300 up to the next contract's one and 50 after it '''
+    values = np.full(len(dates), 300.0)
+    if switch_date is not None:
+        values[dates < switch_date] = 100.0
+    if next_switch_date is not None:
+        values[dates >= next_switch_date] = 50.0
+    return values
+
+def get_contract_dfs(end_date='2020-12-31') -> dict:
+    ''' Contracts quoted from the first date to their last date, with closes 10 apart from one contract to the next '''
+    all_dates = pd.bdate_range('2020-01-01', '2020-12-31')
+    contract_dfs = dict()
+    for k, contract in enumerate(CONTRACTS):
+        next_k = min(k + 1, len(CONTRACTS) - 1)
+        closes = 100.0 + 10.0 * k + 0.1 * np.arange(len(all_dates))
+        df = pd.DataFrame({
+            'Date': all_dates.strftime('%Y-%m-%d'),
+            'Open': closes - 1.0, 'High': closes + 1.0, 'Low': closes - 2.0, 'Close': closes,
+            'Volume': get_switch_values(all_dates, VOLUME_SWITCH_DATES[k], VOLUME_SWITCH_DATES[next_k] if next_k > k else None),
+            'OI': get_switch_values(all_dates, OI_SWITCH_DATES[k], OI_SWITCH_DATES[next_k] if next_k > k else None),
+        })
+        contract_dfs[contract] = df[(all_dates <= LAST_DATES[k]) & (all_dates <= end_date)].reset_index(drop=True)
+
+    return contract_dfs
+
+@pytest.fixture(scope='module')
+def matrix():
+    return build_contract_matrix('KC', get_contract_dfs())
+
+@pytest.mark.parametrize('rule, roll_days, expected_dates', [
+    ('open_interest', None, ['2020-01-01', '2020-02-11', '2020-05-12', '2020-08-11']),
+    ('volume', None, ['2020-01-01', '2020-02-04', '2020-05-05', '2020-08-04']),
+    ('calendar', 45, ['2020-01-01', '2020-01-16', '2020-04-17', '2020-07-20']),
+])
+def test_roll_dates(matrix, rule, roll_days, expected_dates):
+    schedule = get_roll_schedule(matrix, rule=rule, roll_days=roll_days)
+    assert schedule['Date'].to_list() == expected_dates
+    assert schedule['Contract'].to_list() == CONTRACTS
+
+def test_roll_dates_capped_by_last_quote(matrix):
+    # Without OI switches, each contract is held up to its last quote
+    contract_dfs = {contract: df.assign(OI=100.0) for contract, df in get_contract_dfs().items()}
+    schedule = get_roll_schedule(build_contract_matrix('KC', contract_dfs), rule='open_interest')
+    assert schedule['Date'].to_list() == ['2020-01-01', '2020-02-21', '2020-05-21', '2020-08-21']
+
+@pytest.mark.parametrize('rule, roll_days', [('open_interest', None), ('volume', None), ('calendar', 45), ('open_interest', 30)])
+def test_incremental_schedule_matches_full(matrix, rule, roll_days):
+    full_schedule = get_roll_schedule(matrix, rule=rule, roll_days=roll_days)
+
+    schedule = None
+    for end_date in ['2020-01-10', '2020-02-10', '2020-02-11', '2020-03-31', '2020-05-20', '2020-08-31', '2020-12-31']:
+        partial_matrix = build_contract_matrix('KC', get_contract_dfs(end_date))
+        schedule = get_roll_schedule(partial_matrix, rule=rule, roll_days=roll_days, schedule=schedule)
+        pd.testing.assert_frame_equal(schedule, get_roll_schedule(partial_matrix, rule=rule, roll_days=roll_days))
+
+    pd.testing.assert_frame_equal(schedule, full_schedule)
+
+def test_cached_schedule_matches_full(matrix, tmp_path):
+    cache = RollScheduleCache(cache_path=str(tmp_path))
+    full_schedule = get_roll_schedule(matrix)
+
+    cache.get_schedule(build_contract_matrix('KC', get_contract_dfs('2020-03-31')))
+    pd.testing.assert_frame_equal(cache.get_schedule(matrix), full_schedule)
+
+    # Up to date entries are returned as they are
+    entries = cache.load('KC')
+    assert entries[cache.get_key('open_interest')]['last_date'] == LAST_DATES[-1]
+    pd.testing.assert_frame_equal(cache.get_schedule(matrix), full_schedule)
+
+    # A matrix starting on another date doesn't extend the cached schedule
+    contract_dfs = {contract: df.iloc[5:].reset_index(drop=True) for contract, df in get_contract_dfs().items()}
+    late_matrix = build_contract_matrix('KC', contract_dfs)
+    pd.testing.assert_frame_equal(cache.get_schedule(late_matrix), get_roll_schedule(late_matrix))
+
+@pytest.fixture(scope='module')
+def raw_df(matrix) -> pd.DataFrame:
+    return build_continuous_contract(matrix, get_roll_schedule(matrix), adjustment='none')
+
+def test_unadjusted_continuous_contract(matrix, raw_df):
+    schedule = get_roll_schedule(matrix)
+    segments = np.searchsorted(schedule['Date'].to_numpy(), raw_df['Date'].to_numpy(), side='right') - 1
+    assert raw_df['Contract'].to_list() == schedule['Contract'].to_numpy()[segments].tolist()
+    assert raw_df['Date'].iloc[-1] == LAST_DATES[-1]
+    assert raw_df['NumericDeliveryMonth'].iloc[0] == 202003
+
+    for contract, contract_df in raw_df.groupby('Contract'):
+        closes = matrix.get_contract(contract)[:, matrix.fields.index('Close')]
+        rows = np.searchsorted(matrix.dates, pd.to_datetime(contract_df['Date']).to_numpy().astype(matrix.dates.dtype))
+        np.testing.assert_array_equal(contract_df['Close'].to_numpy(), closes[rows])
+
+def test_back_adjusted_continuous_contract(matrix, raw_df):
+    df = build_continuous_contract(matrix, get_roll_schedule(matrix), adjustment='back')
+    pd.testing.assert_frame_equal(df[['Date', 'Contract', 'Volume', 'OI']], raw_df[['Date', 'Contract', 'Volume', 'OI']])
+
+    # Each roll gap is 10, added to all the prices before it
+    offsets = df['Contract'].map({'2020H': 30.0, '2020M': 20.0, '2020U': 10.0, '2020Z': 0.0}).to_numpy()
+    for field in ['Open', 'High', 'Low', 'Close']:
+        np.testing.assert_allclose(df[field].to_numpy() - raw_df[field].to_numpy(), offsets)
+
+def test_ratio_adjusted_continuous_contract(matrix, raw_df):
+    schedule = get_roll_schedule(matrix)
+    df = build_continuous_contract(matrix, schedule, adjustment='ratio')
+    pd.testing.assert_frame_equal(df[['Date', 'Contract', 'Volume', 'OI']], raw_df[['Date', 'Contract', 'Volume', 'OI']])
+
+    # The prices before each roll are scaled by the ratio of the contracts' closes on the day before it
+    closes = matrix.get('Close')
+    roll_rows = np.searchsorted(matrix.dates, pd.to_datetime(schedule['Date']).to_numpy().astype(matrix.dates.dtype))[1:] - 1
+    ratios = closes[np.arange(1, len(CONTRACTS)), roll_rows] / closes[np.arange(len(CONTRACTS) - 1), roll_rows]
+    factors = dict(zip(CONTRACTS, np.append(np.cumprod(ratios[::-1])[::-1], 1.0)))
+    for field in ['Open', 'High', 'Low', 'Close']:
+        np.testing.assert_allclose(df[field].to_numpy(), raw_df[field].to_numpy() * df['Contract'].map(factors).to_numpy())
+
+    # So the adjusted close on the day before each roll is the next contract's one, adjusted like it
+    dates = pd.DatetimeIndex(matrix.dates[roll_rows]).strftime('%Y-%m-%d')
+    roll_closes = df.set_index('Date').loc[dates, 'Close'].to_numpy()
+    next_factors = np.array([factors[contract] for contract in CONTRACTS[1:]])
+    np.testing.assert_allclose(roll_closes, closes[np.arange(1, len(CONTRACTS)), roll_rows] * next_factors)
+
+class LinesRecorder(bt.Strategy):
+    ''' Records the feed's lines on each bar '''
+    params = (('lines', ()), )
+
+    def __init__(self):
+        self.values = {line: list() for line in self.p.lines}
+
+    def next(self):
+        for line in self.p.lines:
+            self.values[line].append(getattr(self.data.lines, line)[0])
+
+@pytest.mark.parametrize('preload', [True, False])
+def test_term_structure_feed(matrix, preload):
+    arrays = get_term_structure_arrays(matrix, n_contracts=3)
+    feed_class = get_term_structure_feed(3)
+    assert feed_class.__name__ == 'TermStructure3_ArrayData'
+
+    columns = {'datetime': None, 'close': 'Close', 'openinterest': 'OI'}
+    for i in range(1, 4):
+        columns.update({f'close{i}': f'Close_{i}', f'dte{i}': f'DTE_{i}', f'delivery{i}': f'Delivery_{i}'})
+
+    cerebro = bt.Cerebro(stdstats=False, preload=preload, runonce=preload)
+    cerebro.adddata(feed_class(dataname=arrays), name='KC')
+    cerebro.addstrategy(LinesRecorder, lines=tuple(columns.keys()))
+    values = cerebro.run()[0].values
+
+    np.testing.assert_array_equal(values['datetime'], dates2num(arrays['Date']))
+    for line, column in columns.items():
+        if column is not None:
+            np.testing.assert_array_equal(values[line], arrays[column], err_msg=line)
+
+    # The back contracts' lines are NaN once fewer contracts are listed
+    assert np.isnan(values['close3'][-1]) and not np.isnan(values['close1'][-1])
+    assert values['delivery1'][0] == 202003 and values['delivery3'][0] == 202009
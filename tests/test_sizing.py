@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from sizing import PortfolioSizer
+
+AUM = 1e6
+# Entries on symbols 0 and 2 (25 and 10 contracts, 25k notional each), with 5 contracts of symbol 1 held (100k notional,
+# 10k margin)
+INDICES = [0, 2]
+PRICES = [100.0, 50.0]
+STOPS = [90.0, 45.0]
+POSITIONS = np.array([0.0, 5.0, 0.0])
+MARKS = np.array([np.nan, 200.0, np.nan])
+
+def get_sizer(**limits) -> PortfolioSizer:
+    return PortfolioSizer(mult=[10.0, 100.0, 50.0], margin=[1000.0, 2000.0, 5000.0], categories=['Softs', 'Softs', 'Grains'],
+                          n_entries=2, **limits)
+
+def get_sizes(sizer: PortfolioSizer, positions=POSITIONS, marks=MARKS) -> list:
+    sizes = sizer.get_sizes(INDICES, PRICES, STOPS, AUM, positions=positions, marks=marks)
+    assert sizes.dtype == np.int64
+    return sizes.tolist()
+
+def test_risk_sizes_without_limits():
+    assert not get_sizer().has_limits
+    assert get_sizes(get_sizer(), positions=None, marks=None) == [25, 10]
+    assert get_sizer().get_sizes([], [], [], AUM).tolist() == []
+
+@pytest.mark.parametrize('limits, expected_sizes', [
+    # Within all the limits
+    ({'max_gross_exposure': 1.0, 'max_category_exposure': 1.0, 'max_margin_usage': 1.0}, [25, 10]),
+    # 25k of gross exposure left for 50k of new exposure: both entries halved
+    ({'max_gross_exposure': 0.125}, [12, 5]),
+    # 10k of Softs exposure left for 25k (symbol 0 only), Grains within the limit
+    ({'max_category_exposure': 0.11}, [10, 10]),
+    # 37.5k of margin left for 75k of new margin: both entries halved
+    ({'max_margin_usage': 0.0475}, [12, 5]),
+    # The tightest limit applies
+    ({'max_gross_exposure': 0.125, 'max_category_exposure': 0.11}, [10, 5]),
+])
+def test_sizes_scaled_to_limits(limits, expected_sizes):
+    assert get_sizes(get_sizer(**limits)) == expected_sizes
+
+@pytest.mark.parametrize('limits, expected_sizes', [
+    # 3.2% of the demand fits: less than a contract each
+    ({'max_gross_exposure': 0.1016}, [0, 0]),
+    # 12% of the demand fits: 3 contracts of symbol 0 and 1 of symbol 2 (floored)
+    ({'max_gross_exposure': 0.106}, [3, 1]),
+    ({'max_margin_usage': 0.019}, [3, 1]),
+    # 4% of the demand fits: 1 contract of symbol 0, symbol 2 dropped
+    ({'max_margin_usage': 0.013}, [1, 0]),
+    # Budget already spent by the current positions
+    ({'max_gross_exposure': 0.05}, [0, 0]),
+    ({'max_category_exposure': 0.05}, [0, 10]),
+])
+def test_entries_below_one_contract_dropped(limits, expected_sizes):
+    assert get_sizes(get_sizer(**limits)) == expected_sizes
+
+def test_flat_symbols_with_nan_marks():
+    sizer = get_sizer(max_gross_exposure=0.125, max_category_exposure=0.11, max_margin_usage=0.0475)
+    assert get_sizes(sizer) == get_sizes(sizer, marks=np.nan_to_num(MARKS, nan=123.0))
+
+    # No positions and no prices yet: only the margin limit (47.5k for 75k) scales the entries
+    assert get_sizes(sizer, positions=np.zeros(3), marks=np.full(3, np.nan)) == [15, 6]
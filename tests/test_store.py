@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import pandas as pd
+from store import write_store_table, read_store_table, append_store_table, compact_store_table, get_store_part_paths
+
+def get_price_df(start_date: str, periods: int, close=100.0) -> pd.DataFrame:
+    dates = pd.bdate_range(start_date, periods=periods)
+    return pd.DataFrame({'Date': dates.strftime('%Y-%m-%d'), 'Close': close + np.arange(periods, dtype=np.float64)})
+
+def test_append_writes_parts_only(tmp_path):
+    file_path = os.path.join(tmp_path, 'perpetual_OI.parquet')
+    write_store_table(get_price_df('2022-01-03', 50), file_path)
+    table_mtime = os.path.getmtime(file_path)
+
+    append_store_table(get_price_df('2022-03-14', 5, close=200.0), file_path)
+    append_store_table(get_price_df('2022-03-21', 5, close=300.0), file_path)
+
+    assert os.path.getmtime(file_path) == table_mtime
+    assert len(get_store_part_paths(file_path)) == 2
+
+    df = read_store_table(file_path)
+    expected_df = pd.concat([get_price_df('2022-01-03', 50), get_price_df('2022-03-14', 5, close=200.0), get_price_df('2022-03-21', 5, close=300.0)], ignore_index=True)
+    expected_df = expected_df.drop_duplicates(subset='Date', keep='last').reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, expected_df)
+
+    # Appended rows replace the earlier ones with the same keys
+    assert df.loc[df['Date'] == '2022-03-21', 'Close'].item() == 300.0
+
+    # Date filters and column subsets apply to the parts as well
+    df = read_store_table(file_path, columns=['Close'], after_date='2022-03-18')
+    assert df.columns.to_list() == ['Date', 'Close']
+    assert df['Date'].to_list() == get_price_df('2022-03-21', 5)['Date'].to_list()
+
+def test_compaction(tmp_path):
+    file_path = os.path.join(tmp_path, 'contracts.parquet')
+    keys = ['Contract', 'Date']
+    write_store_table(get_price_df('2022-01-03', 10).assign(Contract='2022H'), file_path)
+    for i in range(3):
+        append_store_table(get_price_df('2022-01-10', 10, close=float(i)).assign(Contract=f'2022{"HKN"[i]}'), file_path, keys=keys, max_parts=3)
+
+    # The third part reached max_parts, so the parts were merged into the table
+    assert get_store_part_paths(file_path) == []
+    df = read_store_table(file_path)
+    assert len(df) == 10 + 5 + 10 + 10
+    assert df.loc[(df['Contract'] == '2022H') & (df['Date'] == '2022-01-10'), 'Close'].item() == 0.0
+
+    append_store_table(get_price_df('2022-02-01', 3).assign(Contract='2022U'), file_path, keys=keys)
+    before_df = read_store_table(file_path, keys=keys)
+    compact_store_table(file_path, keys=keys)
+    assert get_store_part_paths(file_path) == []
+    pd.testing.assert_frame_equal(read_store_table(file_path), before_df)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from cot_bt import get_bt_data
+from sweep import get_param_grid
+from vector_bt import compare_backtests, run_vector_backtest, run_batched_backtest
+
+# Small universe of the Backtrader comparisons (read from the repository's data folder)
+SYMBOLS = ['CC', 'KC', 'C']
+
+@pytest.fixture(scope='module')
+def bt_data() -> tuple:
+    return get_bt_data(SYMBOLS)
+
+@pytest.mark.parametrize('cot_component_name', ['mm_concentration', 'pmpu_oi', 'mm_clustering&possize'])
+def test_vector_backtest_matches_backtrader(bt_data, cot_component_name):
+    price_dfs, cot_dfs = bt_data
+    comparison = compare_backtests(price_dfs, cot_dfs, cot_component_name=cot_component_name)
+
+    n_bt_trades, n_vector_trades = comparison['n_trades']
+    assert n_bt_trades > 0
+    assert n_bt_trades == n_vector_trades
+    assert comparison['same_trades']
+    assert comparison['max_equity_difference'] == pytest.approx(0.0, abs=1e-6)
+    assert comparison['vector_final_value'] == pytest.approx(comparison['backtrader_final_value'], abs=1e-6)
+
+def test_vector_backtest_matches_backtrader_params(bt_data):
+    price_dfs, cot_dfs = bt_data
+    comparison = compare_backtests(price_dfs, cot_dfs, cot_component_name='mm_concentration', breakout_period=10,
+                                    n_entries=1, cot_component_period=26, cot_threshold=60)
+
+    assert comparison['same_trades']
+    assert comparison['max_equity_difference'] == pytest.approx(0.0, abs=1e-6)
+
+def count_closed_trades(trades) -> int:
+    # Executions closing a position (the strategy only closes positions in full), as the batched kernel counts them
+    n_closed = 0
+    for _, symbol_trades in trades.groupby('symbol'):
+        positions_before = np.concatenate([[0.0], np.cumsum(symbol_trades['size'].to_numpy())[:-1]])
+        n_closed += int(np.sum((positions_before != 0) & (np.sign(symbol_trades['size'].to_numpy()) != np.sign(positions_before))))
+    return n_closed
+
+def test_batched_backtest_matches_single_runs(bt_data):
+    price_dfs, cot_dfs = bt_data
+    params_list = get_param_grid({
+        'breakout_period': [10, 20],
+        'n_entries': [1, 3],
+        'cot_component_name': ['mm_concentration', 'pmpu_oi'],
+        'cot_component_period': [26, 52],
+    })
+    results = run_batched_backtest(price_dfs, cot_dfs, params_list)
+    assert len(results) == len(params_list) == 16
+
+    for params, result in zip(params_list, results.to_dict('records')):
+        equity, trades = run_vector_backtest(price_dfs, cot_dfs, **params)
+        values = equity.to_numpy()
+        peak = np.maximum.accumulate(np.maximum(values, 1.5e6))
+        max_drawdown = np.max(100.0 * (peak - values) / peak)
+
+        assert result['final_value'] == pytest.approx(values[-1], abs=1e-6), params
+        assert result['n_trades'] == count_closed_trades(trades), params
+        assert result['max_drawdown'] == pytest.approx(max_drawdown, abs=1e-9), params
@@ -0,0 +1,645 @@
+import argparse
+import numpy as np
+import pandas as pd
+from math import floor
+from time import perf_counter
+import backtrader as bt
+from comm_factories import FuturesCommFactory
+from sizing import get_risk_sizes
+from vector_signals import donchian_channel, breakout_signal, compute_cot_signal, COT_SIGNAL_INPUTS
+
+# Numba is optional: without it the kernel runs as plain Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+COT_COLUMNS = {
+    'mml_concentration': 'MML_Concentration', 'mml_clustering': 'MML_Clustering', 'mml_possize': 'MML_PosSize',
+    'mms_concentration': 'MMS_Concentration', 'mms_clustering': 'MMS_Clustering', 'mms_possize': 'MMS_PosSize',
+    'pmpu_netoi': 'PMPU_Net_OI', 'pmpu_nett': 'PMPU_Net_T', 'pmpu_netpossize': 'PMPU_Net_PosSize',
+}
+
+#- KERNEL INPUTS
+
+def get_kernel_inputs(price_dfs: dict, cot_dfs: dict, symbols: list, breakout_period=20,
+                        cot_component_name=None, cot_component_period=52, cot_threshold=70) -> dict:
+    ''' Precomputes the COT_Breakout indicators of each symbol (on its own bars) and lays them out on the union of the
+    symbols' dates, as (date x symbol) arrays. On dates without a bar, a symbol keeps its last values, as its data
+    feed does in Backtrader
+    :param price_dfs, cot_dfs: Dicts of DataFrames by symbol (see cot_bt.get_bt_data)
+    '''
+    dates, price_rows, cot_rows = get_kernel_calendar(price_dfs, cot_dfs, symbols)
+    inputs = get_breakout_inputs(price_dfs, symbols, price_rows, breakout_period=breakout_period)
+    inputs.update(get_cot_inputs(cot_dfs, symbols, cot_rows, cot_component_name=cot_component_name,
+                                    cot_component_period=cot_component_period, cot_threshold=cot_threshold))
+    inputs.update(get_comm_inputs(symbols))
+
+    # As PortfolioStrategyBase._is_active: all indicators and signals started and not NaN
+    inputs['active'] = inputs.pop('price_active') & inputs.pop('cot_active')
+    inputs['dates'] = dates
+
+    return inputs
+
+def get_kernel_calendar(price_dfs: dict, cot_dfs: dict, symbols: list) -> tuple:
+    ''' Union of the symbols' price and COT dates, and the last bar of each symbol on (or before) each of them
+    :return: Tuple (dates, price_rows, cot_rows), with (symbol x date) rows, -1 before the symbol's first bar
+    '''
+    price_dates = [pd.to_datetime(price_dfs[symbol]['Date']).to_numpy().astype('datetime64[ns]') for symbol in symbols]
+    cot_dates = [pd.to_datetime(cot_dfs[symbol]['Date']).to_numpy().astype('datetime64[ns]') for symbol in symbols]
+    dates = np.unique(np.concatenate(price_dates + cot_dates))
+
+    price_rows = np.array([np.searchsorted(symbol_dates, dates, side='right') - 1 for symbol_dates in price_dates]).reshape(len(symbols), len(dates))
+    cot_rows = np.array([np.searchsorted(symbol_dates, dates, side='right') - 1 for symbol_dates in cot_dates]).reshape(len(symbols), len(dates))
+
+    return dates, price_rows, cot_rows
+
+def get_breakout_inputs(price_dfs: dict, symbols: list, price_rows: np.ndarray, breakout_period=20) -> dict:
+    ''' Prices, Donchian mid-band and breakout signal (date x symbol) arrays, and where they are all available '''
+    shape = price_rows.T.shape
+    inputs = {name: np.full(shape, np.nan) for name in ['close', 'high', 'low', 'mband', 'breakout']}
+    inputs['price_active'] = np.zeros(shape, dtype=np.bool_)
+    for i, symbol in enumerate(symbols):
+        price_df = price_dfs[symbol]
+        close = price_df['Close'].to_numpy(dtype=np.float64)
+        hband, lband, mband, wband = donchian_channel(close, period=breakout_period)
+        price_values = {
+            'close': close,
+            'high': price_df['High'].to_numpy(dtype=np.float64),
+            'low': price_df['Low'].to_numpy(dtype=np.float64),
+            'mband': mband,
+            'breakout': breakout_signal(close, mband, wband),
+        }
+
+        has_price = price_rows[i] >= 0
+        rows = price_rows[i][has_price]
+        for name, values in price_values.items():
+            inputs[name][has_price, i] = values[rows]
+
+        is_valid = np.isfinite(hband) & np.isfinite(lband) & np.isfinite(mband) & np.isfinite(wband) & ~np.isnan(price_values['breakout'])
+        inputs['price_active'][has_price, i] = is_valid[rows]
+
+    return inputs
+
+def get_cot_inputs(cot_dfs: dict, symbols: list, cot_rows: np.ndarray, cot_component_name=None, cot_component_period=52, cot_threshold=70) -> dict:
+    ''' COT signal (date x symbol) array, and where it is available '''
+    shape = cot_rows.T.shape
+    inputs = {'cot': np.full(shape, np.nan), 'cot_active': np.zeros(shape, dtype=np.bool_)}
+    for i, symbol in enumerate(symbols):
+        cot_df = cot_dfs[symbol]
+        cot_lines = {line_name: cot_df[COT_COLUMNS[line_name]].to_numpy(dtype=np.float64) for line_name in COT_SIGNAL_INPUTS[cot_component_name]}
+        cot_signal = compute_cot_signal(cot_component_name, cot_lines, period=cot_component_period, threshold=cot_threshold)
+
+        has_cot = cot_rows[i] >= 0
+        rows = cot_rows[i][has_cot]
+        inputs['cot'][has_cot, i] = cot_signal[rows]
+        inputs['cot_active'][has_cot, i] = ~np.isnan(cot_signal[rows])
+
+    return inputs
+
+def get_comm_inputs(symbols: list) -> dict:
+    ''' Multiplier, margin and (fixed) commission of each symbol's FuturesCommFactory scheme '''
+    comminfos = [FuturesCommFactory().create_comminfo(instrument_symbol=symbol) for symbol in symbols]
+    return {
+        'mult': np.array([comminfo.p.mult for comminfo in comminfos], dtype=np.float64),
+        'margin': np.array([comminfo.p.margin for comminfo in comminfos], dtype=np.float64),
+        'commission': np.array([comminfo.p.commission for comminfo in comminfos], dtype=np.float64),
+    }
+
+#- KERNEL
+
+@njit(cache=True)
+def _get_position_sizing(mult, price, stop, aum, n_entries):
+    # Same rules as sizing.get_risk_sizes, for a single entry (so that Numba can compile it)
+    wc_loss = mult * abs(price - stop)
+    size_wc = ((0.005 * aum) / n_entries) / wc_loss
+
+    if price*size_wc > 0.3 * aum:
+        size_ind_pos = 0.3 * aum / price
+    else:
+        size_ind_pos = size_wc
+
+    size = min(size_wc, size_ind_pos)
+    if size < 1:
+        return 1.0
+    else:
+        return float(floor(size))
+
+@njit(cache=True)
+def _split_order(position_size, size):
+    # As backtrader's Position.update: returns the (opened, closed) parts of an order
+    new_size = position_size + size
+    if new_size == 0:
+        return 0.0, size
+    elif position_size == 0:
+        return size, 0.0
+    elif position_size > 0:
+        if size > 0:
+            return size, 0.0
+        elif new_size > 0:
+            return 0.0, size
+        return new_size, -position_size
+    else:
+        if size < 0:
+            return size, 0.0
+        elif new_size < 0:
+            return 0.0, size
+        return new_size, -position_size
+
+# State carried by _run_kernel from one call to the next (see get_kernel_state)
+KERNEL_STATE = ['account', 'position', 'adjbase', 'entries_count', 'initial_cot', 'order_size', 'order_price', 'order_bar', 'has_order']
+
+def get_kernel_state(n_symbols: int, cash=1.5e6) -> dict:
+    ''' Initial (flat) state of _run_kernel: the broker's account (cash and value of the last bar, as a 2 items array)
+    and positions (with their mark-to-market base prices), the strategy's entries and initial COT signals, and the orders
+    pending at the end of the last bar (order_bar is -1 for orders created before the bars of the call)
+    '''
+    return {
+        'account': np.array([cash, cash], dtype=np.float64),
+        'position': np.zeros(n_symbols),
+        'adjbase': np.zeros(n_symbols),
+        'entries_count': np.zeros(n_symbols, dtype=np.int64),
+        'initial_cot': np.full(n_symbols, np.nan),
+        'order_size': np.zeros(n_symbols),
+        'order_price': np.zeros(n_symbols),
+        'order_bar': np.full(n_symbols, -1, dtype=np.int64),
+        'has_order': np.zeros(n_symbols, dtype=np.bool_),
+    }
+
+@njit(cache=True)
+def _run_kernel(close, high, low, mband, breakout, cot, active, mult, margin, commission,
+                n_entries, slip_perc, slip_open,
+                account, position, adjbase, entries_count, initial_cot, order_size, order_price, order_bar, has_order):
+    # The state arrays (see KERNEL_STATE) are updated in place, so a later call resumes where this one stopped
+    n_bars, n_symbols = close.shape
+
+    values = np.empty(n_bars)
+    positions = np.empty((n_bars, n_symbols))
+    trade_bar = np.empty(n_bars*n_symbols, dtype=np.int64)
+    trade_symbol = np.empty(n_bars*n_symbols, dtype=np.int64)
+    trade_size = np.empty(n_bars*n_symbols)
+    trade_price = np.empty(n_bars*n_symbols)
+    trade_commission = np.empty(n_bars*n_symbols)
+    n_trades = 0
+    n_rejected = 0
+
+    cash = account[0]
+    aum = account[1]
+    for t in range(n_bars):
+
+        #- BROKER (BackBroker.next)
+        # Margin check of the orders submitted on the previous bar, in submission order
+        check_cash = cash
+        accepted = np.zeros(n_symbols, dtype=np.bool_)
+        for i in range(n_symbols):
+            if has_order[i]:
+                opened, closed = _split_order(position[i], order_size[i])
+                if closed != 0:
+                    check_cash += abs(closed) * margin[i]
+                    check_cash -= abs(closed) * commission[i]
+                if opened != 0:
+                    check_cash -= abs(opened) * margin[i]
+                    check_cash -= abs(opened) * commission[i]
+                accepted[i] = check_cash >= 0.0
+                if not accepted[i]:
+                    n_rejected += 1
+
+        # Market orders, executed at the close of the bar they were created on (cheat-on-close)
+        for i in range(n_symbols):
+            if has_order[i] and accepted[i]:
+                size = order_size[i]
+                price = order_price[i]
+                if slip_open and slip_perc:
+                    if size > 0:
+                        price = min(price * (1 + slip_perc), high[t, i])
+                    else:
+                        price = max(price * (1 - slip_perc), low[t, i])
+
+                new_size = position[i] + size
+                opened, closed = _split_order(position[i], size)
+                exec_cash = cash
+                if closed != 0:
+                    exec_cash += abs(closed) * margin[i]
+                    exec_cash -= abs(closed) * commission[i]
+                    exec_cash += -closed * (price - adjbase[i]) * mult[i]
+                    cash = exec_cash
+
+                if opened != 0:
+                    exec_cash -= abs(opened) * margin[i]
+                    exec_cash -= abs(opened) * commission[i]
+                    if exec_cash < 0.0:
+                        opened = 0.0
+                    else:
+                        if abs(new_size) > abs(opened):
+                            exec_cash += (new_size - opened) * (price - adjbase[i]) * mult[i]
+                        adjbase[i] = price
+                        cash = exec_cash
+
+                executed = closed + opened
+                if executed != 0:
+                    position[i] += executed
+                    trade_bar[n_trades] = order_bar[i]
+                    trade_symbol[n_trades] = i
+                    trade_size[n_trades] = executed
+                    trade_price[n_trades] = price
+                    trade_commission[n_trades] = abs(closed) * commission[i] + abs(opened) * commission[i]
+                    n_trades += 1
+
+            has_order[i] = False
+
+        # Futures positions are marked to market at the end of every bar
+        for i in range(n_symbols):
+            if position[i] != 0:
+                cash += position[i] * (close[t, i] - adjbase[i]) * mult[i]
+                adjbase[i] = close[t, i]
+
+        value = cash
+        for i in range(n_symbols):
+            value += abs(position[i]) * margin[i]
+        values[t] = value
+        positions[t] = position
+
+        #- STRATEGY (COT_Breakout.pnext)
+        for i in range(n_symbols):
+            if not active[t, i]:
+                continue
+
+            price = close[t, i]
+            stop = mband[t, i]
+            breakout_signal = breakout[t, i]
+
+            #- NEW POSITIONS
+            if position[i] == 0 and entries_count[i] == 0:
+                cot_signal = cot[t, i]
+
+                # LONG side
+                if cot_signal > 0 and breakout_signal > 1:
+                    order_size[i] = _get_position_sizing(mult[i], price, stop, aum, n_entries)
+                    order_price[i] = price
+                    order_bar[i] = t
+                    has_order[i] = True
+                    entries_count[i] += 1
+                    initial_cot[i] = cot_signal
+
+                # SHORT side
+                elif cot_signal < 0 and breakout_signal < -1:
+                    order_size[i] = -_get_position_sizing(mult[i], price, stop, aum, n_entries)
+                    order_price[i] = price
+                    order_bar[i] = t
+                    has_order[i] = True
+                    entries_count[i] += 1
+                    initial_cot[i] = cot_signal
+
+            #- ONGOING POSITIONS
+            elif position[i] > 0:
+
+                # LONG POSITION STOP RULE
+                if price < stop:
+                    order_size[i] = -position[i]
+                    order_price[i] = price
+                    order_bar[i] = t
+                    has_order[i] = True
+                    entries_count[i] = 0
+
+                # INCREASE position after CONSECUTIVE BREAKOUTS
+                elif breakout_signal > 1 and entries_count[i] < n_entries:
+                    order_size[i] = _get_position_sizing(mult[i], price, stop, aum, n_entries)
+                    order_price[i] = price
+                    order_bar[i] = t
+                    has_order[i] = True
+                    entries_count[i] += 1
+
+            elif position[i] < 0:
+
+                # SHORT POSITION STOP RULE
+                if price > stop:
+                    order_size[i] = -position[i]
+                    order_price[i] = price
+                    order_bar[i] = t
+                    has_order[i] = True
+                    entries_count[i] = 0
+
+                # INCREASE position after CONSECUTIVE BREAKOUTS
+                elif breakout_signal < -1 and entries_count[i] < n_entries:
+                    order_size[i] = -_get_position_sizing(mult[i], price, stop, aum, n_entries)
+                    order_price[i] = price
+                    order_bar[i] = t
+                    has_order[i] = True
+                    entries_count[i] += 1
+
+        aum = value
+
+    account[0] = cash
+    account[1] = aum
+    return (values, positions, trade_bar[:n_trades], trade_symbol[:n_trades], trade_size[:n_trades],
+            trade_price[:n_trades], trade_commission[:n_trades], n_rejected)
+
+def run_vector_backtest(price_dfs: dict, cot_dfs: dict, symbols=None, cash=1.5e6, slip_perc=0.005, slip_open=False,
+                        breakout_period=20, n_entries=3, cot_component_name=None, cot_component_period=52, cot_threshold=70) -> tuple:
+    ''' Runs the COT_Breakout rules (as cot_bt.get_cerebro sets them up) as a single array-driven loop, without
+    Backtrader. Orders are market orders filled at the close of the bar they were created on, with the futures
+    margin, commission and daily cash settlement of FuturesCommFactory's schemes. As in BackBroker, slip_perc is only
+    applied to them if slip_open is True
+    :return: Tuple (equity, trades), with the broker value by date (pd.Series) and the executed orders (pd.DataFrame)
+    '''
+    if not cot_component_name:
+        raise ValueError("The COT component name must be passed as a parameter with keyword 'cot_component_name'")
+
+    symbols = list(symbols) if symbols is not None else list(price_dfs.keys())
+    inputs = get_kernel_inputs(price_dfs, cot_dfs, symbols, breakout_period=breakout_period, cot_component_name=cot_component_name,
+                                cot_component_period=cot_component_period, cot_threshold=cot_threshold)
+
+    state = get_kernel_state(len(symbols), cash=float(cash))
+    values, _, trade_bar, trade_symbol, trade_size, trade_price, trade_commission, _ = _run_kernel(
+        inputs['close'], inputs['high'], inputs['low'], inputs['mband'], inputs['breakout'], inputs['cot'], inputs['active'],
+        inputs['mult'], inputs['margin'], inputs['commission'], int(n_entries), float(slip_perc), bool(slip_open),
+        *[state[name] for name in KERNEL_STATE])
+
+    equity = pd.Series(values, index=pd.DatetimeIndex(inputs['dates'], name='Date'), name='Equity')
+    trades = pd.DataFrame({
+        'Date': inputs['dates'][trade_bar],
+        'symbol': np.array(symbols, dtype=object)[trade_symbol],
+        'size': trade_size,
+        'price': trade_price,
+        'commission': trade_commission,
+    })
+
+    return equity, trades
+
+#- BATCHED KERNEL
+
+def _split_batched_order(position_size, size):
+    # _split_order over arrays of positions and orders
+    new_size = position_size + size
+    same_side = (position_size == 0) | (np.sign(position_size) == np.sign(size))
+    reversed_side = ~same_side & (np.sign(new_size) == -np.sign(position_size))
+
+    opened = np.where(same_side, size, np.where(reversed_side, new_size, 0.0))
+    closed = np.where(same_side, 0.0, np.where(reversed_side, -position_size, size))
+    return opened, closed
+
+def _run_batched_kernel(close, high, low, mband, breakout, price_active, cot, cot_active, breakout_index, cot_index,
+                        n_entries, mult, margin, commission, cash, slip_perc, slip_open):
+    ''' _run_kernel over N parameter sets at once: the broker and strategy state are (N x symbol) arrays, and the
+    parameter sets pick their indicators from the breakout (date x breakout variant x symbol) and COT (date x COT
+    variant x symbol) arrays through breakout_index and cot_index. The operations are applied in the same order as in
+    _run_kernel, so each parameter set gets the same results as its own run
+    '''
+    n_bars, n_symbols = close.shape
+    n_sets = len(n_entries)
+    n_entries = n_entries.reshape(n_sets, 1).astype(np.float64)
+    max_entries = n_entries.astype(np.int64)
+
+    position = np.zeros((n_sets, n_symbols))
+    adjbase = np.zeros((n_sets, n_symbols))
+    entries_count = np.zeros((n_sets, n_symbols), dtype=np.int64)
+    order_size = np.zeros((n_sets, n_symbols))
+    order_price = np.zeros((n_sets, n_symbols))
+    has_order = np.zeros((n_sets, n_symbols), dtype=np.bool_)
+
+    cash = np.full(n_sets, cash, dtype=np.float64)
+    aum = cash.copy()
+    peak = cash.copy()
+    max_drawdown = np.zeros(n_sets)
+    n_trades = np.zeros(n_sets, dtype=np.int64)
+    n_rejected = np.zeros(n_sets, dtype=np.int64)
+    values = np.empty((n_bars, n_sets))
+
+    for t in range(n_bars):
+
+        #- BROKER (BackBroker.next)
+        # Margin check of the orders submitted on the previous bar, in submission order
+        check_cash = cash.copy()
+        accepted = np.zeros((n_sets, n_symbols), dtype=np.bool_)
+        for i in range(n_symbols):
+            ordered = has_order[:, i]
+            if not ordered.any():
+                continue
+            opened, closed = _split_batched_order(position[:, i], order_size[:, i])
+            check_cash = np.where(ordered & (closed != 0), check_cash + np.abs(closed) * margin[i], check_cash)
+            check_cash = np.where(ordered & (closed != 0), check_cash - np.abs(closed) * commission[i], check_cash)
+            check_cash = np.where(ordered & (opened != 0), check_cash - np.abs(opened) * margin[i], check_cash)
+            check_cash = np.where(ordered & (opened != 0), check_cash - np.abs(opened) * commission[i], check_cash)
+            accepted[:, i] = ordered & (check_cash >= 0.0)
+            n_rejected += ordered & (check_cash < 0.0)
+
+        # Market orders, executed at the close of the bar they were created on (cheat-on-close)
+        for i in range(n_symbols):
+            executing = accepted[:, i]
+            if not executing.any():
+                continue
+            size = order_size[:, i]
+            price = order_price[:, i]
+            if slip_open and slip_perc:
+                price = np.where(size > 0, np.minimum(price * (1 + slip_perc), high[t, i]), np.maximum(price * (1 - slip_perc), low[t, i]))
+
+            new_size = position[:, i] + size
+            opened, closed = _split_batched_order(position[:, i], size)
+            exec_cash = cash.copy()
+            closing = executing & (closed != 0)
+            exec_cash = np.where(closing, exec_cash + np.abs(closed) * margin[i], exec_cash)
+            exec_cash = np.where(closing, exec_cash - np.abs(closed) * commission[i], exec_cash)
+            exec_cash = np.where(closing, exec_cash + -closed * (price - adjbase[:, i]) * mult[i], exec_cash)
+            cash = np.where(closing, exec_cash, cash)
+
+            opening = executing & (opened != 0)
+            exec_cash = np.where(opening, exec_cash - np.abs(opened) * margin[i], exec_cash)
+            exec_cash = np.where(opening, exec_cash - np.abs(opened) * commission[i], exec_cash)
+            opening_rejected = opening & (exec_cash < 0.0)
+            opening &= ~opening_rejected
+            opened = np.where(opening_rejected, 0.0, opened)
+            exec_cash = np.where(opening & (np.abs(new_size) > np.abs(opened)),
+                                    exec_cash + (new_size - opened) * (price - adjbase[:, i]) * mult[i], exec_cash)
+            adjbase[:, i] = np.where(opening, price, adjbase[:, i])
+            cash = np.where(opening, exec_cash, cash)
+
+            executed = np.where(executing, closed + opened, 0.0)
+            position[:, i] += executed
+            # Closed trades, as counted by TradeAnalyzer (the strategy only closes positions in full)
+            n_trades += executing & (closed != 0)
+
+        has_order[:] = False
+
+        # Futures positions are marked to market at the end of every bar
+        for i in range(n_symbols):
+            held = position[:, i] != 0
+            if held.any():
+                cash = np.where(held, cash + position[:, i] * (close[t, i] - adjbase[:, i]) * mult[i], cash)
+                adjbase[:, i] = np.where(held, close[t, i], adjbase[:, i])
+
+        value = cash.copy()
+        for i in range(n_symbols):
+            value += np.abs(position[:, i]) * margin[i]
+        values[t] = value
+
+        peak = np.maximum(peak, value)
+        max_drawdown = np.maximum(max_drawdown, 100.0 * (peak - value) / peak)
+
+        #- STRATEGY (COT_Breakout.pnext)
+        active = price_active[t][breakout_index] & cot_active[t][cot_index]
+        if active.any():
+            price = np.broadcast_to(close[t], (n_sets, n_symbols))
+            stop = mband[t][breakout_index]
+            breakout_signal = breakout[t][breakout_index]
+            cot_signal = cot[t][cot_index]
+
+            #- NEW POSITIONS
+            is_flat = active & (position == 0) & (entries_count == 0)
+            long_entry = is_flat & (cot_signal > 0) & (breakout_signal > 1)
+            short_entry = is_flat & ~long_entry & (cot_signal < 0) & (breakout_signal < -1)
+
+            #- ONGOING POSITIONS
+            is_long = active & ~is_flat & (position > 0)
+            long_stop = is_long & (price < stop)
+            long_add = is_long & ~long_stop & (breakout_signal > 1) & (entries_count < max_entries)
+
+            is_short = active & ~is_flat & (position < 0)
+            short_stop = is_short & (price > stop)
+            short_add = is_short & ~short_stop & (breakout_signal < -1) & (entries_count < max_entries)
+
+            buy = long_entry | long_add
+            sell = short_entry | short_add
+            stops = long_stop | short_stop
+            if (buy | sell).any():
+                sizing = get_risk_sizes(mult, price, stop, aum.reshape(n_sets, 1), n_entries)
+                order_size = np.where(buy, sizing, np.where(sell, -sizing, order_size))
+            order_size = np.where(stops, -position, order_size)
+
+            has_order = buy | sell | stops
+            order_price = np.where(has_order, price, order_price)
+            entries_count = np.where(stops, 0, entries_count + (buy | sell))
+
+        aum = value
+
+    return values, max_drawdown, n_trades, n_rejected
+
+def run_batched_backtest(price_dfs: dict, cot_dfs: dict, params_list: list, symbols=None, cash=1.5e6, slip_perc=0.005,
+                            slip_open=False, return_equity=False):
+    ''' Runs the COT_Breakout rules of run_vector_backtest for many parameter sets in a single pass over the dates.
+    The indicators are computed once per distinct breakout period and COT signal (name, period, threshold), and the
+    parameter sets are stepped together as (parameter set x symbol) arrays, so large grids (e.g. sweep.get_param_grid)
+    run in one process
+    :param params_list: List of dicts of COT_Breakout parameters (breakout_period, n_entries, cot_component_name,
+    cot_component_period, cot_threshold), with the COT_Breakout defaults for the ones missing
+    :param return_equity: Also returns the equity curves (DataFrame with a column per parameter set)
+    :return: DataFrame with the params and metrics (final_value, total_return, max_drawdown, n_trades, n_rejected)
+    of each parameter set, or tuple (results, equity) if return_equity is True
+    '''
+    params_list = [{'breakout_period': 20, 'n_entries': 3, 'cot_component_period': 52, 'cot_threshold': 70, **params} for params in params_list]
+    if any(not params.get('cot_component_name') for params in params_list):
+        raise ValueError("The COT component name must be passed as a parameter with keyword 'cot_component_name'")
+
+    symbols = list(symbols) if symbols is not None else list(price_dfs.keys())
+    dates, price_rows, cot_rows = get_kernel_calendar(price_dfs, cot_dfs, symbols)
+
+    breakout_periods = sorted({params['breakout_period'] for params in params_list})
+    cot_configs = sorted({(params['cot_component_name'], params['cot_component_period'], params['cot_threshold']) for params in params_list})
+
+    breakout_inputs = [get_breakout_inputs(price_dfs, symbols, price_rows, breakout_period=breakout_period) for breakout_period in breakout_periods]
+    cot_inputs = [get_cot_inputs(cot_dfs, symbols, cot_rows, cot_component_name=name, cot_component_period=period, cot_threshold=threshold)
+                    for name, period, threshold in cot_configs]
+    comm_inputs = get_comm_inputs(symbols)
+
+    breakout_index = np.array([breakout_periods.index(params['breakout_period']) for params in params_list], dtype=np.int64)
+    cot_index = np.array([cot_configs.index((params['cot_component_name'], params['cot_component_period'], params['cot_threshold']))
+                            for params in params_list], dtype=np.int64)
+    n_entries = np.array([params['n_entries'] for params in params_list], dtype=np.int64)
+
+    values, max_drawdown, n_trades, n_rejected = _run_batched_kernel(
+        breakout_inputs[0]['close'], breakout_inputs[0]['high'], breakout_inputs[0]['low'],
+        np.stack([inputs['mband'] for inputs in breakout_inputs], axis=1),
+        np.stack([inputs['breakout'] for inputs in breakout_inputs], axis=1),
+        np.stack([inputs['price_active'] for inputs in breakout_inputs], axis=1),
+        np.stack([inputs['cot'] for inputs in cot_inputs], axis=1),
+        np.stack([inputs['cot_active'] for inputs in cot_inputs], axis=1),
+        breakout_index, cot_index, n_entries, comm_inputs['mult'], comm_inputs['margin'], comm_inputs['commission'],
+        float(cash), float(slip_perc), bool(slip_open))
+
+    results = pd.DataFrame(params_list)
+    results['final_value'] = values[-1]
+    results['total_return'] = values[-1] / cash - 1
+    results['max_drawdown'] = max_drawdown
+    results['n_trades'] = n_trades
+    results['n_rejected'] = n_rejected
+
+    if return_equity:
+        return results, pd.DataFrame(values, index=pd.DatetimeIndex(dates, name='Date'))
+    return results
+
+#- BACKTRADER REFERENCE
+
+class Executions(bt.Analyzer):
+    ''' Executed orders (date, symbol, size, price, commission) '''
+
+    def start(self):
+        self.rets['executions'] = list()
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            self.rets['executions'].append((bt.num2date(order.executed.dt), order.data._name, order.executed.size,
+                                            order.executed.price, order.executed.comm))
+
+class BrokerValue(bt.Analyzer):
+    ''' Broker value at the end of each bar, by date '''
+
+    def next(self):
+        self.rets[self.strategy.datetime.datetime(0)] = self.strategy.broker.getvalue()
+
+def run_backtrader_backtest(price_dfs: dict, cot_dfs: dict, **strategy_params) -> tuple:
+    ''' Runs COT_Breakout with Backtrader (see cot_bt.get_cerebro), with the same outputs as run_vector_backtest '''
+    from cot_bt import get_cerebro
+    cerebro = get_cerebro(price_dfs, cot_dfs, **strategy_params)
+    cerebro.addanalyzer(BrokerValue, _name='value')
+    cerebro.addanalyzer(Executions, _name='executions')
+    strategy = cerebro.run()[0]
+
+    equity = pd.Series(dict(strategy.analyzers.value.get_analysis()), dtype=np.float64, name='Equity').rename_axis('Date')
+    trades = pd.DataFrame(strategy.analyzers.executions.get_analysis()['executions'],
+                            columns=['Date', 'symbol', 'size', 'price', 'commission'])
+
+    return equity, trades
+
+def compare_backtests(price_dfs: dict, cot_dfs: dict, cot_vectorized=False, **strategy_params) -> dict:
+    ''' Runs COT_Breakout with both engines and compares their equity curves and executed orders
+    :param cot_vectorized: COT signals used by the Backtrader run (see COT_Breakout)
+    '''
+    start_time = perf_counter()
+    bt_equity, bt_trades = run_backtrader_backtest(price_dfs, cot_dfs, cot_vectorized=cot_vectorized, **strategy_params)
+    bt_time = perf_counter() - start_time
+
+    start_time = perf_counter()
+    equity, trades = run_vector_backtest(price_dfs, cot_dfs, **strategy_params)
+    vector_time = perf_counter() - start_time
+
+    sort_columns = ['Date', 'symbol']
+    bt_trades = bt_trades.sort_values(sort_columns).reset_index(drop=True)
+    trades = trades.sort_values(sort_columns).reset_index(drop=True)
+    same_trades = len(bt_trades) == len(trades) and bool(
+        (bt_trades['symbol'] == trades['symbol']).all()
+        and (pd.to_datetime(bt_trades['Date']).to_numpy() == trades['Date'].to_numpy()).all()
+        and np.allclose(bt_trades[['size', 'price', 'commission']].to_numpy(dtype=np.float64), trades[['size', 'price', 'commission']].to_numpy())
+    )
+
+    return {
+        'backtrader_time': bt_time,
+        'vector_time': vector_time,
+        'backtrader_final_value': float(bt_equity.iloc[-1]),
+        'vector_final_value': float(equity.iloc[-1]),
+        'max_equity_difference': float(np.max(np.abs(bt_equity.to_numpy() - equity.to_numpy()))) if len(bt_equity) == len(equity) else float('nan'),
+        'n_trades': (len(bt_trades), len(trades)),
+        'same_trades': same_trades,
+    }
+
+if __name__ == "__main__":
+    from cot_bt import get_bt_data, SYMBOLS
+    parser = argparse.ArgumentParser(description='Checks the NumPy COT_Breakout kernel against Backtrader')
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS)
+    parser.add_argument('--cot-component', default='mm_concentration')
+    args = parser.parse_args()
+
+    price_dfs, cot_dfs = get_bt_data(args.symbols)
+    for key, value in compare_backtests(price_dfs, cot_dfs, cot_component_name=args.cot_component).items():
+        print(f'{key}: {value}')
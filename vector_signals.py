@@ -0,0 +1,163 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# COT feed lines used by each COTSignalFactory signal
+COT_SIGNAL_INPUTS = {
+    'mm_concentration': ['mml_concentration', 'mms_concentration'],
+    'mm_clustering&possize': ['mml_clustering', 'mml_possize', 'mms_clustering', 'mms_possize'],
+    'pmpu_oi': ['pmpu_netoi'],
+    'pmpu_t': ['pmpu_nett'],
+    'pmpu_possize': ['pmpu_netpossize'],
+}
+
+#- ROLLING WINDOWS
+# All functions work on the last axis, so they take a single series (n_bars, ) or a panel (n_symbols, n_bars)
+
+def rolling_max(x: np.ndarray, period: int) -> np.ndarray:
+    ''' Max of the last period values (including the current one), NaN while there are less than period values '''
+    return _rolling(x, period, np.max)
+
+def rolling_min(x: np.ndarray, period: int) -> np.ndarray:
+    ''' Min of the last period values (including the current one), NaN while there are less than period values '''
+    return _rolling(x, period, np.min)
+
+def _rolling(x: np.ndarray, period: int, func) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= period:
+        out[..., period-1:] = func(sliding_window_view(x, period, axis=-1), axis=-1)
+    return out
+
+def stochastic(x: np.ndarray, period: int, normalize='range') -> np.ndarray:
+    ''' Stochastic (0-100) of x over the last period values
+    :param normalize: 'range' divides by (highest - lowest), 'sum' by (highest + lowest), as the COT signals do
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    highest = rolling_max(x, period)
+    lowest = rolling_min(x, period)
+    denominator = highest - lowest if normalize == 'range' else highest + lowest
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stoch = 100*(x - lowest) / denominator
+
+    # Zero denominators carry no information (the Backtrader signals raise ZeroDivisionError there)
+    stoch[~np.isfinite(stoch)] = np.nan
+    return stoch
+
+#- BREAKOUT SIGNALS
+
+def donchian_channel(close: np.ndarray, period=20) -> tuple:
+    ''' Donchian Channel of the previous period closes, as indicators.DonchianChannel
+    :return: Tuple (hband, lband, mband, wband), NaN during the first period bars
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    highest = rolling_max(close, period)
+    lowest = rolling_min(close, period)
+
+    hband = np.full(close.shape, np.nan)
+    lband = np.full(close.shape, np.nan)
+    hband[..., 1:] = highest[..., :-1]
+    lband[..., 1:] = lowest[..., :-1]
+
+    return hband, lband, (hband + lband)/2, hband - lband
+
+def breakout_signal(price: np.ndarray, mband: np.ndarray, wband: np.ndarray) -> np.ndarray:
+    ''' Position of the price inside the Donchian Channel, from -2 (lower band) to 2 (upper band), clipped to [-2, 2] '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        signal = 2*(np.asarray(price, dtype=np.float64) - mband) / wband
+
+    return np.clip(signal, -2, 2)
+
+#- COT SIGNALS
+# Same classification as the COT signals' next() in signals.py, for the whole series at once
+
+def mm_concentration_signal(stoch_mml_conc: np.ndarray, stoch_mms_conc: np.ndarray, threshold=70) -> np.ndarray:
+    ulim = threshold
+    llim = 100 - threshold
+    mml_conc = stoch_mml_conc
+    mms_conc = stoch_mms_conc
+
+    return np.select(
+        [
+            (mml_conc > ulim) & (mms_conc < llim),  # mml -> overbought & mms -> undersold: strong sell
+            (mml_conc > ulim) & (mms_conc < ulim),  # mml -> overbought & mms -> neutral: sell
+            mml_conc > ulim,                        # mml -> overbought & mms -> oversold: neutral
+            (mms_conc > ulim) & (mml_conc < llim),  # mms -> oversold & mml -> underbought: strong buy
+            (mms_conc > ulim) & (mml_conc < ulim),  # mms -> oversold & mml -> neutral: buy
+        ],
+        [-2, -1, 0, 2, 1],
+        default=0
+    ).astype(np.float64)
+
+def mm_clustering_possize_signal(stoch_mml_clus: np.ndarray, stoch_mml_possize: np.ndarray,
+                                    stoch_mms_clus: np.ndarray, stoch_mms_possize: np.ndarray, threshold=70) -> np.ndarray:
+    ulim = threshold
+    llim = 100 - threshold
+
+    mml_clus_ob = stoch_mml_clus > ulim
+    mms_clus_ob = stoch_mms_clus > ulim
+    mml_possize_ob = stoch_mml_possize > ulim
+    mms_possize_ob = stoch_mms_possize > ulim
+    mml_possize_ub = stoch_mml_possize < llim
+    mms_possize_ub = stoch_mms_possize < llim
+
+    # mml clustering -> overbought
+    sell_side = mml_clus_ob
+    sell_strong = sell_side & (stoch_mms_clus < llim)
+    sell_neutral = sell_side & ~sell_strong & (stoch_mms_clus < ulim)
+
+    # mms clustering -> oversold (and mml clustering NOT overbought)
+    buy_side = ~mml_clus_ob & mms_clus_ob
+    buy_strong = buy_side & (stoch_mml_clus < llim)
+    buy_neutral = buy_side & ~buy_strong & (stoch_mms_clus < ulim)
+
+    return np.select(
+        [
+            sell_strong & mml_possize_ob & mms_possize_ub,
+            sell_strong & (mml_possize_ob | mms_possize_ub),
+            sell_strong,
+            sell_neutral & mml_possize_ob,
+            sell_neutral,
+            buy_strong & mms_possize_ob & mml_possize_ub,
+            buy_strong & (mms_possize_ob | mml_possize_ub),
+            buy_strong,
+            buy_neutral & mms_possize_ob,
+            buy_neutral,
+        ],
+        [-2, -1.5, -1, -1, -0.5, 2, 1.5, -1, 1, -0.5],
+        default=0
+    ).astype(np.float64)
+
+def pmpu_net_signal(stoch_pmpu_net: np.ndarray, threshold=70) -> np.ndarray:
+    ulim = threshold
+    llim = 100 - threshold
+
+    return np.select(
+        [stoch_pmpu_net > ulim, stoch_pmpu_net < llim],
+        [1, -1],
+        default=0
+    ).astype(np.float64)
+
+def compute_cot_signal(name: str, cot_lines: dict, period=52, threshold=70) -> np.ndarray:
+    ''' Computes a COTSignalFactory signal for a whole series (or a symbol panel) in one pass
+    :param name: One of COTSignalFactory.ALL_NAMES
+    :param cot_lines: Arrays of the COT feed lines used by the signal (see COT_SIGNAL_INPUTS), by line name
+    :return: Signal array, NaN during the first period-1 bars (as the Backtrader signals)
+    '''
+    if name == 'mm_concentration':
+        signal = mm_concentration_signal(stochastic(cot_lines['mml_concentration'], period, normalize='range'),
+                                            stochastic(cot_lines['mms_concentration'], period, normalize='range'),
+                                            threshold=threshold)
+    elif name == 'mm_clustering&possize':
+        signal = mm_clustering_possize_signal(stochastic(cot_lines['mml_clustering'], period, normalize='sum'),
+                                                stochastic(cot_lines['mml_possize'], period, normalize='sum'),
+                                                stochastic(cot_lines['mms_clustering'], period, normalize='sum'),
+                                                stochastic(cot_lines['mms_possize'], period, normalize='sum'),
+                                                threshold=threshold)
+    elif name in ['pmpu_oi', 'pmpu_t', 'pmpu_possize']:
+        pmpu_net = cot_lines[COT_SIGNAL_INPUTS[name][0]]
+        signal = pmpu_net_signal(stochastic(pmpu_net, period, normalize='sum'), threshold=threshold)
+    else:
+        raise ValueError(f"The COT component passed ({name}) isn't a valid one. Please choose one of the following: {list(COT_SIGNAL_INPUTS.keys())}")
+
+    signal[..., :period-1] = np.nan
+    return signal
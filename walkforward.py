@@ -0,0 +1,200 @@
+import argparse
+import json
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import backtrader as bt
+from cot_bt import get_bt_data, get_cerebro, SYMBOLS
+from strategies import COT_Breakout
+from sweep import get_param_grid, add_metric_analyzers, get_run_metrics, DEFAULT_PARAM_GRID
+from feeds.arrays import Price_ArrayData, COT_ArrayData, get_column_arrays, slice_column_arrays
+
+# Preloaded dataset of the worker processes, set once per process by _init_worker
+_worker_data = dict()
+
+class WalkForward_COT_Breakout(COT_Breakout):
+    ''' COT_Breakout that only trades from trade_start on, so that the bars before it just warm up the indicators '''
+
+    def __init__(self, *args, trade_start=None, **kwargs) -> None:
+        super(WalkForward_COT_Breakout, self).__init__(*args, **kwargs)
+        self.trade_start = bt.date2num(trade_start) if trade_start is not None else None
+
+    def pnext(self):
+        if self.trade_start is None or self.datetime[0] >= self.trade_start:
+            super(WalkForward_COT_Breakout, self).pnext()
+
+class EquityCurve(bt.Analyzer):
+    ''' Broker value at the end of each bar, by date '''
+
+    def next(self):
+        self.rets[self.strategy.datetime.datetime(0)] = self.strategy.broker.getvalue()
+
+def get_walk_forward_folds(dates, in_sample_months=36, out_of_sample_months=12) -> list:
+    ''' Splits a timeline into rolling folds: each in-sample window is followed by its out-of-sample window, and the
+    windows roll forward by out_of_sample_months, so the out-of-sample windows cover the timeline without overlaps
+    :return: List of folds (dicts with the in-sample and out-of-sample [start, end) dates)
+    '''
+    first_date = pd.Timestamp(np.min(dates))
+    last_date = pd.Timestamp(np.max(dates))
+
+    folds = list()
+    in_sample_start = first_date
+    while True:
+        out_of_sample_start = in_sample_start + pd.DateOffset(months=in_sample_months)
+        out_of_sample_end = out_of_sample_start + pd.DateOffset(months=out_of_sample_months)
+        if out_of_sample_start > last_date:
+            break
+
+        folds.append({
+            'fold': len(folds),
+            'in_sample': (in_sample_start, out_of_sample_start),
+            'out_of_sample': (out_of_sample_start, min(out_of_sample_end, last_date + pd.DateOffset(days=1))),
+        })
+        in_sample_start += pd.DateOffset(months=out_of_sample_months)
+
+    return folds
+
+def get_fold_data(price_arrays: dict, cot_arrays: dict, start_date, end_date) -> tuple:
+    ''' Returns views over the preloaded dataset on the [start_date, end_date) dates. Symbols whose data starts after
+    start_date are left out, as their indicators may not get enough bars to be computed
+    '''
+    price_views = dict()
+    cot_views = dict()
+    for symbol in price_arrays.keys():
+        if price_arrays[symbol]['Date'][0] > start_date or cot_arrays[symbol]['Date'][0] > start_date:
+            continue
+
+        price_view = slice_column_arrays(price_arrays[symbol], start_date, end_date)
+        cot_view = slice_column_arrays(cot_arrays[symbol], start_date, end_date)
+        if len(price_view['Date']) and len(cot_view['Date']):
+            price_views[symbol] = price_view
+            cot_views[symbol] = cot_view
+
+    return price_views, cot_views
+
+def run_fold_backtest(price_arrays: dict, cot_arrays: dict, params: dict, start_date, end_date, trade_start=None) -> tuple:
+    ''' Runs WalkForward_COT_Breakout over the [start_date, end_date) dates of the preloaded dataset
+    :return: Tuple (metrics, equity), with the run's metrics (see sweep.get_run_metrics) and equity curve (pd.Series)
+    '''
+    price_views, cot_views = get_fold_data(price_arrays, cot_arrays, start_date, end_date)
+    cerebro = get_cerebro(price_views, cot_views, strategy=WalkForward_COT_Breakout,
+                            price_feed=Price_ArrayData, cot_feed=COT_ArrayData, trade_start=trade_start, **params)
+    add_metric_analyzers(cerebro)
+    cerebro.addanalyzer(EquityCurve, _name='equity')
+    strategy = cerebro.run()[0]
+
+    equity = pd.Series(dict(strategy.analyzers.equity.get_analysis()), dtype=np.float64)
+    return get_run_metrics(strategy), equity
+
+def run_fold(price_arrays: dict, cot_arrays: dict, fold: dict, param_grid: dict, objective='sharpe_ratio', warmup_months=24) -> dict:
+    ''' Optimizes the parameters on the fold's in-sample window (best objective metric over the grid) and runs them
+    on its out-of-sample window, warming up the indicators on the warmup_months before it
+    '''
+    in_sample_start, in_sample_end = fold['in_sample']
+    in_sample_results = list()
+    for params in get_param_grid(param_grid):
+        metrics, _ = run_fold_backtest(price_arrays, cot_arrays, params, in_sample_start, in_sample_end)
+        in_sample_results.append({'params': params, 'metrics': metrics})
+
+    # Runs without a metric (e.g. without a Sharpe Ratio) are ranked last
+    best_result = max(in_sample_results, key=lambda result: result['metrics'][objective] if result['metrics'][objective] is not None else -np.inf)
+
+    out_of_sample_start, out_of_sample_end = fold['out_of_sample']
+    warmup_start = max(out_of_sample_start - pd.DateOffset(months=warmup_months), in_sample_start)
+    metrics, equity = run_fold_backtest(price_arrays, cot_arrays, best_result['params'], warmup_start, out_of_sample_end,
+                                        trade_start=out_of_sample_start.to_pydatetime())
+
+    return {
+        'fold': fold,
+        'params': best_result['params'],
+        'in_sample_metrics': best_result['metrics'],
+        'out_of_sample_metrics': metrics,
+        'out_of_sample_equity': equity[equity.index >= out_of_sample_start],
+    }
+
+def stitch_equity_curves(fold_results: list, initial_value=1.5e6) -> pd.Series:
+    ''' Chains the folds' out-of-sample daily returns into a single equity curve starting at initial_value. Each fold
+    starts with the same cash, so its first return is measured against it
+    '''
+    fold_returns = list()
+    for fold_result in sorted(fold_results, key=lambda fold_result: fold_result['fold']['fold']):
+        equity = fold_result['out_of_sample_equity']
+        if equity.empty:
+            continue
+        fold_returns.append(equity.pct_change().fillna(equity.iloc[0]/initial_value - 1))
+
+    if not fold_returns:
+        return pd.Series(dtype=np.float64)
+
+    returns = pd.concat(fold_returns)
+    return initial_value * (1 + returns).cumprod()
+
+def _init_worker(price_arrays: dict, cot_arrays: dict):
+    # The preloaded dataset is sent once to each worker process, the folds only slice views over it
+    _worker_data['price_arrays'] = price_arrays
+    _worker_data['cot_arrays'] = cot_arrays
+
+def _run_worker_fold(fold: dict, param_grid: dict, objective: str, warmup_months: int) -> dict:
+    return run_fold(_worker_data['price_arrays'], _worker_data['cot_arrays'], fold, param_grid, objective=objective, warmup_months=warmup_months)
+
+def run_walk_forward(param_grid: dict, symbols=SYMBOLS, in_sample_months=36, out_of_sample_months=12, warmup_months=24,
+                        objective='sharpe_ratio', max_workers=None) -> tuple:
+    ''' Walk-forward optimization of COT_Breakout: the data is loaded once, the folds (see get_walk_forward_folds) are
+    optimized in parallel worker processes and their out-of-sample equity curves are stitched together
+    :param param_grid: Dict of COT_Breakout parameter values lists, searched on each in-sample window
+    :param objective: Metric (see sweep.get_run_metrics) maximized on the in-sample windows
+    :return: Tuple (fold_results, equity), with each fold's results and the stitched out-of-sample equity curve
+    '''
+    price_dfs, cot_dfs = get_bt_data(symbols)
+    price_arrays = {symbol: get_column_arrays(df) for symbol, df in price_dfs.items()}
+    cot_arrays = {symbol: get_column_arrays(df) for symbol, df in cot_dfs.items()}
+
+    all_dates = np.concatenate([arrays['Date'] for arrays in price_arrays.values()])
+    folds = get_walk_forward_folds(all_dates, in_sample_months=in_sample_months, out_of_sample_months=out_of_sample_months)
+    print(f'{len(folds)} folds')
+
+    fold_results = list()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(price_arrays, cot_arrays)) as executor:
+        futures = [executor.submit(_run_worker_fold, fold, param_grid, objective, warmup_months) for fold in folds]
+        for future in as_completed(futures):
+            fold_result = future.result()
+            fold_results.append(fold_result)
+
+            out_of_sample_start, out_of_sample_end = fold_result['fold']['out_of_sample']
+            print(f"fold {fold_result['fold']['fold']} ({out_of_sample_start.date()} - {out_of_sample_end.date()}): {fold_result['params']}")
+
+    fold_results.sort(key=lambda fold_result: fold_result['fold']['fold'])
+    return fold_results, stitch_equity_curves(fold_results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Runs a COT_Breakout walk-forward optimization')
+    parser.add_argument('results_path', help='.json file with the folds results')
+    parser.add_argument('equity_path', help='.csv file with the stitched out-of-sample equity curve')
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--grid', default=None, help='JSON file with the parameter grid (sweep.DEFAULT_PARAM_GRID if not passed)')
+    parser.add_argument('--in-sample', type=int, default=36, help='In-sample window (months)')
+    parser.add_argument('--out-of-sample', type=int, default=12, help='Out-of-sample window (months)')
+    parser.add_argument('--warmup', type=int, default=24, help='Indicators warm-up before each out-of-sample window (months)')
+    parser.add_argument('--objective', default='sharpe_ratio')
+    args = parser.parse_args()
+
+    param_grid = DEFAULT_PARAM_GRID
+    if args.grid:
+        with open(args.grid, 'r') as f:
+            param_grid = json.load(f)
+
+    fold_results, equity = run_walk_forward(param_grid, symbols=args.symbols, in_sample_months=args.in_sample,
+                                            out_of_sample_months=args.out_of_sample, warmup_months=args.warmup,
+                                            objective=args.objective, max_workers=args.workers)
+
+    with open(args.results_path, 'w') as f:
+        json.dump([{
+            'fold': fold_result['fold']['fold'],
+            'in_sample': [str(date.date()) for date in fold_result['fold']['in_sample']],
+            'out_of_sample': [str(date.date()) for date in fold_result['fold']['out_of_sample']],
+            'params': fold_result['params'],
+            'in_sample_metrics': fold_result['in_sample_metrics'],
+            'out_of_sample_metrics': fold_result['out_of_sample_metrics'],
+        } for fold_result in fold_results], f, indent=2)
+    equity.rename_axis('Date').rename('Equity').to_csv(args.equity_path)